@@ -0,0 +1,37 @@
+"""
+Run the benchmark suite and save the results as JSON:
+
+    python -m benchmarks --output results/0.2.0.json
+    python -m benchmarks --compare results/0.2.0.json
+"""
+
+import argparse
+from pathlib import Path
+
+from . import bench_pipeline
+from .harness import format_results, load_results, save_results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--output", type=Path, default=Path("bench_results.json"))
+    parser.add_argument(
+        "--compare", type=Path, help="previous results to compare against"
+    )
+    parser.add_argument("--iterations", type=int, default=10_000)
+    parser.add_argument(
+        "--filter", default="", help="only run cases containing this string"
+    )
+    args = parser.parse_args()
+
+    results = bench_pipeline.run(iterations=args.iterations, name_filter=args.filter)
+    baseline = load_results(args.compare) if args.compare else None
+
+    print(format_results(results, baseline))
+
+    save_results(results, args.output)
+    print(f"\nresults saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
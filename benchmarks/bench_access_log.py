@@ -0,0 +1,198 @@
+"""
+Compare requests/sec of the pure ASGI access log middleware against the previous
+`@app.middleware("http")` (BaseHTTPMiddleware) implementation.
+
+The ASGI app is driven directly with in-memory `receive`/`send` callables so the numbers reflect
+middleware overhead rather than an HTTP server or client.
+
+    python -m benchmarks.bench_access_log
+"""
+
+import asyncio
+import os
+import time
+from time import perf_counter
+
+import structlog
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.middleware.base import RequestResponseEndpoint
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Match
+
+from structlog_config import configure_logger
+from structlog_config.fastapi_access_logger import (
+    add_middleware,
+    get_client_addr,
+    get_path_with_query_string,
+    get_route_name,
+    log,
+)
+
+
+def add_base_http_middleware(app: FastAPI) -> None:
+    "The access logger as it was implemented before `AccessLogMiddleware`"
+
+    @app.middleware("http")
+    async def access_log_middleware(
+        request: Request, call_next: RequestResponseEndpoint
+    ) -> Response:
+        scope = request.scope
+        route_name = get_route_name(app, request.scope)
+
+        if scope["type"] != "http":
+            return await call_next(request)
+
+        start = perf_counter()
+        response = await call_next(request)
+        elapsed = perf_counter() - start
+
+        log.info(
+            f"{response.status_code} {scope['method']} {get_path_with_query_string(scope)}",
+            time=round(elapsed * 1000),
+            status=response.status_code,
+            method=scope["method"],
+            path=scope["path"],
+            query=scope["query_string"].decode(),
+            client_ip=get_client_addr(scope),
+            route=route_name,
+        )
+
+        return response
+
+
+def build_app(install) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/plain")
+    async def plain():
+        return PlainTextResponse("ok")
+
+    @app.get("/stream")
+    async def stream():
+        return StreamingResponse(iter([b"x" * 1024] * 32))
+
+    install(app)
+
+    return app
+
+
+def http_scope(path: str) -> dict:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 1234),
+        "server": ("bench", 80),
+    }
+
+
+def make_receive():
+    request_sent = False
+    disconnected = asyncio.Event()
+
+    async def receive():
+        nonlocal request_sent
+
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        # streaming responses listen for a disconnect until the body is complete
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    return receive
+
+
+async def drive(app: FastAPI, path: str, requests: int) -> float:
+    async def send(message):
+        pass
+
+    # warm up route resolution and the middleware stack
+    for _ in range(50):
+        await app(http_scope(path), make_receive(), send)
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(http_scope(path), make_receive(), send)
+
+    return requests / (time.perf_counter() - start)
+
+
+def uncached_route(app: FastAPI, scope: dict):
+    "Route resolution as it was implemented before `RouteCache`"
+    return next(
+        (r for r in app.router.routes if r.matches(scope)[0] == Match.FULL), None
+    )
+
+
+def bench_route_resolution(
+    routes: int = 300, lookups: int = 20_000
+) -> dict[str, float]:
+    "ns per lookup for an app with several hundred routes, hitting the last one"
+    app = FastAPI()
+    for i in range(routes):
+        app.add_api_route(
+            f"/resource_{i}/{{item_id}}", lambda item_id: None, name=f"r{i}"
+        )
+
+    scopes = [
+        {**http_scope(f"/resource_{routes - 1}/{i % 100}"), "app": app}
+        for i in range(lookups)
+    ]
+
+    results = {}
+    for name, resolve in (("uncached", uncached_route), ("cached", get_route_name)):
+        start = time.perf_counter_ns()
+        for scope in scopes:
+            resolve(app, scope)
+        results[name] = (time.perf_counter_ns() - start) / lookups
+
+    return results
+
+
+def run(requests: int = 5_000) -> dict[str, dict[str, float]]:
+    devnull = open(os.devnull, "wb")
+    configure_logger(
+        json_logger=True,
+        logger_factory=structlog.BytesLoggerFactory(file=devnull),
+    )
+
+    implementations = {
+        "base_http_middleware": add_base_http_middleware,
+        "asgi_middleware": add_middleware,
+    }
+
+    results: dict[str, dict[str, float]] = {}
+    for path in ("/plain", "/stream"):
+        for name, install in implementations.items():
+            app = build_app(install)
+            results.setdefault(path, {})[name] = asyncio.run(drive(app, path, requests))
+
+    return results
+
+
+def main() -> None:
+    for path, implementations in run().items():
+        baseline = implementations["base_http_middleware"]
+        for name, requests_per_second in implementations.items():
+            print(
+                f"{path:<8} {name:<22} {requests_per_second:>10,.0f} req/s "
+                f"({requests_per_second / baseline:.2f}x)"
+            )
+
+    for name, ns in bench_route_resolution().items():
+        print(f"route resolution (300 routes) {name:<10} {ns:>10,.0f} ns/lookup")
+
+
+if __name__ == "__main__":
+    main()
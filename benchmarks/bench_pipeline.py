@@ -0,0 +1,360 @@
+"""
+Benchmarks for everything `configure_logger` puts on the logging hot path:
+
+- every processor of the default pipeline, in JSON and console mode
+- the full structlog pipeline, in JSON and console mode
+- the stdlib `ProcessorFormatter` path used for third-party loggers
+- exception rendering, with and without cached tracebacks
+- events logged with a bound request context, with and without context fragments
+- redaction, compared with a processor per key and per pattern, and over a huge payload
+- timestamp generation, compared with structlog's `TimeStamper`
+- the FastAPI access log middleware (when fastapi is installed)
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import fnmatch
+import logging
+import os
+import re
+import sys
+from pathlib import Path
+
+import structlog
+from structlog.tracebacks import ExceptionDictTransformer
+
+from structlog_config import build_pipeline, configure_logger
+from structlog_config.exception_cache import CachedExceptionRenderer
+from structlog_config.redaction import BUILTIN_PATTERNS, DEFAULT_KEYS, Redactor
+from structlog_config.size_guard import SizeGuard
+from structlog_config.timestamps import CachedTimeStamper
+
+from .harness import Case, measure
+
+
+def sample_event() -> dict:
+    return {
+        "event": "user logged in",
+        "user_id": 1234,
+        "request_id": "6f1c2d2a-5e8b-4f3e-9d2c-1a2b3c4d5e6f",
+        "path": Path.cwd() / "app" / "main.py",
+        "elapsed_ms": 12.5,
+        "tags": ["login", "web"],
+    }
+
+
+def processor_name(processor) -> str:
+    return getattr(processor, "__name__", type(processor).__name__)
+
+
+def processor_cases(json_logger: bool) -> dict[str, tuple[Case, Case]]:
+    """
+    Each processor is benchmarked against the event dict as it looks at that point in the chain.
+    Processors mutate the event dict, so every call gets a fresh copy; the copy is returned as a
+    separate case so its cost can be subtracted.
+    """
+    cases = {}
+    event_dict = sample_event()
+    mode = "json" if json_logger else "console"
+
+    for processor in build_pipeline(json_logger).chain:
+        snapshot = dict(event_dict)
+
+        def copy(snapshot=snapshot):
+            return snapshot.copy()
+
+        def case(processor=processor, snapshot=snapshot):
+            return processor(None, "info", snapshot.copy())
+
+        cases[f"processor/{mode}/{processor_name(processor)}"] = (case, copy)
+        event_dict = processor(None, "info", event_dict)
+
+    return cases
+
+
+@contextlib.contextmanager
+def stdout_to_devnull():
+    "the stdlib handler binds `sys.stdout` when the logger is configured, so devnull stays open"
+    original = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        yield
+    finally:
+        sys.stdout = original
+
+
+def configure(json_logger: bool):
+    if json_logger:
+        factory = structlog.BytesLoggerFactory(file=open(os.devnull, "wb"))
+    else:
+        factory = structlog.PrintLoggerFactory(file=open(os.devnull, "w"))
+
+    return configure_logger(json_logger=json_logger, logger_factory=factory)
+
+
+def pipeline_case(json_logger: bool) -> Case:
+    log = configure(json_logger)
+    event = sample_event()
+
+    def case():
+        log.info(**event)
+
+    return case
+
+
+def stdlib_case(json_logger: bool) -> Case:
+    with stdout_to_devnull():
+        configure(json_logger)
+
+    logger = logging.getLogger("benchmark.stdlib")
+    event = sample_event()
+
+    def case():
+        logger.info(event["event"], extra={"user_id": event["user_id"]})
+
+    return case
+
+
+def sample_context() -> dict:
+    return {
+        "request_id": "6f1c2d2a-5e8b-4f3e-9d2c-1a2b3c4d5e6f",
+        "user_id": 1234,
+        "tenant": "acme",
+        "route": "users.login",
+        "client_ip": "10.0.0.1",
+        "session": {"id": "s-1", "flags": ["beta", "sso"]},
+    }
+
+
+def large_context() -> dict:
+    "Many immutable values, where serializing the context once pays off"
+    return {
+        **{key: value for key, value in sample_context().items() if key != "session"},
+        **{f"attribute_{index}": f"value-{index:04d}" for index in range(40)},
+    }
+
+
+def context_cases() -> dict[str, Case]:
+    """
+    A request context bound once and an event logged under it, through the JSON pipeline with
+    context fragments and through the default JSON pipeline merging and serializing the context per
+    event.
+    """
+    chains = {
+        "json_fragments": build_pipeline(
+            json_logger=True, context_fragments=True
+        ).chain,
+        "json_merge": build_pipeline(json_logger=True, context_fragments=False).chain,
+    }
+    contexts = {"": sample_context(), "_large": large_context()}
+
+    cases = {}
+    event = {"event": "user logged in", "elapsed_ms": 12.5}
+
+    # every case runs in a context of its own, with the request context bound
+    def bound_context(values: dict) -> contextvars.Context:
+        context = contextvars.Context()
+        context.run(structlog.contextvars.bind_contextvars, **values)
+        return context
+
+    for suffix, values in contexts.items():
+        for name, chain in chains.items():
+            logger = structlog.wrap_logger(
+                structlog.BytesLogger(open(os.devnull, "wb")),
+                processors=chain,
+                wrapper_class=structlog.make_filtering_bound_logger(logging.DEBUG),
+            )
+            cases[f"context/{name}{suffix}"] = (
+                lambda logger=logger, context=bound_context(values): context.run(
+                    logger.info, **event
+                )
+            )
+
+    return cases
+
+
+def redaction_event() -> dict:
+    return {
+        **sample_event(),
+        "path": "/app/main.py",
+        "email": "jane.doe@example.com",
+        "headers": {
+            "accept": "*/*",
+            "authorization": "Bearer abc.def",
+            "x-trace": "t-1",
+        },
+        "query": "select * from users where id = 1234",
+    }
+
+
+def naive_redaction_processors() -> list:
+    "The ad-hoc approach: one processor per key and per pattern, each walking the event"
+
+    def key_processor(key: str):
+        def processor(logger, method_name, event_dict):
+            for event_key in list(event_dict):
+                if fnmatch.fnmatchcase(str(event_key).lower(), key):
+                    event_dict[event_key] = "[REDACTED]"
+                elif isinstance(event_dict[event_key], dict):
+                    event_dict[event_key] = processor(
+                        logger, method_name, event_dict[event_key]
+                    )
+            return event_dict
+
+        return processor
+
+    def pattern_processor(pattern: str):
+        def processor(logger, method_name, event_dict):
+            for event_key, value in list(event_dict.items()):
+                if isinstance(value, str):
+                    event_dict[event_key] = re.sub(pattern, "[REDACTED]", value)
+                elif isinstance(value, dict):
+                    event_dict[event_key] = processor(logger, method_name, value)
+            return event_dict
+
+        return processor
+
+    return [
+        *(key_processor(key) for key in DEFAULT_KEYS),
+        *(pattern_processor(pattern.regex) for pattern in BUILTIN_PATTERNS.values()),
+    ]
+
+
+def redaction_cases() -> dict[str, Case]:
+    redactor = Redactor(patterns=BUILTIN_PATTERNS.values())
+    naive = naive_redaction_processors()
+    event = redaction_event()
+
+    def naive_case():
+        event_dict = {**event, "headers": dict(event["headers"])}
+        for processor in naive:
+            event_dict = processor(None, "info", event_dict)
+        return event_dict
+
+    return {
+        "redaction/compiled": lambda: redactor(None, "info", dict(event)),
+        "redaction/naive": naive_case,
+    }
+
+
+def large_payload_case() -> Case:
+    """
+    Redaction and size limits of the default JSON pipeline over an accidentally logged payload of
+    300k rows, of which only the first LOG_MAX_COLLECTION_LENGTH are kept
+    """
+    pipeline = build_pipeline(json_logger=True)
+    processors = [
+        processor
+        for processor in pipeline.processors
+        if isinstance(processor, (Redactor, SizeGuard))
+    ]
+    rows = [
+        {"id": index, "name": f"user-{index}", "tags": ["a", "b"]}
+        for index in range(300_000)
+    ]
+
+    def case():
+        event_dict = {"event": "import finished", "payload": {"rows": rows}}
+        for processor in processors:
+            event_dict = processor(None, "info", event_dict)
+        return event_dict
+
+    return case
+
+
+def exception_cases() -> dict[str, Case]:
+    try:
+        raise ValueError("benchmark exception")
+    except ValueError:
+        exc_info = sys.exc_info()
+
+    transformer = ExceptionDictTransformer(
+        show_locals=False, use_rich=False, max_frames=5
+    )
+    cached = CachedExceptionRenderer()
+    compact = CachedExceptionRenderer(compact_after=1)
+
+    return {
+        "exception/format_exc_info": lambda: structlog.processors.format_exc_info(
+            None, "error", {"event": "failed", "exc_info": exc_info}
+        ),
+        "exception/cached": lambda: cached(
+            None, "error", {"event": "failed", "exc_info": exc_info}
+        ),
+        "exception/compact": lambda: compact(
+            None, "error", {"event": "failed", "exc_info": exc_info}
+        ),
+        "exception/dict_transformer": lambda: transformer(exc_info),
+    }
+
+
+def timestamp_cases() -> dict[str, Case]:
+    stampers = {
+        "timestamp/structlog_timestamper": structlog.processors.TimeStamper(
+            fmt="iso", utc=True
+        ),
+        "timestamp/cached_iso": CachedTimeStamper(),
+        "timestamp/cached_epoch_ns": CachedTimeStamper(epoch_ns=True),
+    }
+
+    return {
+        name: lambda stamper=stamper: stamper(None, "info", {"event": "tick"})
+        for name, stamper in stampers.items()
+    }
+
+
+def access_middleware_case() -> Case | None:
+    try:
+        from .bench_access_log import build_app, http_scope, make_receive
+    except ImportError:
+        return None
+
+    from structlog_config.fastapi_access_logger import add_middleware
+
+    configure(json_logger=True)
+    app = build_app(add_middleware)
+    loop = asyncio.new_event_loop()
+
+    async def send(message):
+        pass
+
+    def case():
+        loop.run_until_complete(app(http_scope("/plain"), make_receive(), send))
+
+    return case
+
+
+def run(iterations: int = 10_000, name_filter: str = "") -> dict[str, dict[str, float]]:
+    results: dict[str, dict[str, float]] = {}
+
+    def add(name: str, case: Case, iterations: int = iterations, **kwargs):
+        if name_filter in name:
+            results[name] = measure(case, iterations, **kwargs)
+
+    for json_logger in (True, False):
+        for name, (case, copy) in processor_cases(json_logger).items():
+            if name_filter in name:
+                add(name, case, baseline_ns=measure(copy, iterations)["ns_per_event"])
+
+    for json_logger, mode in ((True, "json"), (False, "console")):
+        add(f"pipeline/{mode}", pipeline_case(json_logger), threads=(1, 4))
+        add(f"stdlib/{mode}", stdlib_case(json_logger), threads=(1, 4))
+
+    for name, case in {
+        **context_cases(),
+        **redaction_cases(),
+        **exception_cases(),
+        **timestamp_cases(),
+    }.items():
+        add(name, case)
+
+    add("redaction/large_payload", large_payload_case(), iterations=iterations // 100)
+
+    if case := access_middleware_case():
+        add("fastapi/access_middleware", case, iterations=iterations // 10)
+
+    # leave the process with a usable logger
+    configure_logger()
+
+    return results
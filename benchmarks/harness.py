@@ -0,0 +1,148 @@
+"""
+Small timing harness shared by the benchmarks.
+
+Every case is a zero-argument callable which processes a single event. We report:
+
+- ns_per_event: best (lowest) mean over several rounds, which filters out scheduler noise
+- alloc_peak_bytes: peak memory traced by tracemalloc while processing one event. Python does not
+  expose a cumulative allocation counter, so the transient peak is the closest proxy for how much
+  garbage an event creates.
+- events_per_second_<n>_threads: throughput with n threads hammering the case concurrently
+"""
+
+import json
+import platform
+import sys
+import threading
+import time
+import tracemalloc
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from typing import Callable
+
+Case = Callable[[], object]
+
+
+def time_case(case: Case, iterations: int, rounds: int = 5) -> float:
+    "ns per call, best of `rounds`"
+    best = float("inf")
+
+    for _ in range(rounds):
+        start = time.perf_counter_ns()
+        for _ in range(iterations):
+            case()
+        best = min(best, (time.perf_counter_ns() - start) / iterations)
+
+    return best
+
+
+def alloc_peak(case: Case, samples: int = 20) -> float:
+    "mean tracemalloc peak in bytes for a single call"
+    # warm up caches so one-time allocations are not attributed to every event
+    case()
+
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(samples):
+            tracemalloc.reset_peak()
+            baseline, _ = tracemalloc.get_traced_memory()
+            case()
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - baseline)
+    finally:
+        tracemalloc.stop()
+
+    return sum(peaks) / len(peaks)
+
+
+def threaded_throughput(case: Case, threads: int, iterations: int) -> float:
+    "events per second across all threads"
+    barrier = threading.Barrier(threads + 1)
+
+    def worker():
+        barrier.wait()
+        for _ in range(iterations):
+            case()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in workers:
+        thread.join()
+
+    return threads * iterations / (time.perf_counter() - start)
+
+
+def measure(
+    case: Case,
+    iterations: int = 10_000,
+    threads: tuple[int, ...] = (),
+    baseline_ns: float = 0.0,
+) -> dict[str, float]:
+    """
+    `baseline_ns` is subtracted from the timing, e.g. the cost of copying the input event dict
+    """
+    result = {
+        "ns_per_event": max(time_case(case, iterations) - baseline_ns, 0.0),
+        "alloc_peak_bytes": alloc_peak(case),
+    }
+
+    for count in threads:
+        result[f"events_per_second_{count}_threads"] = threaded_throughput(
+            case, count, iterations // count
+        )
+
+    return result
+
+
+def environment() -> dict[str, str]:
+    try:
+        package_version = version("structlog_config")
+    except PackageNotFoundError:
+        package_version = "unknown"
+
+    return {
+        "structlog_config": package_version,
+        "structlog": version("structlog"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+    }
+
+
+def save_results(results: dict[str, dict[str, float]], path: Path) -> None:
+    path.write_text(
+        json.dumps({"environment": environment(), "results": results}, indent=2)
+    )
+
+
+def load_results(path: Path) -> dict[str, dict[str, float]]:
+    return json.loads(path.read_text())["results"]
+
+
+def format_results(
+    results: dict[str, dict[str, float]],
+    baseline: dict[str, dict[str, float]] | None = None,
+) -> str:
+    lines = [f"{'case':<48} {'ns/event':>12} {'peak bytes':>12} {'vs baseline':>12}"]
+
+    for name, result in results.items():
+        comparison = ""
+        if baseline and name in baseline and baseline[name]["ns_per_event"]:
+            comparison = (
+                f"{result['ns_per_event'] / baseline[name]['ns_per_event']:.2f}x"
+            )
+
+        lines.append(
+            f"{name:<48} {result['ns_per_event']:>12,.0f} "
+            f"{result['alloc_peak_bytes']:>12,.0f} {comparison:>12}"
+        )
+
+        for key, value in result.items():
+            if key.startswith("events_per_second"):
+                lines.append(f"  {key:<46} {value:>12,.0f}")
+
+    return "\n".join(lines)
@@ -1,11 +1,7 @@
 import logging
-from typing import Protocol
+from typing import Any, Callable, Protocol
 
-import orjson
 import structlog
-import structlog.dev
-from structlog.processors import ExceptionRenderer
-from structlog.tracebacks import ExceptionDictTransformer
 from structlog.typing import FilteringBoundLogger
 
 from structlog_config.formatters import (
@@ -15,111 +11,196 @@ from structlog_config.formatters import (
     pretty_traceback_exception_formatter,
     simplify_activemodel_objects,
 )
+from structlog_config.lazy import Lazy, lazy
+from structlog_config.normalizer import ValueNormalizer, register_converter
 
-from . import packages
-from .constants import NO_COLOR, PYTHON_LOG_PATH
+from . import environments
+from .dedup import DeduplicateProcessor, configure_summary_reporter
 from .environments import is_production, is_pytest, is_staging
+from .exception_cache import CachedExceptionRenderer
+from .file_sink import (
+    FileSink,
+    FileSinkLoggerFactory,
+    get_file_sink,
+    set_file_sink,
+)
+from .instrumentation import (
+    configure_stats_reporter,
+    get_processor_stats,
+    log_processor_stats,
+    reset_processor_stats,
+)
+from .latency_histograms import (
+    LatencyHistograms,
+    get_latency_histograms,
+    set_latency_histograms,
+)
+from .levels import (
+    LevelRouter,
+    get_level_router,
+    install_signal_handlers,
+    parse_level_rules,
+    reset_log_levels,
+    set_level_router,
+    set_log_level,
+)
+from .multiprocess import AtomicBytesLoggerFactory, register_fork_hooks
+from .offload import LogOffloader, get_offloader, set_offloader
+from .pipeline import (
+    Pipeline,
+    build_pipeline,
+    get_default_processors,
+    get_pipeline,
+    log_processors_for_mode,
+    set_pipeline,
+)
+from .queue_writer import (
+    QueuedBytesLoggerFactory,
+    QueuedWriter,
+    get_queued_writer,
+    set_queued_writer,
+)
+from .redaction import Redactor, ValuePattern
+from .request_buffer import (
+    RequestBufferProcessor,
+    get_request_buffer,
+    set_request_buffer,
+)
+from .settings import Settings, get_settings
+from .settings import refresh as refresh_settings
+from .size_guard import SizeGuard, get_truncation_counts, reset_truncation_counts
 from .stdlib_logging import (
-    _get_log_level,
     _get_log_level_name,
     redirect_stdlib_loggers,
     silence_loud_loggers,
 )
 from .warnings import redirect_showwarnings
 
+__all__ = [
+    "AtomicBytesLoggerFactory",
+    "CachedExceptionRenderer",
+    "DeduplicateProcessor",
+    "FileSink",
+    "FileSinkLoggerFactory",
+    "LatencyHistograms",
+    "Lazy",
+    "LevelRouter",
+    "LogOffloader",
+    "LoggerWithContext",
+    "PathPrettifier",
+    "Pipeline",
+    "QueuedBytesLoggerFactory",
+    "QueuedWriter",
+    "Redactor",
+    "RequestBufferProcessor",
+    "Settings",
+    "SizeGuard",
+    "ValueNormalizer",
+    "ValuePattern",
+    "add_fastapi_context",
+    "add_simple_context_aliases",
+    "build_pipeline",
+    "configure_logger",
+    "configure_stats_reporter",
+    "get_default_processors",
+    "get_file_sink",
+    "get_latency_histograms",
+    "get_level_router",
+    "get_offloader",
+    "get_pipeline",
+    "get_processor_stats",
+    "get_queued_writer",
+    "get_request_buffer",
+    "get_settings",
+    "get_truncation_counts",
+    "install_signal_handlers",
+    "is_production",
+    "is_pytest",
+    "is_staging",
+    "lazy",
+    "log_processor_stats",
+    "log_processors_for_mode",
+    "logger_name",
+    "parse_level_rules",
+    "pretty_traceback_exception_formatter",
+    "redirect_showwarnings",
+    "redirect_stdlib_loggers",
+    "refresh_settings",
+    "register_converter",
+    "register_fork_hooks",
+    "reset_log_levels",
+    "reset_processor_stats",
+    "reset_truncation_counts",
+    "set_file_sink",
+    "set_latency_histograms",
+    "set_level_router",
+    "set_log_level",
+    "set_offloader",
+    "set_pipeline",
+    "set_queued_writer",
+    "set_request_buffer",
+    "silence_loud_loggers",
+    "simplify_activemodel_objects",
+]
+
 logging.basicConfig(
     level=_get_log_level_name(),
 )
 
-package_logger = logging.getLogger(__name__)
-
-
-def log_processors_for_mode(json_logger: bool) -> list[structlog.types.Processor]:
-    if json_logger:
+# reinitialize sinks, locks and buffers in forked workers, see `multiprocess`
+register_fork_hooks()
 
-        def orjson_dumps_sorted(value, *args, **kwargs):
-            "sort_keys=True is not supported, so we do it manually"
-            # kwargs includes a default fallback json formatter
-            return orjson.dumps(
-                # starlette-context includes non-string keys (enums)
-                value,
-                option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS,
-                **kwargs,
-            )
-
-        return [
-            # add exc_info=True to a log and get a full stack trace attached to it
-            structlog.processors.format_exc_info,
-            # simple, short exception rendering in prod since sentry is in place
-            # https://www.structlog.org/en/stable/exceptions.html this is a customized version of dict_tracebacks
-            ExceptionRenderer(
-                ExceptionDictTransformer(
-                    show_locals=False,
-                    use_rich=False,
-                    # number of frames is completely arbitrary
-                    max_frames=5,
-                    # TODO `suppress`?
-                )
-            ),
-            # in prod, we want logs to be rendered as JSON payloads
-            structlog.processors.JSONRenderer(serializer=orjson_dumps_sorted),
-        ]
-
-    return [
-        structlog.dev.ConsoleRenderer(
-            colors=not NO_COLOR,
-            exception_formatter=pretty_traceback_exception_formatter
-            if packages.pretty_traceback
-            else structlog.dev.default_exception_formatter,
-        )
-    ]
+package_logger = logging.getLogger(__name__)
 
 
-def get_default_processors(json_logger) -> list[structlog.types.Processor]:
+def _logger_factory(
+    json_logger: bool,
+    queue_writer: QueuedWriter | None = None,
+    file_sink: FileSink | None = None,
+):
     """
-    Return the default list of processors for structlog configuration.
-    """
-    processors = [
-        # although this is stdlib, it's needed, although I'm not sure entirely why
-        structlog.stdlib.add_log_level,
-        structlog.contextvars.merge_contextvars,
-        logger_name,
-        add_fastapi_context if packages.starlette_context else None,
-        simplify_activemodel_objects
-        if packages.activemodel and packages.typeid
-        else None,
-        PathPrettifier(),
-        structlog.processors.TimeStamper(fmt="iso", utc=True),
-        # add `stack_info=True` to a log and get a `stack` attached to the log
-        structlog.processors.StackInfoRenderer(),
-        *log_processors_for_mode(json_logger),
-    ]
-
-    return [processor for processor in processors if processor is not None]
-
-
-def _logger_factory(json_logger: bool):
-    """
-    Allow dev users to redirect logs to a file using PYTHON_LOG_PATH
+    Allow users to redirect logs to a file using PYTHON_LOG_PATH
 
     In production, optimized for speed (https://www.structlog.org/en/stable/performance.html)
     """
 
-    if json_logger:
-        return structlog.BytesLoggerFactory()
+    # the queue writer writes into the file sink when both are enabled
+    if json_logger and queue_writer:
+        return QueuedBytesLoggerFactory(queue_writer)
+
+    if file_sink:
+        return FileSinkLoggerFactory(file_sink)
 
-    if PYTHON_LOG_PATH:
-        python_log = open(PYTHON_LOG_PATH, "a", encoding="utf-8")
-        return structlog.PrintLoggerFactory(file=python_log)
+    if json_logger:
+        # one write per line, so processes sharing stdout don't interleave
+        return AtomicBytesLoggerFactory()
 
     # Default case
     return structlog.PrintLoggerFactory()
 
 
+def _build_file_sink() -> FileSink | None:
+    settings = get_settings()
+
+    if not settings.python_log_path:
+        return None
+
+    return FileSink(
+        settings.python_log_path,
+        buffer_size=settings.log_file_buffer_size,
+        flush_interval=settings.log_file_flush_interval,
+        max_bytes=settings.log_file_max_bytes,
+        rotate_interval=settings.log_file_rotate_interval,
+        backup_count=settings.log_file_backup_count,
+        compress=settings.log_file_compress,
+    )
+
+
 class LoggerWithContext(FilteringBoundLogger, Protocol):
     def context(self, *args, **kwargs) -> None: ...
     def local(self, *args, **kwargs) -> None: ...
     def clear(self) -> None: ...
+    def lazy(self, function: Callable[..., Any], *args, **kwargs) -> Lazy: ...
 
 
 def add_simple_context_aliases(log) -> LoggerWithContext:
@@ -129,12 +210,96 @@ def add_simple_context_aliases(log) -> LoggerWithContext:
     log.local = structlog.contextvars.bind_contextvars
     # clear thread-local context
     log.clear = structlog.contextvars.clear_contextvars
+    # values computed only when the event is emitted: `log.debug("rows", rows=log.lazy(len, rows))`
+    log.lazy = lazy
 
     return log
 
 
+def _build_queue_writer(
+    queue_writer: QueuedWriter | bool | None, file_sink: FileSink | None = None
+) -> QueuedWriter | None:
+    settings = get_settings()
+
+    if queue_writer is None:
+        queue_writer = settings.log_queue_writer
+
+    if queue_writer is True:
+        return QueuedWriter(
+            file_sink,  # type: ignore[arg-type]
+            max_size=settings.log_queue_size,
+            overflow=settings.log_queue_overflow,  # type: ignore[arg-type]
+        )
+
+    return queue_writer or None
+
+
+def _build_request_buffer(
+    request_buffer: RequestBufferProcessor | bool | None,
+) -> RequestBufferProcessor | None:
+    settings = get_settings()
+
+    if request_buffer is None:
+        request_buffer = settings.log_request_buffer
+
+    if request_buffer is True:
+        return RequestBufferProcessor(
+            level=settings.log_request_buffer_level,
+            emit_level=settings.log_level,
+            slow_ms=settings.log_request_buffer_slow_ms,
+            max_bytes=settings.log_request_buffer_max_bytes,
+            max_total_bytes=settings.log_request_buffer_total_bytes,
+        )
+
+    return request_buffer or None
+
+
+def _build_dedup(
+    dedup: DeduplicateProcessor | bool | None,
+) -> DeduplicateProcessor | None:
+    settings = get_settings()
+
+    if dedup is None:
+        dedup = settings.log_dedup
+
+    if dedup is True:
+        return DeduplicateProcessor(
+            interval=settings.log_dedup_interval,
+            max_fingerprints=settings.log_dedup_max_fingerprints,
+        )
+
+    return dedup or None
+
+
+def _build_offloader(offload: LogOffloader | bool | None) -> LogOffloader | None:
+    settings = get_settings()
+
+    if offload is None:
+        offload = settings.log_offload
+
+    if isinstance(offload, LogOffloader):
+        return offload
+
+    if offload or settings.log_offload_measure:
+        return LogOffloader(
+            offload=offload,
+            measure=settings.log_offload_measure,
+            max_size=settings.log_offload_queue_size,
+        )
+
+    return None
+
+
 def configure_logger(
-    *, logger_factory=None, json_logger: bool | None = None
+    *,
+    logger_factory=None,
+    json_logger: bool | None = None,
+    queue_writer: QueuedWriter | bool | None = None,
+    instrument_processors: bool | None = None,
+    request_buffer: RequestBufferProcessor | bool | None = None,
+    latency_histograms: LatencyHistograms | bool | None = None,
+    offload: LogOffloader | bool | None = None,
+    dedup: DeduplicateProcessor | bool | None = None,
 ) -> LoggerWithContext:
     """
     Create a struct logger with some special additions:
@@ -150,24 +315,128 @@ def configure_logger(
         logger_factory: Optional logger factory to override the default
         json_logger: Optional flag to use JSON logging. If None, defaults to
             production or staging environment sourced from PYTHON_ENV.
+        queue_writer: Write JSON logs from a background thread through a bounded queue. Pass a
+            `QueuedWriter` to control the queue size and overflow policy. If None, defaults to
+            LOG_QUEUE_WRITER. Ignored when `logger_factory` is provided or JSON logging is off.
+        instrument_processors: Collect per-processor timings, available through
+            `get_processor_stats()`. If None, defaults to LOG_PROCESSOR_TIMING.
+        request_buffer: Buffer events below the log level per request and only emit them for failed
+            or slow requests, see `request_buffer`. Pass a `RequestBufferProcessor` to control the
+            levels and caps. If None, defaults to LOG_REQUEST_BUFFER.
+        latency_histograms: Record per-route latency histograms in the access log middleware,
+            summarized every LOG_ACCESS_HISTOGRAM_INTERVAL seconds. If None, defaults to
+            LOG_ACCESS_HISTOGRAMS.
+        offload: Process events logged on an asyncio event loop on a worker thread, see `offload`.
+            Pass a `LogOffloader` to measure the time the loop spends logging. If None, defaults to
+            LOG_OFFLOAD.
+        dedup: Drop repeated events, emitting `repeated=N` periodically, see `dedup`. Pass a
+            `DeduplicateProcessor` to choose the fingerprint keys. If None, defaults to LOG_DEDUP.
     """
     # Reset structlog configuration to make sure we're starting fresh
     # This is important for tests where configure_logger might be called multiple times
     structlog.reset_defaults()
 
+    # configuration is the point where the environment is resolved, everything afterwards reads the snapshot
+    settings = refresh_settings()
+
     if json_logger is None:
-        json_logger = is_production() or is_staging()
+        # looked up through the module so tests can monkeypatch them
+        json_logger = environments.is_production() or environments.is_staging()
+
+    # close the previous writer and sink before opening new ones: the writer may write into the
+    # sink, and the sink may be for the same path
+    set_offloader(None)
+    set_queued_writer(None)
+    set_file_sink(None)
+    file_sink = _build_file_sink() if not logger_factory else None
+    set_file_sink(file_sink)
+
+    writer = (
+        _build_queue_writer(queue_writer, file_sink)
+        if json_logger and not logger_factory
+        else None
+    )
+    set_queued_writer(writer)
+
+    if instrument_processors is None:
+        instrument_processors = settings.log_processor_timing
 
-    redirect_stdlib_loggers(json_logger)
+    # built once, so both chains share processor instances and their cached state
+    pipeline = build_pipeline(json_logger)
+    set_pipeline(pipeline)
+
+    redirect_stdlib_loggers(
+        json_logger,
+        instrument=instrument_processors,
+        pipeline=pipeline,
+        file_sink=file_sink,
+        queue_writer=writer,
+    )
     redirect_showwarnings()
     silence_loud_loggers()
 
+    if instrument_processors:
+        pipeline = pipeline.instrumented(chain="structlog")
+
+    configure_stats_reporter(
+        settings.log_processor_timing_interval if instrument_processors else 0
+    )
+
+    if latency_histograms is None:
+        latency_histograms = settings.log_access_histograms
+
+    set_latency_histograms(
+        LatencyHistograms()
+        if latency_histograms is True
+        else latency_histograms or None,
+        settings.log_access_histogram_interval,
+    )
+
+    processors = pipeline.chain
+
+    offloader = _build_offloader(offload)
+    set_offloader(offloader)
+
+    if offloader:
+        offloader.downstream = processors
+        processors = [offloader, *processors]
+
+    buffer = _build_request_buffer(request_buffer)
+    set_request_buffer(buffer)
+
+    # events between the buffer level and the log level have to reach the buffer processor
+    level_router = LevelRouter.from_settings(floor=buffer.level if buffer else None)
+    # `set_log_level` changes the levels of this router at runtime
+    set_level_router(level_router)
+
+    if settings.log_level_signals:
+        install_signal_handlers(settings.log_level_signal_ttl or None)
+
+    if buffer:
+        buffer.downstream = processors
+        buffer.levels = level_router.level_for
+        processors = [buffer, *processors]
+
+    dedup_processor = _build_dedup(dedup)
+
+    if dedup_processor:
+        # first, dropped events cost nothing further
+        processors = [dedup_processor, *processors]
+
+    configure_summary_reporter(
+        settings.log_dedup_interval
+        if dedup_processor or settings.log_dedup_warnings
+        else 0
+    )
+
     structlog.configure(
         # Don't cache the loggers during tests, it makes it hard to capture them
         cache_logger_on_first_use=not is_pytest(),
-        wrapper_class=structlog.make_filtering_bound_logger(_get_log_level()),
-        logger_factory=logger_factory or _logger_factory(json_logger),
-        processors=get_default_processors(json_logger),
+        # the level is picked per `logger_name`, see LOG_LEVELS
+        wrapper_class=level_router,
+        logger_factory=logger_factory
+        or _logger_factory(json_logger, writer, file_sink),
+        processors=processors,
     )
 
     log = structlog.get_logger()
@@ -0,0 +1,210 @@
+"""
+Sampling and rate limiting for the access log.
+
+Health checks and high-QPS polling endpoints dominate access log volume. An `AccessLogSampler`
+decides per request whether its access log line is emitted, based on the resolved route name:
+
+- per-route sample rates, e.g. `*.healthcheck=0.01` keeps 1% of health checks
+- per-route token buckets, e.g. `*.poll=5` emits at most 5 lines per second (bursts up to 5)
+- errors (5xx by default) and slow requests are always logged
+
+Emitted lines carry a `sample_rate` field: the fraction of requests the line stands for, so counts
+downstream can be corrected by summing `1 / sample_rate`.
+"""
+
+import random
+import threading
+import weakref
+from fnmatch import fnmatchcase
+from time import monotonic
+from typing import Callable
+
+from .settings import get_settings
+
+MAX_CACHED_ROUTES = 4096
+
+_samplers: "weakref.WeakSet[AccessLogSampler]" = weakref.WeakSet()
+
+
+def parse_route_values(value: str) -> dict[str, float]:
+    "Parse `pattern=number,pattern=number` as used by LOG_ACCESS_SAMPLE_RATES"
+    parsed = {}
+
+    for entry in value.split(","):
+        if not entry.strip():
+            continue
+
+        pattern, _, number = entry.rpartition("=")
+        if not pattern:
+            raise ValueError(f"expected pattern=number, got {entry!r}")
+
+        parsed[pattern.strip()] = float(number)
+
+    return parsed
+
+
+class TokenBucket:
+    "Allows `rate` events per second, with bursts up to `burst` events"
+
+    __slots__ = ("rate", "burst", "tokens", "updated", "skipped", "_lock")
+
+    def __init__(self, rate: float, burst: float | None = None) -> None:
+        self.rate = rate
+        self.burst = burst or max(rate, 1.0)
+        self.tokens = self.burst
+        self.updated = monotonic()
+        self.skipped = 0
+        "requests refused since the last one which was allowed"
+        self._lock = threading.Lock()
+
+    def take(self) -> int | None:
+        """
+        Take a token. Returns the number of requests refused since the previous successful call, or
+        None if no token is available.
+        """
+        with self._lock:
+            now = monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+
+            if self.tokens < 1:
+                self.skipped += 1
+                return None
+
+            self.tokens -= 1
+            skipped, self.skipped = self.skipped, 0
+            return skipped
+
+
+class _RoutePolicy:
+    __slots__ = ("rate", "bucket")
+
+    def __init__(self, rate: float, bucket: TokenBucket | None) -> None:
+        self.rate = rate
+        self.bucket = bucket
+
+
+class AccessLogSampler:
+    """
+    Args:
+        default_rate: sample rate of routes which no pattern in `rates` matches
+        rates: route name glob pattern to sample rate, the first matching pattern wins
+        limits: route name glob pattern to the maximum number of lines per second
+        always_log_status: responses with this status or above are always logged
+        slow_ms: requests slower than this are always logged, 0 disables
+        random: source of randomness, for tests
+    """
+
+    def __init__(
+        self,
+        *,
+        default_rate: float = 1.0,
+        rates: dict[str, float] | None = None,
+        limits: dict[str, float] | None = None,
+        always_log_status: int = 500,
+        slow_ms: float = 1000,
+        random: Callable[[], float] = random.random,
+    ) -> None:
+        self.default_rate = default_rate
+        self.rates = rates or {}
+        self.limits = limits or {}
+        self.always_log_status = always_log_status
+        self.slow_ms = slow_ms
+        self.random = random
+
+        # glob matching is too slow to do per request, unmatched paths (404s) are unbounded though
+        self._policies: dict[str, _RoutePolicy] = {}
+        self._lock = threading.Lock()
+
+        _samplers.add(self)
+
+    @classmethod
+    def from_settings(cls) -> "AccessLogSampler | None":
+        "The sampler configured through the environment, or None if sampling is not configured"
+        settings = get_settings()
+
+        rates = parse_route_values(settings.log_access_sample_rates)
+        limits = parse_route_values(settings.log_access_rate_limits)
+
+        if settings.log_access_sample_rate >= 1 and not rates and not limits:
+            return None
+
+        return cls(
+            default_rate=settings.log_access_sample_rate,
+            rates=rates,
+            limits=limits,
+            slow_ms=settings.log_access_slow_ms,
+        )
+
+    def _policy(self, route: str) -> _RoutePolicy:
+        if policy := self._policies.get(route):
+            return policy
+
+        rate = next(
+            (
+                rate
+                for pattern, rate in self.rates.items()
+                if fnmatchcase(route, pattern)
+            ),
+            self.default_rate,
+        )
+        limit = next(
+            (
+                limit
+                for pattern, limit in self.limits.items()
+                if fnmatchcase(route, pattern)
+            ),
+            None,
+        )
+        policy = _RoutePolicy(rate, TokenBucket(limit) if limit else None)
+
+        with self._lock:
+            if len(self._policies) >= MAX_CACHED_ROUTES:
+                self._policies.clear()
+
+            # another thread may have won, keep its token bucket
+            return self._policies.setdefault(route, policy)
+
+    def sample(
+        self, route: str, status_code: int, elapsed_ms: float, failed: bool = False
+    ) -> float | None:
+        """
+        Returns the `sample_rate` to attach to the access log line, or None if the line should be
+        skipped.
+        """
+        if (
+            failed
+            or status_code >= self.always_log_status
+            or (self.slow_ms > 0 and elapsed_ms >= self.slow_ms)
+        ):
+            return 1.0
+
+        policy = self._policy(route)
+
+        if policy.rate < 1 and self.random() >= policy.rate:
+            return None
+
+        if policy.bucket is None:
+            return policy.rate
+
+        skipped = policy.bucket.take()
+        if skipped is None:
+            return None
+
+        # this line also stands for the requests the bucket refused since the last emitted line
+        return policy.rate / (1 + skipped)
+
+    def _after_fork_in_child(self) -> None:
+        # the locks may have been held by other threads, the token buckets are per process anyway
+        self._lock = threading.Lock()
+
+        for policy in self._policies.values():
+            if policy.bucket is not None:
+                policy.bucket._lock = threading.Lock()
+
+
+def _after_fork_in_child() -> None:
+    for sampler in list(_samplers):
+        sampler._after_fork_in_child()
@@ -1,9 +1,68 @@
-import os
+"""
+Environment-derived constants, kept for backwards compatibility.
 
-from decouple import config
+These are read from the `Settings` snapshot when accessed. Prefer `get_settings()`, which reflects
+`refresh()`: `from structlog_config.constants import NO_COLOR` binds the value at import time.
+"""
 
-PYTHON_LOG_PATH = config("PYTHON_LOG_PATH", default=None)
-PYTHONASYNCIODEBUG = config("PYTHONASYNCIODEBUG", default=False, cast=bool)
+from typing import Any
 
-NO_COLOR = "NO_COLOR" in os.environ
-"support NO_COLOR standard https://no-color.org"
+from .settings import config, get_settings
+
+__all__ = ["config"]
+
+_SETTINGS_FIELDS = {
+    "LOG_LEVELS": "log_levels",
+    "LOG_LEVEL_SIGNALS": "log_level_signals",
+    "LOG_LEVEL_SIGNAL_TTL": "log_level_signal_ttl",
+    "PYTHON_LOG_PATH": "python_log_path",
+    "LOG_FILE_BUFFER_SIZE": "log_file_buffer_size",
+    "LOG_FILE_FLUSH_INTERVAL": "log_file_flush_interval",
+    "LOG_FILE_MAX_BYTES": "log_file_max_bytes",
+    "LOG_FILE_ROTATE_INTERVAL": "log_file_rotate_interval",
+    "LOG_FILE_BACKUP_COUNT": "log_file_backup_count",
+    "LOG_FILE_COMPRESS": "log_file_compress",
+    "PYTHONASYNCIODEBUG": "pythonasynciodebug",
+    "NO_COLOR": "no_color",
+    "LOG_QUEUE_WRITER": "log_queue_writer",
+    "LOG_QUEUE_SIZE": "log_queue_size",
+    "LOG_QUEUE_OVERFLOW": "log_queue_overflow",
+    "LOG_PROCESSOR_TIMING": "log_processor_timing",
+    "LOG_PROCESSOR_TIMING_INTERVAL": "log_processor_timing_interval",
+    "LOG_TIMESTAMP_EPOCH_NS": "log_timestamp_epoch_ns",
+    "LOG_CONTEXT_FRAGMENTS": "log_context_fragments",
+    "LOG_DEDUP": "log_dedup",
+    "LOG_DEDUP_WARNINGS": "log_dedup_warnings",
+    "LOG_DEDUP_INTERVAL": "log_dedup_interval",
+    "LOG_DEDUP_MAX_FINGERPRINTS": "log_dedup_max_fingerprints",
+    "LOG_EXCEPTION_CACHE_SIZE": "log_exception_cache_size",
+    "LOG_EXCEPTION_COMPACT_AFTER": "log_exception_compact_after",
+    "LOG_EXCEPTION_COMPACT_WINDOW": "log_exception_compact_window",
+    "LOG_REDACT": "log_redact",
+    "LOG_REDACT_KEYS": "log_redact_keys",
+    "LOG_REDACT_PATTERNS": "log_redact_patterns",
+    "LOG_MAX_STRING_LENGTH": "log_max_string_length",
+    "LOG_MAX_COLLECTION_LENGTH": "log_max_collection_length",
+    "LOG_MAX_DEPTH": "log_max_depth",
+    "LOG_REQUEST_BUFFER": "log_request_buffer",
+    "LOG_REQUEST_BUFFER_LEVEL": "log_request_buffer_level_name",
+    "LOG_REQUEST_BUFFER_SLOW_MS": "log_request_buffer_slow_ms",
+    "LOG_REQUEST_BUFFER_MAX_BYTES": "log_request_buffer_max_bytes",
+    "LOG_REQUEST_BUFFER_TOTAL_BYTES": "log_request_buffer_total_bytes",
+    "LOG_ACCESS_SAMPLE_RATE": "log_access_sample_rate",
+    "LOG_ACCESS_SAMPLE_RATES": "log_access_sample_rates",
+    "LOG_ACCESS_RATE_LIMITS": "log_access_rate_limits",
+    "LOG_ACCESS_SLOW_MS": "log_access_slow_ms",
+    "LOG_OFFLOAD": "log_offload",
+    "LOG_OFFLOAD_MEASURE": "log_offload_measure",
+    "LOG_OFFLOAD_QUEUE_SIZE": "log_offload_queue_size",
+    "LOG_ACCESS_HISTOGRAMS": "log_access_histograms",
+    "LOG_ACCESS_HISTOGRAM_INTERVAL": "log_access_histogram_interval",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if field := _SETTINGS_FIELDS.get(name):
+        return getattr(get_settings(), field)
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
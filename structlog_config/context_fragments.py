@@ -0,0 +1,241 @@
+"""
+Request-scoped context serialized once, instead of once per event.
+
+`merge_contextvars` and `add_fastapi_context` copy the bound context (request_id, user_id, ...) into
+every event, and the JSON renderer normalizes and serializes those values again for each line. With
+LOG_CONTEXT_FRAGMENTS, `ContextFragments` replaces both processors in JSON mode: the bound values are
+normalized once into a `ContextFragment`, which is cached for as long as the bound values stay the
+same. The renderer serializes the fragment the first time it sees it and splices the cached JSON into
+every line.
+
+Reading the bound values costs about as much as merging them, so this only pays off for large
+immutable contexts (see the `context/` benchmarks), and it changes the key order of JSON lines. It is
+off by default.
+
+The fragment is cached in a contextvar, and by the identity of the bound values on the
+`ContextFragments` processor, for events which are processed in a copy of the caller's context (the
+offload worker, request buffer flushes): the contextvar set in the copy is discarded after the
+event. On each event, the current value of every structlog contextvar is compared by identity with
+the ones the cached fragment was built from, so values bound through `log.context`, `log.local`,
+`structlog.contextvars` or starlette-context are all picked up without hooking into how they were
+bound. The values are read with `get_contextvars`.
+
+Only immutable values (strings, numbers, UUIDs, dates, tuples of those, ...) are cached. A dict or an
+object bound to the context can be changed in place while it stays bound, so mutable values, like
+`lazy` ones, are merged into every event and rendered as they are at that point.
+
+Context keys are rendered first, sorted, followed by the sorted event keys. As before, keys passed
+to the log call (or added by processors) win over contextvars, and starlette-context wins over both.
+"""
+
+import contextvars
+from datetime import date, time, timedelta
+from decimal import Decimal
+from enum import Enum
+from operator import is_
+from pathlib import PurePath
+from typing import Any, Callable, Iterable
+from uuid import UUID
+
+from structlog.contextvars import get_contextvars
+from structlog.types import Processor
+
+from . import packages
+
+FRAGMENT_KEY = "_context_fragment"
+"where `ContextFragments` leaves the fragment for the renderer"
+
+CONTEXT_METHOD_NAME = "context"
+"the method name the processors of `ContextFragments` are called with"
+
+# not prefixed with `structlog_`, those are merged into events
+_cached_fragment: contextvars.ContextVar["ContextFragment | None"] = (
+    contextvars.ContextVar("context_fragment", default=None)
+)
+
+
+MAX_CACHED_FRAGMENTS = 1024
+
+# `datetime` is a subclass of `date`, checked with isinstance like `Enum` and `PurePath`
+_IMMUTABLE_TYPES = frozenset(
+    {str, int, float, bool, type(None), bytes, UUID, Decimal, time, timedelta}
+)
+
+
+def _is_immutable(value: Any) -> bool:
+    value_type = type(value)
+
+    if value_type in _IMMUTABLE_TYPES:
+        return True
+
+    if value_type is tuple or value_type is frozenset:
+        return all(map(_is_immutable, value))
+
+    return isinstance(value, (date, Enum, PurePath))
+
+
+def _same_values(left: tuple, right: tuple) -> bool:
+    return len(left) == len(right) and all(map(is_, left, right))
+
+
+def _join(pairs: list) -> Any:
+    if not pairs:
+        return None
+
+    return (b"," if isinstance(pairs[0], bytes) else ",").join(pairs)
+
+
+class ContextFragment:
+    """
+    Normalized context values, and their serialized `"key":value` pairs per renderer.
+    """
+
+    __slots__ = ("builder", "keys", "bound", "overrides", "values", "live", "_rendered")
+
+    def __init__(
+        self,
+        builder: "ContextFragments",
+        keys: tuple,
+        bound: tuple,
+        overrides: tuple,
+        values: dict,
+        live: dict[str, Any],
+    ) -> None:
+        self.builder = builder
+        "fragments are rebuilt after `configure_logger` creates a new pipeline"
+        self.keys = keys
+        "keys of the structlog contextvars the fragment was built from"
+        self.bound = bound
+        "values of the structlog contextvars the fragment was built from, compared by identity"
+        self.overrides = overrides
+        "starlette-context items the fragment was built from, these keys win over the event's"
+        self.values = values
+        self.live = live
+        "`lazy` and mutable values, merged into the event to be rendered as they are per event"
+        self._rendered: dict[Any, tuple[dict[Any, Any], Any]] = {}
+
+    def matches(
+        self, builder: "ContextFragments", keys: tuple, bound: tuple, overrides: tuple
+    ) -> bool:
+        return (
+            self.builder is builder
+            and _same_values(self.bound, bound)
+            and self.keys == keys
+            and _same_values(self.overrides, overrides)
+        )
+
+    def render(
+        self, renderer: Any, dumps: Callable[[dict], Any], exclude: Iterable[Any]
+    ) -> Any:
+        """
+        The comma-separated `"key":value` pairs (str or bytes, like `dumps`) without the keys in
+        `exclude`, or None if there is nothing left. Serialized once per renderer.
+        """
+        try:
+            pairs, joined = self._rendered[renderer]
+        except KeyError:
+            # `{"key":value}` minus the braces, ordered like the serialized keys
+            pairs = dict(
+                sorted(
+                    (
+                        (key, dumps({key: value})[1:-1])
+                        for key, value in self.values.items()
+                    ),
+                    key=lambda pair: pair[1],
+                )
+            )
+            joined = _join(list(pairs.values()))
+            self._rendered[renderer] = (pairs, joined)
+
+        if pairs.keys().isdisjoint(exclude):
+            return joined
+
+        return _join([pair for key, pair in pairs.items() if key not in exclude])
+
+
+class ContextFragments:
+    """
+    Processor which merges the bound context as a cached `ContextFragment`, in place of
+    `merge_contextvars` and `add_fastapi_context`. Must be followed by a renderer which splices
+    fragments, see `renderers.FragmentJSONRenderer`.
+
+    Args:
+        processors: run over the context values once, when a fragment is built. The processors
+            which convert values (`ValueNormalizer`) are otherwise skipped for context values.
+    """
+
+    def __init__(self, processors: list[Processor] | None = None) -> None:
+        self.processors = processors or []
+        self.starlette_context = packages.starlette_context
+        # keyed on the ids of the bound values, which the fragment keeps alive so they aren't reused
+        self._fragments: dict[tuple, ContextFragment] = {}
+
+    def _overrides(self) -> tuple:
+        if not self.starlette_context:
+            return ()
+
+        from starlette_context import context
+
+        if not context.exists():
+            return ()
+
+        # flattened to keys and values, so it is compared like the contextvars
+        return tuple(item for pair in context.data.items() for item in pair)
+
+    def build(
+        self, keys: tuple, bound: tuple, overrides: tuple, context: dict
+    ) -> ContextFragment:
+        "`context` is the merged context the snapshots `keys`, `bound` and `overrides` stand for"
+        # including `lazy` values
+        live = {
+            key: value for key, value in context.items() if not _is_immutable(value)
+        }
+
+        for key in live:
+            del context[key]
+
+        for processor in self.processors:
+            context = processor(None, CONTEXT_METHOD_NAME, context)
+
+        return ContextFragment(self, keys, bound, overrides, context, live)
+
+    def __call__(self, logger: Any, method_name: str, event_dict: dict) -> dict:
+        context = get_contextvars()
+        keys = tuple(context)
+        bound = tuple(context.values())
+        overrides = self._overrides()
+
+        fragment = _cached_fragment.get()
+
+        if fragment is None or not fragment.matches(self, keys, bound, overrides):
+            fragment = self._cached(context, keys, bound, overrides)
+            _cached_fragment.set(fragment)
+
+        if not fragment.values and not fragment.live:
+            return event_dict
+
+        for key in overrides[::2]:
+            event_dict.pop(key, None)
+
+        for key, value in fragment.live.items():
+            event_dict.setdefault(key, value)
+
+        event_dict[FRAGMENT_KEY] = fragment
+        return event_dict
+
+    def _cached(
+        self, context: dict, keys: tuple, bound: tuple, overrides: tuple
+    ) -> ContextFragment:
+        key = (keys, *map(id, bound), None, *map(id, overrides))
+        fragment = self._fragments.get(key)
+
+        if fragment is None or not fragment.matches(self, keys, bound, overrides):
+            context.update(zip(overrides[::2], overrides[1::2]))
+            fragment = self.build(keys, bound, overrides, context)
+
+            if len(self._fragments) >= MAX_CACHED_FRAGMENTS:
+                self._fragments.clear()
+
+            self._fragments[key] = fragment
+
+        return fragment
@@ -0,0 +1,228 @@
+"""
+Throttling of repeated log events.
+
+A deprecation warning in a hot loop, or the same error logged for every item of a batch, turns into
+thousands of identical lines. A `Deduplicator` tracks event fingerprints in a bounded LRU: the first
+occurrence is emitted, further occurrences within `interval` seconds are counted and dropped, and
+the next occurrence after that is emitted with `repeated=N`, the number of occurrences dropped in
+between. Counts which are never followed by another occurrence are reported as a summary event when
+the fingerprint is evicted from the LRU, by a reporter thread once their interval has passed, and at
+exit.
+
+`redirect_showwarnings` throttles Python warnings this way, and `DeduplicateProcessor` does the same
+for arbitrary structlog events.
+"""
+
+import atexit
+import threading
+import weakref
+from collections import OrderedDict
+from time import monotonic
+from typing import Any, Callable, Hashable
+
+import structlog
+
+from .instrumentation import StatsReporter
+
+REPEATED_KEY = "repeated"
+"occurrences dropped since the previous emitted one. Events which have it are never throttled."
+
+SUMMARY_EVENT = "repeated event"
+"event of summaries whose fingerprint does not include the event itself"
+
+SummaryCallback = Callable[[Hashable, int], None]
+
+_deduplicators: "weakref.WeakSet[Deduplicator]" = weakref.WeakSet()
+_reporter: StatsReporter | None = None
+
+
+class Deduplicator:
+    """
+    Args:
+        interval: seconds during which repeated occurrences of a fingerprint are dropped
+        max_fingerprints: fingerprints tracked, the least recently seen one is evicted
+        on_summary: called with the fingerprint and the number of dropped occurrences which were
+            not reported by a later occurrence, on eviction and by `flush`
+    """
+
+    def __init__(
+        self,
+        *,
+        interval: float = 60.0,
+        max_fingerprints: int = 1024,
+        on_summary: SummaryCallback | None = None,
+        clock: Callable[[], float] = monotonic,
+    ) -> None:
+        self.interval = interval
+        self.max_fingerprints = max_fingerprints
+        self.on_summary = on_summary
+        self.clock = clock
+
+        # fingerprint to [last emitted at, dropped since]
+        self._entries: OrderedDict[Hashable, list] = OrderedDict()
+        self._lock = threading.Lock()
+
+        _deduplicators.add(self)
+        # registered again, so the summaries are logged before the writers and sinks (which were
+        # created earlier) are closed at exit
+        atexit.unregister(_flush_all)
+        atexit.register(_flush_all)
+
+    def check(self, fingerprint: Hashable) -> int | None:
+        """
+        Record an occurrence. Returns None if it should be dropped, otherwise the number of
+        occurrences dropped since the previous one which was emitted.
+        """
+        now = self.clock()
+        evicted = None
+
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+
+            if entry is None:
+                self._entries[fingerprint] = [now, 0]
+
+                if len(self._entries) > self.max_fingerprints:
+                    evicted = self._entries.popitem(last=False)
+
+                repeated = 0
+            else:
+                self._entries.move_to_end(fingerprint)
+
+                if now - entry[0] < self.interval:
+                    entry[1] += 1
+                    return None
+
+                repeated = entry[1]
+                entry[0] = now
+                entry[1] = 0
+
+        # outside of the lock, the summary is logged and may come back here
+        if evicted and evicted[1][1]:
+            self._summarize(evicted[0], evicted[1][1])
+
+        return repeated
+
+    def flush(self, *, expired: bool = False) -> None:
+        """
+        Report the dropped occurrences of every fingerprint. Called at exit. With `expired`, only
+        those of fingerprints last emitted `interval` seconds ago or earlier, as the reporter thread
+        does: the next occurrence of those is not dropped, but nothing guarantees there is one.
+        """
+        since = self.clock() - self.interval if expired else float("inf")
+
+        with self._lock:
+            pending = [
+                (fingerprint, entry[1])
+                for fingerprint, entry in self._entries.items()
+                if entry[1] and entry[0] <= since
+            ]
+
+            for fingerprint, _ in pending:
+                self._entries[fingerprint][1] = 0
+
+        for fingerprint, count in pending:
+            self._summarize(fingerprint, count)
+
+    def _summarize(self, fingerprint: Hashable, count: int) -> None:
+        if self.on_summary is not None:
+            self.on_summary(fingerprint, count)
+
+    def _after_fork_in_child(self) -> None:
+        # the lock may have been held by another thread, and the parent reports its own counts
+        self._lock = threading.Lock()
+        self._entries.clear()
+
+
+def _flush_all() -> None:
+    for deduplicator in list(_deduplicators):
+        deduplicator.flush()
+
+
+def _flush_expired() -> None:
+    for deduplicator in list(_deduplicators):
+        deduplicator.flush(expired=True)
+
+
+def configure_summary_reporter(interval: float) -> None:
+    """
+    Replace the thread which reports the counts of fingerprints that were not seen again within
+    their interval, every `interval` seconds. An interval of 0 disables it, counts are then only
+    reported on eviction and at exit.
+    """
+    global _reporter
+
+    if _reporter is not None:
+        _reporter.cancel()
+        _reporter = None
+
+    if interval > 0:
+        _reporter = StatsReporter(
+            interval, report=_flush_expired, name="structlog-dedup-summaries"
+        ).start()
+
+
+def _after_fork_in_child() -> None:
+    for deduplicator in list(_deduplicators):
+        deduplicator._after_fork_in_child()
+
+    # the reporter thread only exists in the parent
+    if _reporter is not None:
+        configure_summary_reporter(_reporter.interval)
+
+
+class DeduplicateProcessor:
+    """
+    Drops repeated structlog events, see `Deduplicator`. The fingerprint is the method name plus
+    the values of `keys`. Add it in front of the structlog chain, where the bound `logger_name` is
+    still available and before any work is done on events which are dropped.
+    """
+
+    def __init__(
+        self,
+        keys: tuple[str, ...] = ("logger_name", "event"),
+        *,
+        interval: float = 60.0,
+        max_fingerprints: int = 1024,
+    ) -> None:
+        self.keys = keys
+        self.deduplicator = Deduplicator(
+            interval=interval,
+            max_fingerprints=max_fingerprints,
+            on_summary=self._log_summary,
+        )
+
+    def __call__(self, logger: Any, method_name: str, event_dict: dict) -> dict:
+        if REPEATED_KEY in event_dict:
+            return event_dict
+
+        fingerprint = (method_name, *[event_dict.get(key) for key in self.keys])
+
+        try:
+            hash(fingerprint)
+        except TypeError:
+            # unhashable values can't be fingerprinted, never throttle those
+            return event_dict
+
+        repeated = self.deduplicator.check(fingerprint)
+
+        if repeated is None:
+            raise structlog.DropEvent
+
+        if repeated:
+            event_dict[REPEATED_KEY] = repeated
+
+        return event_dict
+
+    def _log_summary(self, fingerprint: Hashable, count: int) -> None:
+        method_name, *values = fingerprint  # type: ignore[misc]
+        fields = dict(zip(self.keys, values))
+        logger_name = fields.pop("logger_name", None)
+        event = fields.pop("event", None) or SUMMARY_EVENT
+
+        log = (
+            structlog.get_logger(logger_name=logger_name)
+            if logger_name
+            else structlog.get_logger()
+        )
+        getattr(log, method_name)(event, **fields, **{REPEATED_KEY: count})
@@ -1,11 +1,10 @@
 import os
-import typing as t
 
-from decouple import config
+from .settings import get_settings
 
 
 def python_environment() -> str:
-    return t.cast(str, config("PYTHON_ENV", default="development", cast=str)).lower()
+    return get_settings().python_env
 
 
 def is_testing():
@@ -27,5 +26,7 @@ def is_development():
 def is_pytest():
     """
     PYTEST_CURRENT_TEST is set by pytest to indicate the current test being run
+
+    This is not part of the settings snapshot: pytest sets and clears it around every test.
     """
     return "PYTEST_CURRENT_TEST" in os.environ
@@ -0,0 +1,337 @@
+"""
+Exception rendering with cached tracebacks, for the JSON pipeline.
+
+During an outage the same exception is raised from the same place thousands of times per second,
+and `format_exc_info` extracts and formats every frame (source lines from linecache, caret
+positions) each time. `CachedExceptionRenderer` fingerprints an exception by its type and the code
+locations of its traceback (the code object and instruction of every frame, for every exception of
+the `__cause__` / `__context__` chain) and keeps the formatted frames in an LRU keyed on that. A
+repeated exception reuses them and only its message is formatted again.
+
+The output is identical to `format_exc_info`. Exception groups, syntax errors and a set
+`sys.tracebacklimit` are rare enough to be formatted by `format_exc_info`, uncached.
+
+With `compact_after`, every exception gets an `exception_fingerprint`, and an exception which was
+rendered more than `compact_after` times within `compact_window` seconds is logged as its last line
+only (`ValueError: boom`), without the frames.
+"""
+
+import builtins
+import hashlib
+import sys
+import threading
+import traceback
+import weakref
+from collections import OrderedDict
+from collections.abc import Sequence
+from dataclasses import dataclass
+from time import monotonic
+from types import TracebackType
+from typing import Any, Callable
+
+import structlog
+
+from .settings import get_settings
+
+FINGERPRINT_KEY = "exception_fingerprint"
+
+_STACK_HEADER = "Traceback (most recent call last):\n"
+# copies of the private `traceback._cause_message` and `traceback._context_message`
+_CAUSE_MESSAGE = (
+    "\nThe above exception was the direct cause of the following exception:\n\n"
+)
+_CONTEXT_MESSAGE = (
+    "\nDuring handling of the above exception, another exception occurred:\n\n"
+)
+
+# not available before python 3.11, nothing is an instance of an empty tuple
+_EXCEPTION_GROUP: Any = getattr(builtins, "BaseExceptionGroup", ())
+_HAS_NOTES = sys.version_info >= (3, 11)
+
+_renderers: "weakref.WeakSet[CachedExceptionRenderer]" = weakref.WeakSet()
+
+
+@dataclass(slots=True)
+class _Entry:
+    stacks: list[str]
+    "formatted frames of every exception of the chain, oldest first"
+    fingerprint: str
+    window_start: float = 0.0
+    occurrences: int = 0
+
+
+class CachedExceptionRenderer:
+    """
+    Drop-in replacement for `structlog.processors.format_exc_info`.
+
+    Args:
+        max_fingerprints: formatted tracebacks kept, the least recently rendered one is evicted
+        compact_after: renderings of a fingerprint within `compact_window` which get the full
+            traceback, later ones only the last line. 0 disables, and omits `exception_fingerprint`
+        compact_window: seconds after which a fingerprint gets full tracebacks again
+    """
+
+    def __init__(
+        self,
+        *,
+        max_fingerprints: int = 256,
+        compact_after: int = 0,
+        compact_window: float = 60.0,
+        clock: Callable[[], float] = monotonic,
+    ) -> None:
+        self.max_fingerprints = max_fingerprints
+        self.compact_after = compact_after
+        self.compact_window = compact_window
+        self.clock = clock
+
+        self._entries: OrderedDict[tuple, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+
+        _renderers.add(self)
+
+    @classmethod
+    def from_settings(cls) -> "CachedExceptionRenderer":
+        settings = get_settings()
+
+        return cls(
+            max_fingerprints=settings.log_exception_cache_size,
+            compact_after=settings.log_exception_compact_after,
+            compact_window=settings.log_exception_compact_window,
+        )
+
+    def __call__(self, logger: Any, method_name: str, event_dict: dict) -> dict:
+        exc_info = _figure_out_exc_info(event_dict.pop("exc_info", None))
+
+        if exc_info is None:
+            return event_dict
+
+        chain = _exception_chain(exc_info)
+
+        if chain is None:
+            event_dict["exception"] = _format_exception(exc_info)
+            return event_dict
+
+        key = tuple(
+            (type(exc), message, _code_locations(tb)) for message, exc, tb in chain
+        )
+        entry = self._entry(key, exc_info, len(chain))
+
+        if entry is None:
+            event_dict["exception"] = _format_exception(exc_info)
+            return event_dict
+
+        if self.compact_after:
+            event_dict[FINGERPRINT_KEY] = entry.fingerprint
+
+            if self._count(entry) > self.compact_after:
+                event_dict["exception"] = _format_exception_only(
+                    chain[-1][1]
+                ).removesuffix("\n")
+                return event_dict
+
+        parts = []
+        for (message, exc, _), stack in zip(chain, entry.stacks):
+            if message is not None:
+                parts.append(message)
+            if stack:
+                parts.append(_STACK_HEADER)
+                parts.append(stack)
+            parts.append(_format_exception_only(exc))
+
+        event_dict["exception"] = "".join(parts).removesuffix("\n")
+        return event_dict
+
+    def _entry(self, key: tuple, exc_info: tuple, length: int) -> "_Entry | None":
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+        # formatted outside of the lock, two threads formatting the same traceback is harmless
+        entry = _format_entry(key, exc_info, length)
+
+        if entry is None:
+            return None
+
+        with self._lock:
+            self._entries[key] = entry
+
+            if len(self._entries) > self.max_fingerprints:
+                self._entries.popitem(last=False)
+
+        return entry
+
+    def _count(self, entry: _Entry) -> int:
+        now = self.clock()
+
+        with self._lock:
+            if now - entry.window_start >= self.compact_window:
+                entry.window_start = now
+                entry.occurrences = 0
+
+            entry.occurrences += 1
+            return entry.occurrences
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _after_fork_in_child(self) -> None:
+        # the lock may have been held by another thread, the cached tracebacks are still valid
+        self._lock = threading.Lock()
+
+
+def _after_fork_in_child() -> None:
+    for renderer in list(_renderers):
+        renderer._after_fork_in_child()
+
+
+def _figure_out_exc_info(value: Any) -> tuple | None:
+    "The same `exc_info` values as `format_exc_info` accepts"
+    if isinstance(value, BaseException):
+        return (type(value), value, value.__traceback__)
+
+    if isinstance(value, tuple) and len(value) == 3:
+        exc_type, exc, tb = value
+
+        if (
+            isinstance(exc_type, type)
+            and issubclass(exc_type, BaseException)
+            and isinstance(exc, BaseException)
+            and (tb is None or isinstance(tb, TracebackType))
+        ):
+            return value
+
+    if value:
+        exc_info = sys.exc_info()
+        return None if exc_info[1] is None else exc_info
+
+    return None
+
+
+def _format_exception(exc_info: tuple) -> str:
+    return structlog.processors.format_exc_info.format_exception(exc_info)
+
+
+def _exception_chain(exc_info: tuple) -> list[tuple] | None:
+    """
+    `(message, exception, traceback)` of every exception `traceback.print_exception` prints, in
+    order, where the message is the one printed before the exception. None if the chain has to be
+    formatted uncached.
+    """
+    if hasattr(sys, "tracebacklimit"):
+        return None
+
+    exc = exc_info[1]
+    tb = exc_info[2]
+    # mirrors `TracebackException` with compact=True
+    seen = {id(exc)}
+    chain = []
+
+    while True:
+        if isinstance(exc, (SyntaxError, _EXCEPTION_GROUP)):
+            return None
+
+        if exc.__cause__ is not None and id(exc.__cause__) not in seen:
+            chained, message = exc.__cause__, _CAUSE_MESSAGE
+        elif (
+            exc.__context__ is not None
+            and not exc.__suppress_context__
+            and id(exc.__context__) not in seen
+        ):
+            chained, message = exc.__context__, _CONTEXT_MESSAGE
+        else:
+            chained, message = None, None
+
+        chain.append((message, exc, tb))
+
+        if chained is None:
+            break
+
+        seen.add(id(chained))
+        exc, tb = chained, chained.__traceback__
+
+    chain.reverse()
+    return chain
+
+
+def _code_locations(tb: TracebackType | None) -> tuple:
+    locations = []
+
+    while tb is not None:
+        locations.append((tb.tb_frame.f_code, tb.tb_lasti))
+        tb = tb.tb_next
+
+    return tuple(locations)
+
+
+def _format_entry(key: tuple, exc_info: tuple, length: int) -> "_Entry | None":
+    formatted = traceback.TracebackException(
+        type(exc_info[1]), exc_info[1], exc_info[2], compact=True
+    )
+
+    stacks = []
+    te: Any = formatted
+
+    # the same walk as `TracebackException.format`
+    while te is not None:
+        stacks.append("".join(te.stack.format()))
+
+        if te.__cause__ is not None:
+            te = te.__cause__
+        elif te.__context__ is not None and not te.__suppress_context__:
+            te = te.__context__
+        else:
+            te = None
+
+    if len(stacks) != length:
+        return None
+
+    stacks.reverse()
+
+    digest = hashlib.blake2b(digest_size=8)
+    for exc_type, message, locations in key:
+        digest.update(
+            f"{exc_type.__module__}.{exc_type.__qualname__}|{message}".encode()
+        )
+        for code, instruction in locations:
+            digest.update(f"|{code.co_filename}:{code.co_name}:{instruction}".encode())
+
+    return _Entry(stacks=stacks, fingerprint=digest.hexdigest())
+
+
+def _safe_string(value: Any, what: str, func: Callable[[Any], str] = str) -> str:
+    try:
+        return func(value)
+    except Exception:
+        return f"<{what} {func.__name__}() failed>"
+
+
+def _format_exception_only(exc: BaseException) -> str:
+    "`traceback.format_exception_only`, without formatting the chained exceptions"
+    exc_type = type(exc)
+    type_name = exc_type.__qualname__
+    module = exc_type.__module__
+
+    if module not in ("__main__", "builtins"):
+        if not isinstance(module, str):
+            module = "<unknown>"
+        type_name = f"{module}.{type_name}"
+
+    value = _safe_string(exc, "exception")
+    lines = [f"{type_name}: {value}\n" if value else f"{type_name}\n"]
+
+    if _HAS_NOTES:
+        notes = getattr(exc, "__notes__", None)
+
+        if isinstance(notes, Sequence):
+            for note in notes:
+                lines.extend(
+                    f"{line}\n" for line in _safe_string(note, "note").split("\n")
+                )
+        elif notes is not None:
+            lines.append(_safe_string(notes, "__notes__", func=repr))
+
+    return "".join(lines)
@@ -1,25 +1,99 @@
+from collections import OrderedDict
 from time import perf_counter
 from urllib.parse import quote
+from weakref import WeakKeyDictionary
 
 import structlog
 from fastapi import FastAPI
-from starlette.middleware.base import RequestResponseEndpoint
-from starlette.requests import Request
-from starlette.responses import Response
-from starlette.routing import Match, Mount
-from starlette.types import Scope
+from starlette.routing import BaseRoute, Match, Mount
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .access_sampling import AccessLogSampler
+from .latency_histograms import get_latency_histograms
+from .request_buffer import get_request_buffer
 
 log = structlog.get_logger("access_log")
 
 
-def get_route_name(app: FastAPI, scope: Scope, prefix: str = "") -> str:
+class RouteCache:
+    """
+    Cache of resolved routes for a single app.
+
+    Matching walks every route and runs its regex, which adds up with hundreds of routes. Paths which
+    resolve to a route without path parameters are cached for good (there is a fixed number of them).
+    Everything else (parameterized paths, 404s) goes into a bounded LRU keyed on the raw path.
+
+    The cache is dropped when the route list changes, e.g. routes added after startup.
+    """
+
+    def __init__(self, maxsize: int = 2048) -> None:
+        self.maxsize = maxsize
+        self._static: dict[tuple, BaseRoute | None] = {}
+        self._dynamic: OrderedDict[tuple, BaseRoute | None] = OrderedDict()
+        self._version: tuple[int, int] | None = None
+
+    def resolve(self, app: FastAPI, scope: Scope) -> BaseRoute | None:
+        routes = app.router.routes
+        version = (id(routes), len(routes))
+        if version != self._version:
+            self.clear()
+            self._version = version
+
+        # route matching depends on the method (405s are partial matches) and the root path
+        key = (scope.get("method"), scope.get("root_path", ""), scope["path"])
+
+        if key in self._static:
+            return self._static[key]
+
+        dynamic = self._dynamic
+        if key in dynamic:
+            dynamic.move_to_end(key)
+            return dynamic[key]
+
+        route = next((r for r in routes if r.matches(scope)[0] == Match.FULL), None)
+
+        if route is not None and not getattr(route, "param_convertors", None):
+            self._static[key] = route
+        else:
+            dynamic[key] = route
+            if len(dynamic) > self.maxsize:
+                dynamic.popitem(last=False)
+
+        return route
+
+    def clear(self) -> None:
+        self._static.clear()
+        self._dynamic.clear()
+
+
+_route_caches: "WeakKeyDictionary[FastAPI, RouteCache]" = WeakKeyDictionary()
+
+
+def resolve_route(app: FastAPI | None, scope: Scope) -> BaseRoute | None:
+    """
+    Return the route that handles this request. Uses the route starlette already resolved when the
+    router has run, otherwise the per-app route cache. None without an app, e.g. when the
+    middleware wraps a bare ASGI app.
+    """
+    if route := scope.get("route"):
+        return route
+
+    if app is None:
+        return None
+
+    cache = _route_caches.get(app)
+    if cache is None:
+        cache = _route_caches[app] = RouteCache()
+
+    return cache.resolve(app, scope)
+
+
+def get_route_name(app: FastAPI | None, scope: Scope, prefix: str = "") -> str:
     """Generate a descriptive route name for timing metrics"""
     if prefix:
         prefix += "."
 
-    route = next(
-        (r for r in app.router.routes if r.matches(scope)[0] == Match.FULL), None
-    )
+    route = resolve_route(app, scope)
 
     if hasattr(route, "endpoint") and hasattr(route, "name"):
         return f"{prefix}{route.endpoint.__module__}.{route.name}"  # type: ignore
@@ -63,35 +137,112 @@ def get_client_addr(scope: Scope) -> str:
     return f"{ip}:{port}"
 
 
-def add_middleware(
-    app: FastAPI,
-) -> None:
-    @app.middleware("http")
-    async def access_log_middleware(
-        request: Request, call_next: RequestResponseEndpoint
-    ) -> Response:
-        scope = request.scope
-        route_name = get_route_name(app, request.scope)
-
-        # TODO what other request types are there? why do we need this guard?
+class AccessLogMiddleware:
+    """
+    Pure ASGI access log middleware.
+
+    `@app.middleware("http")` wraps every request in starlette's `BaseHTTPMiddleware`, which spawns a task
+    and pipes the response body through a memory stream. That is expensive, especially for streaming
+    responses. Here we only wrap `send` to pick up the status code and the end of the response body.
+    """
+
+    def __init__(self, app: ASGIApp, sampler: AccessLogSampler | None = None) -> None:
+        """
+        Args:
+            sampler: skip access log lines of some requests, see `access_sampling`. Defaults to
+                the sampler configured through LOG_ACCESS_SAMPLE_RATE(S) and LOG_ACCESS_RATE_LIMITS.
+        """
+        self.app = app
+        self.sampler = sampler or AccessLogSampler.from_settings()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # websocket and lifespan scopes are passed straight through
         if scope["type"] != "http":
-            return await call_next(request)
+            await self.app(scope, receive, send)
+            return
+
+        # `app` is only in the scope when the middleware runs inside a starlette app. Both are taken
+        # before the request, mounted apps replace `app` and rewrite `root_path`.
+        app = scope.get("app")
+        root_path = scope.get("root_path", "")
+
+        # low level logs of this request are held back until we know how it went
+        request_buffer = get_request_buffer()
+        buffer_token = request_buffer.start() if request_buffer else None
 
         start = perf_counter()
-        response = await call_next(request)
-
-        assert start
-        elapsed = perf_counter() - start
-
-        log.info(
-            f"{response.status_code} {scope['method']} {get_path_with_query_string(scope)}",
-            time=round(elapsed * 1000),
-            status=response.status_code,
-            method=scope["method"],
-            path=scope["path"],
-            query=scope["query_string"].decode(),
-            client_ip=get_client_addr(scope),
-            route=route_name,
-        )
-
-        return response
+        status_code = 500
+        end: float | None = None
+        failed = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, end
+
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body" and not message.get(
+                "more_body", False
+            ):
+                end = perf_counter()
+
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            # if the app raised before completing the response, ServerErrorMiddleware responds with a 500
+            elapsed = (end or perf_counter()) - start
+            route_name = self._route_name(app, scope, root_path)
+
+            if request_buffer and buffer_token is not None:
+                request_buffer.finish(
+                    buffer_token,
+                    flush=request_buffer.should_flush(
+                        status_code, elapsed * 1000, failed
+                    ),
+                )
+
+            # every request is recorded, including the ones which are sampled out
+            if histograms := get_latency_histograms():
+                histograms.record(route_name, status_code, elapsed * 1000)
+
+            # no early `return` in here, it would swallow the exception
+            sample_rate = (
+                self.sampler.sample(route_name, status_code, elapsed * 1000, failed)
+                if self.sampler
+                else 1.0
+            )
+
+            if sample_rate is not None:
+                log.info(
+                    f"{status_code} {scope['method']} {get_path_with_query_string(scope)}",
+                    time=round(elapsed * 1000),
+                    status=status_code,
+                    method=scope["method"],
+                    path=scope["path"],
+                    query=scope["query_string"].decode(),
+                    client_ip=get_client_addr(scope),
+                    route=route_name,
+                    # only when sampling, so the lines are unchanged otherwise
+                    **({"sample_rate": sample_rate} if self.sampler else {}),
+                )
+
+    def _route_name(self, app: FastAPI | None, scope: Scope, root_path: str) -> str:
+        """
+        The router leaves the route it picked in the scope. The route cache is only used for requests
+        which never reached it (404s, errors in an earlier middleware), matched as they came in.
+        """
+        if "route" not in scope and scope.get("root_path", "") != root_path:
+            scope = {**scope, "root_path": root_path}
+
+        return get_route_name(app, scope)
+
+
+def add_middleware(
+    app: FastAPI,
+    sampler: AccessLogSampler | None = None,
+) -> None:
+    app.add_middleware(AccessLogMiddleware, sampler=sampler)
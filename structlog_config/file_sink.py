@@ -0,0 +1,357 @@
+"""
+Buffered, rotating file sink for PYTHON_LOG_PATH.
+
+`print` to a text file flushes on every call. Here rendered lines are written as bytes into a large
+user-space buffer which is flushed every `flush_interval` seconds (and when it is full). The buffer
+only ever holds whole lines and is written with a single `write` on an `O_APPEND` file, so processes
+sharing the file (pre-fork servers) never interleave partial lines. A daemon thread does the
+periodic work off the hot path:
+
+- flushes the buffer
+- reopens the file when it was moved or deleted, e.g. by an external logrotate
+- rotates by size and/or time, renaming the file to `<path>.<timestamp>`
+- optionally gzips rotated files and keeps at most `backup_count` of them
+
+Processes sharing the file keep appending to the rotated file until their own thread notices the
+rename on its next tick, so rotated files are only compressed `compress_delay` seconds later. Lines
+a process writes into the rotated file after that (a worker stalled for longer) are lost.
+"""
+
+import atexit
+import gzip
+import logging
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Iterable
+
+
+class FileSink:
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        *,
+        buffer_size: int = 256 * 1024,
+        flush_interval: float = 1.0,
+        max_bytes: int = 0,
+        rotate_interval: float = 0,
+        backup_count: int = 5,
+        compress: bool = False,
+        compress_delay: float | None = None,
+    ):
+        """
+        Args:
+            max_bytes: rotate once the file is larger than this, 0 disables
+            rotate_interval: rotate every N seconds, 0 disables
+            backup_count: rotated files to keep, 0 keeps all of them
+            compress_delay: seconds between rotating and compressing a file, so other processes
+                writing to it have reopened the new file. Defaults to 5 flush intervals, at least 5s.
+        """
+        self.path = Path(path)
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.backup_count = backup_count
+        self.compress = compress
+        self.compress_delay = (
+            max(5 * flush_interval, 5.0) if compress_delay is None else compress_delay
+        )
+
+        # rotated files waiting for `compress_delay`, with the time they are due
+        self._pending_compression: list[tuple[float, Path]] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._buffer = bytearray()
+        self._closed = False
+        self._open()
+        self._start()
+
+        atexit.register(self.close)
+
+    def _start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._run, name="structlog-file-sink", daemon=True
+        )
+        self._thread.start()
+
+    def _open(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # unbuffered, `_buffer` is flushed with one write so lines are never split
+        self._file = open(self.path, "ab", buffering=0)
+        stat = os.fstat(self._file.fileno())
+        self._inode = (stat.st_dev, stat.st_ino)
+        self._size = stat.st_size
+        self._opened_at = time.time()
+
+    def _flush_buffer(self) -> None:
+        "Must be called while holding the lock"
+        buffer = self._buffer
+
+        while buffer:
+            # a raw file may write less than requested (e.g. interrupted by a signal)
+            written = self._file.write(buffer)
+            del buffer[:written]
+
+    def _append(self, data: bytes) -> None:
+        "Synchronous write once the sink is closed, must be called while holding the lock"
+        with open(self.path, "ab", buffering=0) as file:
+            view = memoryview(data)
+            while view:
+                view = view[file.write(view) :]
+
+    def write(self, data: bytes) -> None:
+        with self._lock:
+            if self._closed:
+                # loggers cached before `configure_logger` replaced this sink still write here
+                self._append(data)
+                return
+
+            self._buffer += data
+            self._size += len(data)
+
+            if len(self._buffer) >= self.buffer_size:
+                self._flush_buffer()
+
+        if self.max_bytes and self._size >= self.max_bytes:
+            self._wake.set()
+
+    def writelines(self, lines: Iterable[bytes]) -> None:
+        "Used when this sink is the file of a `QueuedWriter`"
+        with self._lock:
+            if self._closed:
+                self._append(b"".join(lines))
+                return
+
+            for line in lines:
+                self._buffer += line
+                self._size += len(line)
+
+            if len(self._buffer) >= self.buffer_size:
+                self._flush_buffer()
+
+        if self.max_bytes and self._size >= self.max_bytes:
+            self._wake.set()
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._closed:
+                self._flush_buffer()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+
+            self._closed = True
+            self._flush_buffer()
+            self._file.close()
+
+        atexit.unregister(self.close)
+        self._wake.set()
+
+    def _before_fork(self) -> None:
+        "Flush and hold the lock while forking, so the child starts with an empty buffer"
+        self._lock.acquire()
+        try:
+            if not self._closed:
+                self._flush_buffer()
+        except OSError:
+            pass
+
+    def _after_fork_in_parent(self) -> None:
+        self._lock.release()
+
+    def _after_fork_in_child(self) -> None:
+        # the lock was held by the forking thread and the flush thread only exists in the parent
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._buffer.clear()
+        # compressed by the parent
+        self._pending_compression.clear()
+
+        if not self._closed:
+            self._start()
+
+    def _should_rotate(self) -> bool:
+        return bool(
+            (self.max_bytes and self._size >= self.max_bytes)
+            or (
+                self.rotate_interval
+                and time.time() - self._opened_at >= self.rotate_interval
+            )
+        )
+
+    def _was_moved(self) -> bool:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return True
+
+        return (stat.st_dev, stat.st_ino) != self._inode
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+
+            rotated: Path | None = None
+
+            with self._lock:
+                if self._closed:
+                    return
+
+                try:
+                    self._flush_buffer()
+
+                    if self._was_moved():
+                        # someone else rotated the file, the old handle points to the moved file
+                        self._file.close()
+                        self._open()
+                    elif self._should_rotate():
+                        rotated = self._rotate()
+                except OSError:
+                    # e.g. disk full, try again on the next tick rather than killing the thread
+                    continue
+
+            # compression and cleanup run outside of the lock, they do not block writers
+            try:
+                if rotated:
+                    self._finish_rotation(rotated)
+
+                self._compress_due()
+            except OSError:
+                # e.g. disk full, or a backup removed by another process sharing the directory
+                continue
+
+    def _rotate(self) -> Path:
+        "Rename the current file and start a new one. Runs with the lock held, after a flush."
+        self._file.close()
+
+        name = f"{self.path.name}.{time.strftime('%Y%m%d-%H%M%S')}"
+        rotated = self.path.with_name(name)
+
+        # more than one rotation per second
+        suffix = 1
+        while rotated.exists() or rotated.with_name(f"{rotated.name}.gz").exists():
+            rotated = self.path.with_name(f"{name}.{suffix}")
+            suffix += 1
+
+        os.replace(self.path, rotated)
+        self._open()
+        return rotated
+
+    def _finish_rotation(self, rotated: Path) -> None:
+        if self.compress:
+            self._pending_compression.append(
+                (time.monotonic() + self.compress_delay, rotated)
+            )
+
+        if self.backup_count:
+            backups = []
+            for backup in self.path.parent.glob(f"{self.path.name}.*"):
+                try:
+                    backups.append((backup.stat().st_mtime, backup))
+                except FileNotFoundError:
+                    # removed by another process sharing the directory
+                    continue
+
+            backups.sort()
+            for _, backup in backups[: -self.backup_count]:
+                backup.unlink(missing_ok=True)
+
+    def _compress_due(self) -> None:
+        now = time.monotonic()
+        due = [
+            rotated for due_at, rotated in self._pending_compression if due_at <= now
+        ]
+
+        if not due:
+            return
+
+        self._pending_compression = [
+            (due_at, rotated)
+            for due_at, rotated in self._pending_compression
+            if due_at > now
+        ]
+
+        for rotated in due:
+            compressed = Path(f"{rotated}.gz")
+
+            try:
+                with (
+                    open(rotated, "rb") as source,
+                    gzip.open(compressed, "wb") as target,
+                ):
+                    shutil.copyfileobj(source, target)
+            except FileNotFoundError:
+                # already removed as one of the oldest backups
+                continue
+            except OSError:
+                # keep the uncompressed file rather than a truncated archive
+                compressed.unlink(missing_ok=True)
+                raise
+
+            rotated.unlink()
+
+
+class FileSinkLogger:
+    """
+    Logger for `FileSink`. Accepts bytes (the JSON renderer) and str (the console renderer).
+    """
+
+    __slots__ = ("_write",)
+
+    def __init__(self, sink: FileSink):
+        self._write = sink.write
+
+    def msg(self, message: bytes | str) -> None:
+        if isinstance(message, str):
+            message = message.encode()
+
+        self._write(message + b"\n")
+
+    log = debug = info = warn = warning = msg
+    fatal = failure = err = error = critical = exception = msg
+
+
+class FileSinkHandler(logging.Handler):
+    "stdlib handler for `FileSink`, a `StreamHandler` would flush on every record"
+
+    def __init__(self, sink: FileSink, level: int = logging.NOTSET):
+        super().__init__(level)
+        self.sink = sink
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self.sink.write(self.format(record).encode() + b"\n")
+        except Exception:
+            self.handleError(record)
+
+
+class FileSinkLoggerFactory:
+    def __init__(self, sink: FileSink):
+        self.sink = sink
+
+    def __call__(self, *args) -> FileSinkLogger:
+        return FileSinkLogger(self.sink)
+
+
+_active_sink: FileSink | None = None
+
+
+def get_file_sink() -> FileSink | None:
+    "The sink for PYTHON_LOG_PATH installed by `configure_logger`, if any"
+    return _active_sink
+
+
+def set_file_sink(sink: FileSink | None) -> None:
+    "Swap the active sink, flushing and closing the previous one"
+    global _active_sink
+
+    if _active_sink is not None and _active_sink is not sink:
+        _active_sink.close()
+
+    _active_sink = sink
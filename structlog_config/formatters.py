@@ -4,7 +4,21 @@ from typing import Any, MutableMapping, TextIO
 
 from structlog.typing import EventDict, ExcInfo
 
-from structlog_config.constants import NO_COLOR
+from structlog_config.settings import get_settings
+
+
+def get_field_no_refresh(instance, field_name: str) -> str:
+    """
+    This was a hard-won little bit of code: in fastapi, this action happens *after* the
+    db session dependency has finished, which means the session is closed.
+
+    If a DB operation within the session causes the model to be marked as stale, then this will trigger
+    a `sqlalchemy.orm.exc.DetachedInstanceError` error. This logic pulls the cached value from the object
+    which is better for performance *and* avoids the error.
+    """
+    from sqlalchemy.orm.base import object_state
+
+    return str(object_state(instance).dict.get(field_name))
 
 
 def simplify_activemodel_objects(
@@ -20,21 +34,14 @@ def simplify_activemodel_objects(
 
     What's tricky about this method, and other structlog processors, is they are run *after* a response
     is returned to the user. So, they don't error out in tests and it doesn't impact users. They do show up in Sentry.
+
+    The default processors run this as part of `ValueNormalizer` instead.
     """
+    from activemodel import BaseModel
+    from typeid import TypeID
+
     for key, value in list(event_dict.items()):
         if isinstance(value, BaseModel):
-
-            def get_field_no_refresh(instance, field_name):
-                """
-                This was a hard-won little bit of code: in fastapi, this action happens *after* the
-                db session dependency has finished, which means the session is closed.
-
-                If a DB operation within the session causes the model to be marked as stale, then this will trigger
-                a `sqlalchemy.orm.exc.DetachedInstanceError` error. This logic pulls the cached value from the object
-                which is better for performance *and* avoids the error.
-                """
-                return str(object_state(instance).dict.get(field_name))
-
             # TODO this will break as soon as a model doesn't have `id` as pk
             event_dict[f"{key}_id"] = get_field_no_refresh(value, "id")
             del event_dict[key]
@@ -73,7 +80,9 @@ def pretty_traceback_exception_formatter(sio: TextIO, exc_info: ExcInfo) -> None
     from pretty_traceback.formatting import exc_to_traceback_str
 
     _, exc_value, traceback = exc_info
-    formatted_exception = exc_to_traceback_str(exc_value, traceback, color=not NO_COLOR)
+    formatted_exception = exc_to_traceback_str(
+        exc_value, traceback, color=not get_settings().no_color
+    )
     sio.write("\n" + formatted_exception)
 
 
@@ -94,16 +103,18 @@ class PathPrettifier:
     def __init__(self, base_dir: Path | None = None):
         self.base_dir = base_dir or Path.cwd()
 
+    def prettify(self, path: Path) -> str:
+        try:
+            path = path.relative_to(self.base_dir)
+        except ValueError:
+            pass  # path is not relative to cwd
+        return str(path)
+
     def __call__(self, _, __, event_dict):
         for key, path in event_dict.items():
             if not isinstance(path, Path):
                 continue
-            path = event_dict[key]
-            try:
-                path = path.relative_to(self.base_dir)
-            except ValueError:
-                pass  # path is not relative to cwd
-            event_dict[key] = str(path)
+            event_dict[key] = self.prettify(path)
 
         return event_dict
 
@@ -0,0 +1,174 @@
+"""
+In-process request latency histograms, per route and status class.
+
+Shipping an access log line per request just to build latency dashboards is a lot of volume on hot
+routes. The access log middleware records every request into a log-bucketed histogram instead, and a
+summary event (count, p50/p90/p99, max) per route and status class is logged every N seconds.
+
+Buckets grow by 2^(1/8), so percentiles are accurate to ~9%, and each histogram is a fixed-size
+array regardless of traffic.
+"""
+
+import math
+import threading
+from array import array
+from typing import Any
+
+import structlog
+
+from .instrumentation import StatsReporter
+
+SUMMARY_EVENT = "access latency"
+
+MIN_MS = 0.001
+BUCKETS_PER_OCTAVE = 8
+BUCKET_COUNT = BUCKETS_PER_OCTAVE * 28
+"1µs to ~4.5 minutes, slower requests land in the last bucket"
+
+OTHER_ROUTE = "__other__"
+"where requests go once `max_routes` routes are tracked, unmatched paths would be unbounded"
+
+
+def _bucket_upper_bound(index: int) -> float:
+    return MIN_MS * 2 ** ((index + 1) / BUCKETS_PER_OCTAVE)
+
+
+class LatencyHistogram:
+    __slots__ = ("counts", "count", "total_ms", "max_ms")
+
+    def __init__(self) -> None:
+        self.counts = array("Q", bytes(8 * BUCKET_COUNT))
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, elapsed_ms: float) -> None:
+        if elapsed_ms <= MIN_MS:
+            index = 0
+        else:
+            index = min(
+                int(math.log2(elapsed_ms / MIN_MS) * BUCKETS_PER_OCTAVE),
+                BUCKET_COUNT - 1,
+            )
+
+        self.counts[index] += 1
+        self.count += 1
+        self.total_ms += elapsed_ms
+        if elapsed_ms > self.max_ms:
+            self.max_ms = elapsed_ms
+
+    def percentile(self, quantile: float) -> float:
+        "Upper bound of the bucket holding the quantile, never more than the max"
+        if not self.count:
+            return 0.0
+
+        target = max(1, math.ceil(quantile * self.count))
+        seen = 0
+
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= target:
+                # the last bucket is unbounded
+                if index == BUCKET_COUNT - 1:
+                    return self.max_ms
+
+                return min(_bucket_upper_bound(index), self.max_ms)
+
+        return self.max_ms
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "p50": round(self.percentile(0.5), 3),
+            "p90": round(self.percentile(0.9), 3),
+            "p99": round(self.percentile(0.99), 3),
+            "max": round(self.max_ms, 3),
+            "mean": round(self.total_ms / self.count, 3) if self.count else 0.0,
+        }
+
+
+class LatencyHistograms:
+    "Histograms keyed by route name and status class (`2xx`, `5xx`, ...)"
+
+    def __init__(self, max_routes: int = 1000) -> None:
+        self.max_routes = max_routes
+        self._histograms: dict[tuple[str, str], LatencyHistogram] = {}
+        self._routes: set[str] = set()
+        self._lock = threading.Lock()
+
+    def record(self, route: str, status_code: int, elapsed_ms: float) -> None:
+        key = (route, f"{status_code // 100}xx")
+
+        with self._lock:
+            histogram = self._histograms.get(key)
+
+            if histogram is None:
+                if route not in self._routes and len(self._routes) >= self.max_routes:
+                    key = (OTHER_ROUTE, key[1])
+                else:
+                    self._routes.add(route)
+
+                histogram = self._histograms.setdefault(key, LatencyHistogram())
+
+            histogram.record(elapsed_ms)
+
+    def snapshot(self, reset: bool = False) -> list[dict[str, Any]]:
+        "Summaries of the current histograms, optionally starting a new interval"
+        with self._lock:
+            histograms = self._histograms
+
+            if reset:
+                self._histograms = {}
+                self._routes = set()
+
+            # summarized under the lock, `record` mutates the histograms in place
+            return [
+                {"route": route, "status": status, **histogram.summary()}
+                for (route, status), histogram in sorted(histograms.items())
+            ]
+
+    def log(self) -> None:
+        "Emit the summaries of this interval as a single event, and reset"
+        if routes := self.snapshot(reset=True):
+            structlog.get_logger(logger_name=__name__).info(
+                SUMMARY_EVENT, routes=routes
+            )
+
+
+_histograms: LatencyHistograms | None = None
+_reporter: StatsReporter | None = None
+
+
+def get_latency_histograms() -> LatencyHistograms | None:
+    "The histograms installed by `configure_logger`, if latency histograms are enabled"
+    return _histograms
+
+
+def set_latency_histograms(
+    histograms: LatencyHistograms | None, interval: float = 0
+) -> None:
+    """
+    Install the histograms the access log middleware records into. When `interval` is set, their
+    summaries are logged every `interval` seconds and at exit.
+    """
+    global _histograms, _reporter
+
+    if _reporter is not None:
+        _reporter.cancel()
+        _reporter = None
+
+    _histograms = histograms
+
+    if histograms is not None and interval > 0:
+        _reporter = StatsReporter(
+            interval, report=histograms.log, name="structlog-latency-histograms"
+        ).start()
+
+
+def _after_fork_in_child() -> None:
+    # start from empty histograms, the parent reports its own requests
+    if _histograms is not None:
+        set_latency_histograms(
+            LatencyHistograms(_histograms.max_routes),
+            _reporter.interval if _reporter else 0,
+        )
@@ -0,0 +1,36 @@
+"""
+Log values which are only computed when the event is emitted.
+
+Arguments are evaluated by the caller, so `log.debug("rows", rows=len(query.all()))` runs the query
+even when debug logs are filtered out. Wrap the computation instead:
+
+>>> log.debug("rows", rows=lazy(lambda: len(query.all())))
+
+Filtered events never reach the processors, so the callable is only invoked (by `ValueNormalizer`)
+for events which are emitted. Bare callables are not invoked, logging a function must keep logging
+the function.
+"""
+
+from typing import Any, Callable
+
+
+class Lazy:
+    __slots__ = ("function", "args", "kwargs")
+
+    def __init__(self, function: Callable[..., Any], *args: Any, **kwargs: Any):
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+
+    def resolve(self) -> Any:
+        "The computed value. Failures are rendered inline, logging must never raise."
+        try:
+            return self.function(*self.args, **self.kwargs)
+        except Exception as exc:
+            return f"<lazy value failed: {type(exc).__name__}: {exc}>"
+
+    def __repr__(self) -> str:
+        return f"lazy({self.function!r})"
+
+
+lazy = Lazy
@@ -0,0 +1,318 @@
+"""
+Per-logger-name log levels.
+
+`LOG_LEVELS="sqlalchemy=WARNING,app.billing=DEBUG"` sets levels by logger name prefix, on dotted
+boundaries: `app.billing` applies to `app.billing` and `app.billing.invoices`, not `app.billings`.
+The longest matching prefix wins, LOG_LEVEL applies to everything else.
+
+The rules apply to stdlib loggers and to structlog loggers created with a name:
+
+>>> structlog.get_logger(logger_name="app.billing")
+
+For structlog, the rules are resolved once per logger name into a class derived from structlog's
+filtering bound logger for that level, so there is no prefix matching when logging. The name has to
+be passed to `get_logger`: binding `logger_name` later does not change the level of an existing
+logger.
+
+Levels can be changed at runtime with `set_log_level`, optionally reverting after a TTL, or with
+SIGUSR1 (DEBUG) and SIGUSR2 (back to the configured levels). Each logger name has a stable class and
+a level change swaps its base class, so loggers which are already created (and cached by structlog)
+follow without checking anything per call.
+"""
+
+import logging
+import signal
+import threading
+from typing import Any
+
+import structlog
+
+from .settings import get_settings
+
+
+def parse_level_rules(value: str) -> dict[str, int]:
+    "Parse `name=LEVEL,name=LEVEL` as used by LOG_LEVELS"
+    levels = logging.getLevelNamesMapping()
+    rules = {}
+
+    for entry in value.split(","):
+        if not entry.strip():
+            continue
+
+        name, _, level_name = entry.rpartition("=")
+        level = levels.get(level_name.strip().upper())
+
+        if not name.strip() or level is None:
+            raise ValueError(f"expected logger_name=LEVEL, got {entry!r}")
+
+        rules[name.strip()] = level
+
+    return rules
+
+
+class LevelRouter:
+    """
+    `wrapper_class` for `structlog.configure` which picks the filtering bound logger class from the
+    `logger_name` the logger is created with.
+
+    Args:
+        default_level: level of loggers without a name, or without a matching rule
+        rules: logger name prefix to level
+        floor: lowest level any class filters at, so events below the configured level still reach
+            processors which need them (the request buffer)
+    """
+
+    def __init__(
+        self,
+        default_level: int,
+        rules: dict[str, int] | None = None,
+        floor: int | None = None,
+    ) -> None:
+        self.default_level = default_level
+        self.rules = rules or {}
+        self.floor = floor
+
+        self._levels: dict[str | None, int] = {}
+        self._classes: dict[str | None, type] = {}
+        # reentrant: the signal handlers run on the main thread, possibly while it holds the lock
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_settings(cls, floor: int | None = None) -> "LevelRouter":
+        settings = get_settings()
+        return cls(settings.log_level, parse_level_rules(settings.log_levels), floor)
+
+    def level_for(self, name: str | None) -> int:
+        try:
+            return self._levels[name]
+        except KeyError:
+            pass
+
+        level = self.default_level
+
+        if name and self.rules:
+            # longest prefix first: app.billing.invoices, app.billing, app
+            parts = name.split(".")
+            for end in range(len(parts), 0, -1):
+                prefix = ".".join(parts[:end])
+                if prefix in self.rules:
+                    level = self.rules[prefix]
+                    break
+
+        self._levels[name] = level
+        return level
+
+    def _base_class_for(self, name: str | None) -> type:
+        level = self.level_for(name)
+        if self.floor is not None:
+            level = min(level, self.floor)
+
+        # structlog caches these per level
+        return structlog.make_filtering_bound_logger(level)
+
+    def wrapper_class_for(self, name: str | None) -> type:
+        try:
+            return self._classes[name]
+        except KeyError:
+            pass
+
+        with self._lock:
+            if name not in self._classes:
+                base = self._base_class_for(name)
+                # a class per name, so its level can be changed by swapping the base class
+                self._classes[name] = type(base.__name__, (base,), {})
+
+            return self._classes[name]
+
+    def set_level(self, level: int | None, name: str | None = None) -> None:
+        """
+        Change the level of a logger name prefix, or the default level when `name` is None. A level
+        of None removes the rule for `name`.
+        """
+        with self._lock:
+            if name is None:
+                if level is None:
+                    raise ValueError("the default level can't be removed")
+                self.default_level = level
+            elif level is None:
+                self.rules.pop(name, None)
+            else:
+                self.rules[name] = level
+
+            self._levels.clear()
+
+            for logger_name, wrapper_class in self._classes.items():
+                base = self._base_class_for(logger_name)
+                if wrapper_class.__bases__ != (base,):
+                    wrapper_class.__bases__ = (base,)
+
+    def __call__(
+        self,
+        logger: Any,
+        processors: Any = None,
+        context: Any = None,
+    ) -> Any:
+        name = context.get("logger_name") if context else None
+        return self.wrapper_class_for(name)(
+            logger, processors=processors, context=context
+        )
+
+
+_rule_loggers: set[str] = set()
+"stdlib loggers which got a level from the rules, reset when the rules are reapplied"
+
+
+def apply_stdlib_levels(default_level: int, rules: dict[str, int]) -> None:
+    """
+    Set the levels on stdlib loggers. Prefixes apply to child loggers through inheritance, and the
+    root handlers must not drop what a rule lets through.
+    """
+    root_logger = logging.getLogger()
+    root_logger.setLevel(default_level)
+
+    for handler in root_logger.handlers:
+        handler.setLevel(min([default_level, *rules.values()]))
+
+    for logger_name in _rule_loggers - rules.keys():
+        logging.getLogger(logger_name).setLevel(logging.NOTSET)
+
+    for logger_name, level in rules.items():
+        logging.getLogger(logger_name).setLevel(level)
+
+    _rule_loggers.clear()
+    _rule_loggers.update(rules)
+
+
+_router: LevelRouter | None = None
+_reverts: dict[str | None, tuple[threading.Timer, int | None]] = {}
+"pending TTL reverts per name, with the level to go back to"
+
+
+def get_level_router() -> LevelRouter | None:
+    return _router
+
+
+def set_level_router(router: LevelRouter | None) -> None:
+    global _router
+
+    for timer, _ in _reverts.values():
+        timer.cancel()
+    _reverts.clear()
+
+    _router = router
+
+
+def _apply(router: LevelRouter, level: int | None, name: str | None) -> None:
+    router.set_level(level, name)
+    apply_stdlib_levels(router.default_level, router.rules)
+
+
+def set_log_level(
+    level: int | str, name: str | None = None, ttl: float | None = None
+) -> None:
+    """
+    Change the level of structlog and stdlib loggers without reconfiguring, e.g. DEBUG in a live
+    process. `name` is a logger name prefix as in LOG_LEVELS, the default level is changed when it
+    is omitted. After `ttl` seconds the previous level is restored.
+    """
+    router = _router
+    if router is None:
+        raise RuntimeError("configure_logger() has not been called")
+
+    if isinstance(level, str):
+        level = logging.getLevelNamesMapping()[level.upper()]
+
+    with router._lock:
+        if pending := _reverts.pop(name, None):
+            timer, previous = pending
+            timer.cancel()
+        else:
+            previous = router.default_level if name is None else router.rules.get(name)
+
+        _apply(router, level, name)
+
+        if ttl:
+            timer = threading.Timer(ttl, _revert, (router, name, previous))
+            timer.daemon = True
+            _reverts[name] = (timer, previous)
+            timer.start()
+
+
+def _revert(router: LevelRouter, name: str | None, level: int | None) -> None:
+    with router._lock:
+        pending = _reverts.get(name)
+
+        # the router was replaced by configure_logger, or the revert was superseded
+        if (
+            router is not _router
+            or not pending
+            or pending[0] is not threading.current_thread()
+        ):
+            return
+
+        del _reverts[name]
+        _apply(router, level, name)
+
+
+def reset_log_levels() -> None:
+    "Go back to the levels from LOG_LEVEL and LOG_LEVELS"
+    router = _router
+    if router is None:
+        return
+
+    settings = get_settings()
+
+    with router._lock:
+        for timer, _ in _reverts.values():
+            timer.cancel()
+        _reverts.clear()
+
+        router.rules = parse_level_rules(settings.log_levels)
+        # setting the default level refreshes every logger class
+        _apply(router, settings.log_level, None)
+
+
+def install_signal_handlers(ttl: float | None = None) -> None:
+    """
+    SIGUSR1 switches every logger to DEBUG, reverting after `ttl` seconds if given, SIGUSR2 goes back
+    to the configured levels. Only works from the main thread and on platforms with these signals.
+    """
+    if not hasattr(signal, "SIGUSR1"):
+        return
+
+    if threading.current_thread() is not threading.main_thread():
+        return
+
+    signal.signal(signal.SIGUSR1, lambda *_: _debug_all(ttl))
+    signal.signal(signal.SIGUSR2, lambda *_: reset_log_levels())
+
+
+def _debug_all(ttl: float | None) -> None:
+    router = _router
+    if router is None:
+        return
+
+    with router._lock:
+        # rules which are quieter than DEBUG would win over the default level
+        for name in list(router.rules):
+            set_log_level(logging.DEBUG, name, ttl)
+
+        set_log_level(logging.DEBUG, None, ttl)
+
+
+def _after_fork_in_child() -> None:
+    router = _router
+    if router is None:
+        return
+
+    router._lock = threading.RLock()
+
+    # timer threads only exist in the parent, restart pending reverts with their full TTL
+    pending = dict(_reverts)
+    _reverts.clear()
+
+    for name, (timer, previous) in pending.items():
+        timer = threading.Timer(timer.interval, _revert, (router, name, previous))
+        timer.daemon = True
+        _reverts[name] = (timer, previous)
+        timer.start()
@@ -0,0 +1,120 @@
+"""
+Support for pre-fork servers (gunicorn, celery prefork, ...).
+
+`configure_logger` usually runs in the master, and the workers inherit its sinks, locks, buffers and
+background threads, except that the threads are gone in the children. Fork hooks flush buffered
+output before forking, so it is not written twice, and reinitialize that state in the child.
+
+Lines are written with a single `write` each (up to PIPE_BUF bytes, see `AtomicBytesLogger`) so
+output of processes sharing stdout never interleaves.
+"""
+
+import os
+import sys
+
+import structlog
+
+from . import (
+    access_sampling,
+    dedup,
+    exception_cache,
+    instrumentation,
+    latency_histograms,
+    levels,
+    size_guard,
+)
+from .file_sink import get_file_sink
+from .offload import get_offloader
+from .queue_writer import get_queued_writer
+from .request_buffer import get_request_buffer
+
+
+class AtomicBytesLogger:
+    """
+    `structlog.BytesLogger` for stdout, writing each line with a single `os.write` on the file
+    descriptor. `BytesLogger` goes through the python-level buffer, which splits lines longer than the
+    buffer across writes.
+    """
+
+    __slots__ = ("_fileno",)
+
+    def __init__(self, fileno: int):
+        self._fileno = fileno
+
+    def msg(self, message: bytes) -> None:
+        line = memoryview(message + b"\n")
+
+        while line:
+            # only writes larger than PIPE_BUF to a pipe can be partial
+            line = line[os.write(self._fileno, line) :]
+
+    log = debug = info = warn = warning = msg
+    fatal = failure = err = error = critical = exception = msg
+
+
+class AtomicBytesLoggerFactory:
+    "Writes to the current stdout, falls back to `BytesLogger` when it has no file descriptor"
+
+    def __call__(self, *args) -> AtomicBytesLogger | structlog.BytesLogger:
+        try:
+            fileno = sys.stdout.fileno()
+        except (AttributeError, OSError, ValueError):
+            # in-memory streams (pytest capture, notebooks)
+            return structlog.BytesLogger()
+
+        # text printed before must land before our lines
+        sys.stdout.flush()
+        return AtomicBytesLogger(fileno)
+
+
+def _sinks() -> list:
+    # drained in the order events flow: offloader, queued writer, file sink
+    return [
+        sink
+        for sink in (get_offloader(), get_queued_writer(), get_file_sink())
+        if sink is not None
+    ]
+
+
+def _before_fork() -> None:
+    for sink in _sinks():
+        sink._before_fork()
+
+
+def _after_fork_in_parent() -> None:
+    for sink in reversed(_sinks()):
+        sink._after_fork_in_parent()
+
+
+def _after_fork_in_child() -> None:
+    for sink in reversed(_sinks()):
+        sink._after_fork_in_child()
+
+    if request_buffer := get_request_buffer():
+        request_buffer._after_fork_in_child()
+
+    access_sampling._after_fork_in_child()
+    dedup._after_fork_in_child()
+    exception_cache._after_fork_in_child()
+    instrumentation._after_fork_in_child()
+    latency_histograms._after_fork_in_child()
+    levels._after_fork_in_child()
+    size_guard._after_fork_in_child()
+
+
+_registered = False
+
+
+def register_fork_hooks() -> None:
+    "Called on import of the package. Hooks can't be unregistered, they act on the active state."
+    global _registered
+
+    if _registered or not hasattr(os, "register_at_fork"):
+        return
+
+    os.register_at_fork(
+        before=_before_fork,
+        after_in_parent=_after_fork_in_parent,
+        after_in_child=_after_fork_in_child,
+    )
+    _registered = True
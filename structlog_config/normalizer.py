@@ -0,0 +1,195 @@
+"""
+Single-pass normalization of event values before rendering.
+
+Each value-converting processor used to walk the whole event dict on its own. `ValueNormalizer`
+walks it once and dispatches on `type(value)` through a handler table. Handlers are resolved along
+the MRO once per type and cached, so the common case (str, int, None, ...) is a single dict lookup.
+"""
+
+import datetime
+import sys
+import weakref
+from enum import Enum
+from pathlib import Path
+from typing import Any, Callable, MutableMapping
+from uuid import UUID
+
+from . import packages
+from .formatters import PathPrettifier, get_field_no_refresh
+from .lazy import Lazy
+
+Handler = Callable[[str, Any], tuple[str, Any]]
+"""
+Receives the key and value and returns the (possibly renamed) key and converted value
+"""
+
+_UNRESOLVED: Any = object()
+
+_user_converters: dict[type, Handler] = {}
+_normalizers: "weakref.WeakSet[ValueNormalizer]" = weakref.WeakSet()
+
+
+def register_converter(type_: type, converter: Callable[[Any], Any]) -> None:
+    """
+    Convert values of `type_` (including subclasses) with `converter` before they are rendered.
+
+    >>> register_converter(Money, lambda money: f"{money.amount} {money.currency}")
+
+    Applies to loggers which are already configured. User converters win over the built-in ones.
+    """
+    _user_converters[type_] = lambda key, value: (key, converter(value))
+
+    for normalizer in _normalizers:
+        normalizer.clear_cache()
+
+
+def _convert_enum(key: str, value: Enum) -> tuple[str, Any]:
+    return key, value.value
+
+
+def _convert_isoformat(
+    key: str, value: datetime.date | datetime.time
+) -> tuple[str, Any]:
+    return key, value.isoformat()
+
+
+def _convert_str(key: str, value: Any) -> tuple[str, Any]:
+    return key, str(value)
+
+
+def _convert_activemodel(key: str, value: Any) -> tuple[str, Any]:
+    # TODO this will break as soon as a model doesn't have `id` as pk
+    return f"{key}_id", get_field_no_refresh(value, "id")
+
+
+def default_handlers(base_dir: Path | None = None) -> dict[type, Handler]:
+    path_prettifier = PathPrettifier(base_dir)
+
+    return {
+        Path: lambda key, value: (key, path_prettifier.prettify(value)),
+        Enum: _convert_enum,
+        # datetime is a subclass of date, so both are covered
+        datetime.date: _convert_isoformat,
+        datetime.time: _convert_isoformat,
+        UUID: _convert_str,
+    }
+
+
+def default_lazy_handlers() -> dict[tuple[str, str], Handler]:
+    """
+    Handlers for types from optional packages, keyed on (module, class name).
+
+    These are never imported by us: a value can only be an instance of `activemodel.BaseModel` if the
+    application already imported activemodel, so the class is picked up from `sys.modules` once it's
+    there.
+    """
+    handlers: dict[tuple[str, str], Handler] = {}
+
+    if packages.activemodel:
+        handlers[("activemodel", "BaseModel")] = _convert_activemodel
+
+    if packages.typeid:
+        handlers[("typeid", "TypeID")] = _convert_str
+
+    return handlers
+
+
+class ValueNormalizer:
+    """
+    Processor which converts values that don't render well (paths, models, enums, ...) in one pass.
+    """
+
+    def __init__(
+        self,
+        handlers: dict[type, Handler] | None = None,
+        lazy_handlers: dict[tuple[str, str], Handler] | None = None,
+    ):
+        self.handlers = default_handlers() if handlers is None else handlers
+        self.lazy_handlers = (
+            default_lazy_handlers() if lazy_handlers is None else lazy_handlers
+        )
+        self._cache: dict[type, Handler | None] = {}
+
+        # resolved values are normalized as well, so this handler needs the normalizer
+        self.handlers.setdefault(Lazy, self._resolve_lazy)
+
+        _normalizers.add(self)
+
+    def register(self, type_: type, handler: Handler) -> None:
+        self.handlers[type_] = handler
+        self.clear_cache()
+
+    def clear_cache(self) -> None:
+        self._cache = {}
+
+    def handler_for(self, cls: type) -> Handler | None:
+        cache = self._cache
+
+        try:
+            return cache[cls]
+        except KeyError:
+            pass
+
+        if self.lazy_handlers:
+            self._load_lazy_handlers()
+
+        handler = None
+        for base in cls.__mro__:
+            handler = _user_converters.get(base) or self.handlers.get(base)
+            if handler is not None:
+                break
+
+        cache[cls] = handler
+        return handler
+
+    def _resolve_lazy(self, key: str, value: Lazy) -> tuple[str, Any]:
+        resolved = value.resolve()
+
+        handler = self.handler_for(type(resolved))
+        if handler is None:
+            return key, resolved
+
+        return handler(key, resolved)
+
+    def _load_lazy_handlers(self) -> None:
+        for (module_name, class_name), handler in list(self.lazy_handlers.items()):
+            module = sys.modules.get(module_name)
+            cls = getattr(module, class_name, None)
+
+            # the module may be missing or still partially initialized, try again on the next miss
+            if cls is None:
+                continue
+
+            self.handlers[cls] = handler
+            del self.lazy_handlers[(module_name, class_name)]
+
+    def __call__(
+        self, logger: Any, method_name: str, event_dict: MutableMapping[str, Any]
+    ) -> MutableMapping[str, Any]:
+        cache = self._cache
+        renamed = None
+
+        for key, value in event_dict.items():
+            handler = cache.get(type(value), _UNRESOLVED)
+            if handler is _UNRESOLVED:
+                handler = self.handler_for(type(value))
+
+            if handler is None:
+                continue
+
+            new_key, new_value = handler(key, value)
+
+            if new_key == key:
+                # replacing a value does not change the dict size, so this is safe while iterating
+                event_dict[key] = new_value
+            else:
+                if renamed is None:
+                    renamed = []
+                renamed.append((key, new_key, new_value))
+
+        if renamed:
+            for key, new_key, new_value in renamed:
+                del event_dict[key]
+                event_dict[new_key] = new_value
+
+        return event_dict
@@ -1,33 +1,30 @@
 """
 Determine if certain packages are installed to conditionally enable processors
+
+Only the import machinery is consulted (`find_spec`), nothing is imported: pulling in sqlalchemy
+and friends just to check for them adds hundreds of milliseconds to every CLI tool and worker
+which imports this package. Processors import what they need when they first need it.
 """
 
-try:
-    import orjson
-except ImportError:
-    orjson = None
-
-try:
-    import sqlalchemy
-except ImportError:
-    sqlalchemy = None
-
-try:
-    import activemodel
-except ImportError:
-    activemodel = None
-
-try:
-    import typeid
-except ImportError:
-    typeid = None
-
-try:
-    import pretty_traceback
-except ImportError:
-    pretty_traceback = None
-
-try:
-    import starlette_context
-except ImportError:
-    starlette_context = None
+from importlib.util import find_spec
+
+
+def is_installed(name: str) -> bool:
+    try:
+        return find_spec(name) is not None
+    except (ImportError, ValueError):
+        # raised for broken installs or modules with a missing __spec__
+        return False
+
+
+orjson = is_installed("orjson")
+
+sqlalchemy = is_installed("sqlalchemy")
+
+activemodel = is_installed("activemodel")
+
+typeid = is_installed("typeid")
+
+pretty_traceback = is_installed("pretty_traceback")
+
+starlette_context = is_installed("starlette_context")
@@ -0,0 +1,202 @@
+"""
+The processor pipeline shared by structlog loggers and stdlib loggers.
+
+`configure_logger` and `redirect_stdlib_loggers` used to build two separate processor lists, which
+meant two copies of every stateful processor (type tables, caches, ...). A `Pipeline` is built once
+and both chains are derived from it.
+"""
+
+from dataclasses import dataclass, replace
+from typing import Any
+
+import structlog
+import structlog.dev
+from structlog.types import Processor
+
+from . import packages
+from .context_fragments import ContextFragments
+from .exception_cache import CachedExceptionRenderer
+from .formatters import (
+    add_fastapi_context,
+    logger_name,
+    pretty_traceback_exception_formatter,
+)
+from .instrumentation import instrument_processors
+from .normalizer import ValueNormalizer
+from .redaction import Redactor
+from .renderers import orjson_renderer, orjson_str_renderer
+from .settings import get_settings
+from .size_guard import SizeGuard
+from .timestamps import CachedTimeStamper
+
+
+def log_processors_for_mode(json_logger: bool) -> list[Processor]:
+    if json_logger:
+        return [
+            # add exc_info=True to a log and get a full stack trace attached to it. Same output as
+            # format_exc_info, with the frames of repeated exceptions formatted once
+            CachedExceptionRenderer.from_settings(),
+            # in prod, we want logs to be rendered as JSON payloads
+            orjson_renderer(),
+        ]
+
+    return [
+        structlog.dev.ConsoleRenderer(
+            colors=not get_settings().no_color,
+            exception_formatter=pretty_traceback_exception_formatter
+            if packages.pretty_traceback
+            else structlog.dev.default_exception_formatter,
+        )
+    ]
+
+
+@dataclass(frozen=True)
+class Pipeline:
+    json_logger: bool
+    processors: list[Processor]
+    "everything up to, but excluding, the renderer. The same instances are used by both chains."
+    renderer: Processor
+    "renders bytes in JSON mode, which `BytesLoggerFactory` expects"
+    stdlib_renderer: Processor
+    "`ProcessorFormatter` hands its output to `logging.Formatter`, which expects a str"
+
+    @property
+    def chain(self) -> list[Processor]:
+        "processors for `structlog.configure`"
+        return [*self.processors, self.renderer]
+
+    @property
+    def stdlib_pre_chain(self) -> list[Processor]:
+        "`foreign_pre_chain` for the stdlib `ProcessorFormatter`"
+        return [
+            # logger names are not supported when not using structlog.stdlib.LoggerFactory
+            # https://github.com/hynek/structlog/issues/254
+            structlog.stdlib.add_logger_name,
+            *self.processors,
+        ]
+
+    @property
+    def stdlib_chain(self) -> list[Processor]:
+        "`processors` for the stdlib `ProcessorFormatter`"
+        return [
+            # required to strip extra keys that the structlog stdlib bindings add in
+            structlog.stdlib.ProcessorFormatter.remove_processors_meta,
+            self.stdlib_renderer,
+        ]
+
+    def instrumented(self, chain: str) -> "Pipeline":
+        "A copy with every processor wrapped with timing instrumentation, see `instrumentation`"
+        *processors, renderer, stdlib_renderer = instrument_processors(
+            [*self.processors, self.renderer, self.stdlib_renderer], chain=chain
+        )
+        return replace(
+            self,
+            processors=processors,
+            renderer=renderer,
+            stdlib_renderer=stdlib_renderer,
+        )
+
+
+def build_pipeline(
+    json_logger: bool, context_fragments: bool | None = None
+) -> Pipeline:
+    """
+    Args:
+        context_fragments: serialize the bound context once per change in JSON mode, see
+            `context_fragments`. Defaults to LOG_CONTEXT_FRAGMENTS.
+    """
+    if context_fragments is None:
+        context_fragments = get_settings().log_context_fragments
+
+    # paths, activemodel objects, TypeIDs, enums, dates, UUIDs and `register_converter` types
+    normalizer = ValueNormalizer()
+    # truncates huge values before they are serialized
+    size_guard = SizeGuard.from_settings() if json_logger else None
+    # sensitive keys and values, before truncation could cut a token down to a prefix that no
+    # longer matches. Walks values only as far as `size_guard` keeps them.
+    redactor = Redactor.from_settings(size_guard)
+    # run once per context change over the bound context, not per event
+    context_processors = [normalizer, redactor, size_guard]
+
+    processors = [
+        # although this is stdlib, it's needed, although I'm not sure entirely why
+        structlog.stdlib.add_log_level,
+        # with fragments, the JSON renderer splices the bound context, normalized and serialized
+        # once per change
+        ContextFragments(
+            processors=[processor for processor in context_processors if processor]
+        )
+        if json_logger and context_fragments
+        else structlog.contextvars.merge_contextvars,
+        logger_name,
+        add_fastapi_context
+        if packages.starlette_context and not (json_logger and context_fragments)
+        else None,
+        normalizer,
+        redactor,
+        size_guard,
+        # same output as TimeStamper(fmt="iso", utc=True), formats the date and time once per second
+        CachedTimeStamper(
+            epoch_ns=json_logger and get_settings().log_timestamp_epoch_ns
+        ),
+        # add `stack_info=True` to a log and get a `stack` attached to the log
+        structlog.processors.StackInfoRenderer(),
+    ]
+
+    *mode_processors, renderer = log_processors_for_mode(json_logger)
+
+    return Pipeline(
+        json_logger=json_logger,
+        processors=[
+            processor
+            for processor in [*processors, *mode_processors]
+            if processor is not None
+        ],
+        renderer=renderer,
+        # the console renderer already returns a str
+        stdlib_renderer=orjson_str_renderer() if json_logger else renderer,
+    )
+
+
+def emit_event(
+    processors: list[Processor], logger: Any, method_name: str, event_dict: dict
+) -> None:
+    """
+    Run an event through `processors` and hand the result to `logger`, the way a bound logger does.
+    For processors which hold on to events and emit them later (request buffer, offloading).
+    """
+    rendered: Any = event_dict
+
+    try:
+        for processor in processors:
+            rendered = processor(logger, method_name, rendered)
+    except structlog.DropEvent:
+        return
+
+    if isinstance(rendered, tuple):
+        args, kwargs = rendered
+        getattr(logger, method_name)(*args, **kwargs)
+    elif isinstance(rendered, dict):
+        getattr(logger, method_name)(**rendered)
+    else:
+        getattr(logger, method_name)(rendered)
+
+
+def get_default_processors(json_logger) -> list[Processor]:
+    """
+    Return the default list of processors for structlog configuration.
+    """
+    return build_pipeline(json_logger).chain
+
+
+_pipeline: Pipeline | None = None
+
+
+def get_pipeline() -> Pipeline | None:
+    "The pipeline installed by the last `configure_logger` call, for inspection and benchmarking"
+    return _pipeline
+
+
+def set_pipeline(pipeline: Pipeline | None) -> None:
+    global _pipeline
+    _pipeline = pipeline
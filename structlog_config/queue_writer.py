@@ -0,0 +1,323 @@
+"""
+Non-blocking, queue-backed writer for the production JSON sink.
+
+With the default `BytesLoggerFactory` every `log.info` call runs a synchronous write + flush to
+stdout on the caller's thread, so a slow log collector turns into request latency. Here the caller
+only appends the rendered line to a bounded in-memory queue and a background thread drains it in
+batches.
+"""
+
+import atexit
+import logging
+import os
+import select
+import sys
+import threading
+from collections import deque
+from typing import BinaryIO, Literal
+
+OverflowPolicy = Literal["block", "drop_newest", "drop_oldest"]
+
+OVERFLOW_POLICIES: tuple[OverflowPolicy, ...] = ("block", "drop_newest", "drop_oldest")
+
+# os.writev rejects more than IOV_MAX buffers, which is 1024 on linux and macos
+MAX_BATCH_SIZE = 1024
+
+# writes up to PIPE_BUF bytes to a pipe are atomic, so lines from processes sharing stdout (pre-fork
+# servers) never interleave
+PIPE_BUF = getattr(select, "PIPE_BUF", 512)
+
+
+def pipe_buf_chunks(batch: list[bytes]) -> list[list[bytes]]:
+    "Group whole lines into writes of at most PIPE_BUF bytes, longer lines are written on their own"
+    chunks: list[list[bytes]] = []
+    chunk: list[bytes] = []
+    size = 0
+
+    for line in batch:
+        if chunk and size + len(line) > PIPE_BUF:
+            chunks.append(chunk)
+            chunk, size = [], 0
+
+        chunk.append(line)
+        size += len(line)
+
+    if chunk:
+        chunks.append(chunk)
+
+    return chunks
+
+
+class QueuedWriter:
+    """
+    Bounded queue of rendered log lines drained by a daemon thread.
+
+    Overflow policies, applied when the queue holds `max_size` lines:
+
+    - block: wait for the writer thread to make room (no lines are lost)
+    - drop_newest: discard the line being written
+    - drop_oldest: discard the oldest queued line to make room for the new one
+    """
+
+    def __init__(
+        self,
+        file: BinaryIO | None = None,
+        *,
+        max_size: int = 10_000,
+        overflow: OverflowPolicy = "block",
+        batch_size: int = 256,
+    ):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(
+                f"unknown overflow policy {overflow!r}, expected one of {OVERFLOW_POLICIES}"
+            )
+
+        self.file = file or sys.stdout.buffer
+        self.max_size = max_size
+        self.overflow = overflow
+        self.batch_size = min(batch_size, MAX_BATCH_SIZE)
+
+        self.dropped = 0
+        "lines discarded by the overflow policy"
+        self.written = 0
+        "lines handed to the underlying file"
+
+        self._queue: deque[bytes] = deque()
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._drained = threading.Condition(self._lock)
+        self._thread: threading.Thread | None = None
+        self._closed = False
+
+        try:
+            self._fileno: int | None = self.file.fileno()
+        except (AttributeError, OSError, ValueError):
+            # in-memory buffers (tests, pytest capture) do not have a file descriptor
+            self._fileno = None
+
+        atexit.register(self.close)
+
+    def put(self, line: bytes) -> None:
+        with self._lock:
+            if self._closed:
+                # the writer thread is gone, so fall back to a synchronous write
+                self._write_batch([line])
+                self._flush_file()
+                return
+
+            if len(self._queue) >= self.max_size:
+                if self.overflow == "drop_newest":
+                    self.dropped += 1
+                    return
+
+                if self.overflow == "drop_oldest":
+                    self._queue.popleft()
+                    self.dropped += 1
+                else:
+                    while len(self._queue) >= self.max_size and not self._closed:
+                        self._not_full.wait()
+
+                    if self._closed:
+                        self._write_batch([line])
+                        self._flush_file()
+                        return
+
+            self._queue.append(line)
+
+            if self._thread is None:
+                self._start()
+
+            self._not_empty.notify()
+
+    def flush(self, timeout: float | None = None) -> bool:
+        "Block until every queued line has been written. Returns False on timeout."
+        with self._lock:
+            return self._drained.wait_for(
+                lambda: not self._queue and not self._in_flight, timeout
+            )
+
+    def close(self, timeout: float | None = 5.0) -> None:
+        "Flush the queue and stop the writer thread. Registered with `atexit`."
+        with self._lock:
+            if self._closed:
+                return
+
+            self._closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+            thread = self._thread
+
+        if thread is not None:
+            thread.join(timeout)
+
+        # anything the thread did not get to (e.g. it was never started)
+        with self._lock:
+            if self._queue:
+                self._write_batch(list(self._queue))
+                self._queue.clear()
+
+            self._flush_file()
+
+        atexit.unregister(self.close)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "queued": len(self._queue),
+                "written": self.written,
+                "dropped": self.dropped,
+            }
+
+    def _before_fork(self) -> None:
+        "Drain the queue and hold the lock while forking, so the child does not inherit queued lines"
+        self.flush(timeout=1.0)
+        self._lock.acquire()
+
+    def _after_fork_in_parent(self) -> None:
+        self._lock.release()
+
+    def _after_fork_in_child(self) -> None:
+        # the lock was held by the forking thread, and the writer thread only exists in the parent
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._drained = threading.Condition(self._lock)
+        self._queue.clear()
+        self._in_flight = 0
+        self._thread = None
+
+    def _start(self) -> None:
+        # started lazily on the first line so importing or configuring does not spawn threads
+        self._thread = threading.Thread(
+            target=self._run, name="structlog-queued-writer", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                while not self._queue and not self._closed:
+                    self._not_empty.wait()
+
+                if not self._queue and self._closed:
+                    return
+
+                count = min(len(self._queue), self.batch_size)
+                batch = [self._queue.popleft() for _ in range(count)]
+                self._in_flight = count
+                self._not_full.notify_all()
+
+            success = self._write(batch)
+
+            with self._lock:
+                self._count(batch, success)
+                self._in_flight = 0
+                if not self._queue:
+                    self._drained.notify_all()
+
+    def _write_batch(self, batch: list[bytes]) -> None:
+        "Synchronous write, must be called while holding the lock"
+        self._count(batch, self._write(batch))
+
+    def _count(self, batch: list[bytes], success: bool) -> None:
+        if success:
+            self.written += len(batch)
+        else:
+            self.dropped += len(batch)
+
+    def _flush_file(self) -> None:
+        "Must be called while holding the lock"
+        if self._fileno is not None:
+            # `_writev` bypasses the python-level buffer
+            return
+
+        try:
+            self.file.flush()
+        except (OSError, ValueError):
+            pass
+
+    def _write(self, batch: list[bytes]) -> bool:
+        try:
+            if self._fileno is None:
+                # not flushed per batch, a `FileSink` flushes its own buffer on an interval
+                self.file.writelines(batch)
+            else:
+                self._writev(batch)
+        except (OSError, ValueError):
+            # the stream is closed or broken (e.g. EPIPE at shutdown), there is nowhere to report this
+            return False
+
+        return True
+
+    def _writev(self, batch: list[bytes]) -> None:
+        # anything written through the python-level buffer must land before our lines
+        self.file.flush()
+
+        for chunk in pipe_buf_chunks(batch):
+            total = sum(len(line) for line in chunk)
+            written = os.writev(self._fileno, chunk)  # type: ignore[arg-type]
+
+            if written < total:
+                # partial write, send the remainder with plain writes
+                remaining = memoryview(b"".join(chunk))[written:]
+                while remaining:
+                    remaining = remaining[os.write(self._fileno, remaining) :]  # type: ignore[arg-type]
+
+
+class QueuedBytesLogger:
+    """
+    Drop-in replacement for `structlog.BytesLogger` which enqueues lines instead of writing them.
+    """
+
+    __slots__ = ("_put",)
+
+    def __init__(self, writer: QueuedWriter):
+        self._put = writer.put
+
+    def msg(self, message: bytes) -> None:
+        self._put(message + b"\n")
+
+    log = debug = info = warn = warning = msg
+    fatal = failure = err = error = critical = exception = msg
+
+
+class QueuedWriterHandler(logging.Handler):
+    "stdlib handler for `QueuedWriter`, so stdlib records are queued in order with structlog lines"
+
+    def __init__(self, writer: QueuedWriter, level: int = logging.NOTSET):
+        super().__init__(level)
+        self.writer = writer
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self.writer.put(self.format(record).encode() + b"\n")
+        except Exception:
+            self.handleError(record)
+
+
+class QueuedBytesLoggerFactory:
+    def __init__(self, writer: QueuedWriter):
+        self.writer = writer
+
+    def __call__(self, *args) -> QueuedBytesLogger:
+        return QueuedBytesLogger(self.writer)
+
+
+_active_writer: QueuedWriter | None = None
+
+
+def get_queued_writer() -> QueuedWriter | None:
+    "The writer installed by the last `configure_logger(queue_writer=...)` call, if any."
+    return _active_writer
+
+
+def set_queued_writer(writer: QueuedWriter | None) -> None:
+    "Swap the active writer, flushing and stopping the previous one."
+    global _active_writer
+
+    if _active_writer is not None and _active_writer is not writer:
+        _active_writer.close()
+
+    _active_writer = writer
@@ -0,0 +1,264 @@
+"""
+Redaction of sensitive keys and values before rendering.
+
+A processor per pattern which walks every event is slow, and gets slower with each pattern. The
+`Redactor` compiles everything up front:
+
+- keys: an exact set plus one regex built from the glob patterns, matched case-insensitively and
+  cached per key. The whole value of a matching key is replaced, whatever its type.
+- values: one combined regex of every value pattern, so each string is scanned once. Patterns
+  declare literal hints (`@` for emails), and strings which contain none of them are not scanned
+  with the combined regex, which is several times slower than searching for the hints.
+
+Only strings are scanned: numbers, booleans and None can't contain an email or a token, and keys
+which are set by processors (`timestamp`, `level`, `logger`) are skipped. Nested dicts, lists and
+tuples are walked, and only copied when something in them was redacted. In the JSON pipeline, the
+walk stops at the collection length and depth caps of the `SizeGuard` which runs next: items past
+them are dropped by the guard, so a huge payload costs no more than what is kept of it.
+"""
+
+import re
+from fnmatch import translate
+from itertools import islice
+from typing import Any, Iterable, NamedTuple
+
+from .settings import get_settings
+from .size_guard import SizeGuard
+
+REPLACEMENT = "[REDACTED]"
+
+DEFAULT_KEYS = (
+    "password",
+    "passwd",
+    "secret",
+    "token",
+    "api_key",
+    "apikey",
+    "authorization",
+    "cookie",
+    "set-cookie",
+    "private_key",
+    "credit_card",
+    "card_number",
+    "cvv",
+    "ssn",
+    "*password*",
+    "*secret*",
+    "*_token",
+    "*-token",
+    "*api_key*",
+)
+"exact key names and glob patterns, matched case-insensitively"
+
+
+class ValuePattern(NamedTuple):
+    regex: str
+    hints: tuple[str, ...] = ()
+    "literals, one of which is part of every match. Without hints, every string is scanned."
+
+
+BUILTIN_PATTERNS = {
+    "email": ValuePattern(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}", ("@",)),
+    "bearer": ValuePattern(
+        r"(?i:bearer|basic)\s+[A-Za-z0-9\-._~+/]+=*",
+        # a case-insensitive search for the hints is as slow as the scan itself
+        ("Bearer", "bearer", "BEARER", "Basic", "basic", "BASIC"),
+    ),
+    "jwt": ValuePattern(r"eyJ[A-Za-z0-9_-]+\.[A-Za-z0-9_-]+\.[A-Za-z0-9_-]*", ("eyJ",)),
+    "aws_access_key": ValuePattern(r"\b(?:AKIA|ASIA)[0-9A-Z]{16}\b", ("AKIA", "ASIA")),
+}
+"value patterns which can be enabled by name through LOG_REDACT_PATTERNS"
+
+SKIPPED_KEYS = frozenset({"timestamp", "level", "logger"})
+"keys set by processors, never user input"
+
+_SCALARS = frozenset({int, float, bool, type(None)})
+
+MAX_CACHED_KEYS = 4096
+
+MAX_DEPTH = 32
+"values nested deeper than this are redacted as a whole rather than walked"
+
+
+def parse_names(value: str) -> list[str]:
+    "Parse `name,name` as used by LOG_REDACT_KEYS and LOG_REDACT_PATTERNS"
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+class Redactor:
+    """
+    Args:
+        keys: exact key names and glob patterns (`*_token`), matched case-insensitively
+        patterns: regexes (or `ValuePattern`s with hints) for values, replaced wherever they match in
+            a string
+        replacement: what redacted keys and matches are replaced with
+        max_collection_length: items walked per dict, list or tuple. The rest is left as is, for a
+            `SizeGuard` with the same cap which drops them.
+        max_depth: levels of nested collections walked. Deeper ones are left as is, for a
+            `SizeGuard` with the same cap which replaces them. Without it, collections nested deeper
+            than `MAX_DEPTH` are redacted as a whole.
+    """
+
+    def __init__(
+        self,
+        keys: Iterable[str] = DEFAULT_KEYS,
+        patterns: Iterable[str | ValuePattern] = (),
+        replacement: str = REPLACEMENT,
+        *,
+        max_collection_length: int | None = None,
+        max_depth: int | None = None,
+    ) -> None:
+        self.replacement = replacement
+        self.max_collection_length = max_collection_length
+        self.max_depth = max_depth
+
+        keys = [key.lower() for key in keys]
+        self.exact_keys = frozenset(key for key in keys if not _is_glob(key))
+
+        globs = [translate(key) for key in keys if _is_glob(key)]
+        self.key_regex = re.compile("|".join(globs)) if globs else None
+
+        patterns = [
+            pattern if isinstance(pattern, ValuePattern) else ValuePattern(pattern)
+            for pattern in patterns
+        ]
+        self.value_regex = (
+            re.compile("|".join(f"(?:{pattern.regex})" for pattern in patterns))
+            if patterns
+            else None
+        )
+
+        hints = [hint for pattern in patterns for hint in pattern.hints]
+        self.hint_regex = (
+            re.compile("|".join(map(re.escape, hints)))
+            if patterns and all(pattern.hints for pattern in patterns)
+            else None
+        )
+
+        self._key_cache: dict[Any, bool] = {}
+
+    @classmethod
+    def from_settings(cls, size_guard: SizeGuard | None = None) -> "Redactor | None":
+        """
+        The redactor configured through the environment, or None if redaction is disabled. With
+        `size_guard`, values are walked only as far as the guard keeps them.
+        """
+        settings = get_settings()
+
+        if not settings.log_redact:
+            return None
+
+        names = parse_names(settings.log_redact_patterns)
+        if unknown := set(names) - BUILTIN_PATTERNS.keys():
+            raise ValueError(
+                f"unknown redaction patterns: {', '.join(sorted(unknown))}"
+            )
+
+        return cls(
+            keys=[*DEFAULT_KEYS, *parse_names(settings.log_redact_keys)],
+            patterns=[BUILTIN_PATTERNS[name] for name in names],
+            max_collection_length=size_guard.max_collection_length
+            if size_guard
+            else None,
+            max_depth=size_guard.max_depth if size_guard else None,
+        )
+
+    def is_sensitive_key(self, key: Any) -> bool:
+        try:
+            return self._key_cache[key]
+        except KeyError:
+            pass
+
+        if isinstance(key, str):
+            lowered = key.lower()
+            sensitive = lowered in self.exact_keys or bool(
+                self.key_regex and self.key_regex.match(lowered)
+            )
+        else:
+            sensitive = False
+
+        # keys are mostly literals from the code, but dicts with generated keys are unbounded
+        if len(self._key_cache) >= MAX_CACHED_KEYS:
+            self._key_cache.clear()
+
+        self._key_cache[key] = sensitive
+        return sensitive
+
+    def redact_value(self, value: Any, depth: int = 1) -> Any:
+        "`value` itself if there is nothing to redact, a redacted copy otherwise"
+        if type(value) is str:
+            if self.value_regex is None:
+                return value
+
+            if self.hint_regex is not None and not self.hint_regex.search(value):
+                return value
+
+            # returns `value` itself when nothing matches
+            return self.value_regex.sub(self.replacement, value)
+
+        if isinstance(value, dict):
+            if self.max_depth is not None and depth > self.max_depth:
+                return value
+
+            if depth > MAX_DEPTH:
+                return self.replacement
+
+            redacted_dict = None
+
+            for key, item in islice(value.items(), self.max_collection_length):
+                redacted = (
+                    self.replacement
+                    if self.is_sensitive_key(key)
+                    else self.redact_value(item, depth + 1)
+                )
+
+                if redacted is not item:
+                    if redacted_dict is None:
+                        redacted_dict = dict(value)
+                    redacted_dict[key] = redacted
+
+            return value if redacted_dict is None else redacted_dict
+
+        if isinstance(value, (list, tuple)):
+            if self.max_depth is not None and depth > self.max_depth:
+                return value
+
+            if depth > MAX_DEPTH:
+                return self.replacement
+
+            redacted_list = None
+
+            for index, item in enumerate(islice(value, self.max_collection_length)):
+                redacted = self.redact_value(item, depth + 1)
+
+                if redacted is not item:
+                    if redacted_list is None:
+                        redacted_list = list(value)
+                    redacted_list[index] = redacted
+
+            return value if redacted_list is None else redacted_list
+
+        return value
+
+    def __call__(self, logger: Any, method_name: str, event_dict: dict) -> dict:
+        for key, value in event_dict.items():
+            if self.is_sensitive_key(key):
+                # replacing values of existing keys is fine while iterating
+                event_dict[key] = self.replacement
+                continue
+
+            value_type = type(value)
+
+            if value_type in _SCALARS:
+                continue
+
+            if value_type is str and (self.value_regex is None or key in SKIPPED_KEYS):
+                continue
+
+            event_dict[key] = self.redact_value(value)
+
+        return event_dict
+
+
+def _is_glob(key: str) -> bool:
+    return any(character in key for character in "*?[")
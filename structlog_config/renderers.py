@@ -0,0 +1,66 @@
+"""
+orjson-backed JSON rendering for both the structlog and stdlib logging chains.
+"""
+
+import orjson
+import structlog
+
+from .context_fragments import FRAGMENT_KEY
+
+ORJSON_OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+"""
+sort_keys=True is not supported, so we do it with an orjson option. starlette-context includes
+non-string keys (enums).
+"""
+
+
+def orjson_dumps_sorted(value, *args, **kwargs) -> bytes:
+    # kwargs includes a default fallback json formatter
+    return orjson.dumps(value, option=ORJSON_OPTIONS, **kwargs)
+
+
+def orjson_dumps_sorted_str(value, *args, **kwargs) -> str:
+    """
+    `ProcessorFormatter` hands the rendered value to `logging.Formatter`, which expects a `str`.
+    Decoding orjson's UTF-8 output is still several times faster than the stdlib `json` module.
+    """
+    return orjson.dumps(value, option=ORJSON_OPTIONS, **kwargs).decode()
+
+
+class FragmentJSONRenderer(structlog.processors.JSONRenderer):
+    """
+    `JSONRenderer` which splices the context fragment left by `ContextFragments` in front of the
+    event's keys, see `context_fragments`. Events without a fragment are rendered as usual.
+    """
+
+    def __call__(self, logger, name, event_dict):
+        fragment = event_dict.pop(FRAGMENT_KEY, None)
+        rendered = self._dumps(event_dict, **self._dumps_kw)
+
+        if fragment is None:
+            return rendered
+
+        context = fragment.render(self, self._serialize, event_dict)
+
+        if context is None:
+            return rendered
+
+        # `{` context `,` the event's keys `}`, unless the event is empty
+        separator = "," if isinstance(rendered, str) else b","
+        if len(rendered) > 2:
+            context += separator
+
+        return rendered[:1] + context + rendered[1:]
+
+    def _serialize(self, value: dict):
+        return self._dumps(value, **self._dumps_kw)
+
+
+def orjson_renderer() -> FragmentJSONRenderer:
+    "Renders bytes, for use with `BytesLoggerFactory`"
+    return FragmentJSONRenderer(serializer=orjson_dumps_sorted)
+
+
+def orjson_str_renderer() -> FragmentJSONRenderer:
+    "Renders str, for use as the final processor of a `ProcessorFormatter`"
+    return FragmentJSONRenderer(serializer=orjson_dumps_sorted_str)
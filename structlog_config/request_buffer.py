@@ -0,0 +1,224 @@
+"""
+Tail-based buffering of low level logs per request.
+
+Production runs at INFO because rendering and shipping DEBUG logs for every request is too
+expensive. With a request buffer, events below the log level (down to the buffer level) are kept in
+memory, unrendered, for the duration of a request. When the request fails (5xx, an exception) or is
+slow they are run through the rest of the processor chain and emitted, otherwise they are dropped.
+
+The access log middleware opens and closes the buffers, see `fastapi_access_logger`.
+"""
+
+import contextvars
+import logging
+import threading
+from collections import deque
+from contextvars import ContextVar, Token
+from itertools import chain, islice
+from time import time_ns
+from typing import Any, Callable
+
+import structlog
+from structlog.types import Processor
+
+from .pipeline import emit_event
+from .timestamps import RECORD_TIME_KEY
+
+OVERFLOW_EVENT = "request log buffer overflowed"
+
+# structlog method names, `log.exception` logs at error
+_METHOD_LEVELS = {
+    name.lower(): level for name, level in logging.getLevelNamesMapping().items()
+}
+_METHOD_LEVELS["exception"] = logging.ERROR
+
+
+class RequestBuffer:
+    "Buffered events of a single request"
+
+    __slots__ = ("records", "size", "dropped", "logger")
+
+    def __init__(self) -> None:
+        self.records: deque[tuple[Any, str, dict, contextvars.Context, int]] = deque()
+        self.size = 0
+        self.dropped = 0
+        self.logger: Any = None
+
+
+_current_buffer: ContextVar[RequestBuffer | None] = ContextVar(
+    "request_log_buffer", default=None
+)
+
+
+OBJECT_SIZE = 32
+"estimate for values which are neither strings nor collections"
+
+
+def _estimate_size(event_dict: dict, limit: int) -> int:
+    """
+    Rough size of an event once rendered, without rendering it. Nested dicts, lists, tuples and sets
+    are walked. Every value counts at least one byte, so the walk stops as soon as the size is known
+    to exceed `limit`, and a huge or cyclic value costs at most `limit` steps.
+    """
+    size = 0
+    pending: list[Any] = [event_dict]
+
+    while pending:
+        # every pending value adds at least one byte
+        if size + len(pending) > limit:
+            return limit + 1
+
+        value = pending.pop()
+
+        if isinstance(value, (str, bytes)):
+            size += len(value) + 2
+        elif isinstance(value, dict):
+            size += 2
+            pending.extend(islice(chain.from_iterable(value.items()), limit + 1))
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            size += 2
+            pending.extend(islice(value, limit + 1))
+        elif isinstance(value, (int, float, bool)) or value is None:
+            size += 8
+        else:
+            size += OBJECT_SIZE
+
+    return size
+
+
+class RequestBufferProcessor:
+    """
+    First processor in the structlog chain when request buffering is enabled.
+
+    Events at or above `emit_level` pass through. Lower events are buffered when a request buffer is
+    open and dropped otherwise. The bound logger filters at `level`, so events below it never get here.
+
+    Buffers are capped at `max_bytes` per request (the oldest events are dropped first, the ones
+    closest to a failure are the interesting ones) and `max_total_bytes` across all open requests.
+    Sizes are estimates of the rendered size.
+    """
+
+    def __init__(
+        self,
+        *,
+        level: int = logging.DEBUG,
+        emit_level: int = logging.INFO,
+        slow_ms: float = 1000,
+        max_bytes: int = 64 * 1024,
+        max_total_bytes: int = 16 * 1024 * 1024,
+    ) -> None:
+        self.level = level
+        self.emit_level = emit_level
+        self.slow_ms = slow_ms
+        self.max_bytes = max_bytes
+        self.max_total_bytes = max_total_bytes
+
+        self.downstream: list[Processor] = []
+        "the processors following this one, set by `configure_logger`"
+        self.levels: Callable[[str | None], int] | None = None
+        "emit level per `logger_name`, replaces `emit_level` when set by `configure_logger`"
+
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, logger: Any, method_name: str, event_dict: dict) -> dict:
+        emit_level = (
+            self.levels(event_dict.get("logger_name"))
+            if self.levels
+            else self.emit_level
+        )
+
+        if _METHOD_LEVELS[method_name] >= emit_level:
+            return event_dict
+
+        buffer = _current_buffer.get()
+        if buffer is not None:
+            self._add(buffer, logger, method_name, event_dict)
+
+        raise structlog.DropEvent
+
+    def _add(
+        self, buffer: RequestBuffer, logger: Any, method_name: str, event_dict: dict
+    ) -> None:
+        size = _estimate_size(event_dict, self.max_bytes)
+        buffer.logger = logger
+
+        with self._lock:
+            if self._total + size > self.max_total_bytes or size > self.max_bytes:
+                buffer.dropped += 1
+                return
+
+            while buffer.size + size > self.max_bytes:
+                *_, oldest_size = buffer.records.popleft()
+                buffer.size -= oldest_size
+                self._total -= oldest_size
+                buffer.dropped += 1
+
+            buffer.size += size
+            self._total += size
+
+        # the context is captured now so the event is rendered with the contextvars bound at log time
+        event_dict[RECORD_TIME_KEY] = time_ns()
+        buffer.records.append(
+            (logger, method_name, event_dict, contextvars.copy_context(), size)
+        )
+
+    def start(self) -> Token | None:
+        "Open a buffer for the current request. Returns None if one is already open."
+        if _current_buffer.get() is not None:
+            return None
+
+        return _current_buffer.set(RequestBuffer())
+
+    def should_flush(self, status_code: int, elapsed_ms: float, failed: bool) -> bool:
+        return (
+            failed
+            or status_code >= 500
+            or (self.slow_ms > 0 and elapsed_ms >= self.slow_ms)
+        )
+
+    def finish(self, token: Token, flush: bool) -> None:
+        "Close the buffer opened by `start`, emitting its events if `flush`"
+        buffer = _current_buffer.get()
+        _current_buffer.reset(token)
+
+        if buffer is None:
+            return
+
+        with self._lock:
+            self._total -= buffer.size
+
+        if not flush:
+            return
+
+        for logger, method_name, event_dict, context, _ in buffer.records:
+            context.run(emit_event, self.downstream, logger, method_name, event_dict)
+
+        if buffer.dropped:
+            emit_event(
+                self.downstream,
+                buffer.logger,
+                "warning",
+                {"event": OVERFLOW_EVENT, "dropped": buffer.dropped},
+            )
+
+    def stats(self) -> dict[str, int]:
+        return {"buffered_bytes": self._total}
+
+    def _after_fork_in_child(self) -> None:
+        # requests in flight belong to the parent
+        self._lock = threading.Lock()
+        self._total = 0
+
+
+_active_buffer: RequestBufferProcessor | None = None
+
+
+def get_request_buffer() -> RequestBufferProcessor | None:
+    "The request buffer installed by `configure_logger`, if request buffering is enabled"
+    return _active_buffer
+
+
+def set_request_buffer(request_buffer: RequestBufferProcessor | None) -> None:
+    global _active_buffer
+    _active_buffer = request_buffer
@@ -0,0 +1,256 @@
+"""
+Resolved, immutable snapshot of the environment configuration.
+
+`is_production()`, the log level and friends used to hit `decouple.config` / `os.environ` on every
+call, and user code calls them on hot paths. They are resolved once into a `Settings` snapshot which
+every module reads. `configure_logger` refreshes the snapshot, as does `refresh()` (useful in tests
+which change the environment).
+"""
+
+import logging
+import os
+import typing as t
+from dataclasses import dataclass
+from pathlib import Path
+
+from decouple import AutoConfig
+
+
+class _AutoConfig(AutoConfig):
+    """
+    `decouple.config`, minus two import-time costs:
+
+    - when no settings file exists, python-decouple-typed never recognizes the filesystem root (it
+      compares a str to a Path) and recurses until RecursionError, which takes ~85ms
+    - the search starts from the caller's module path, which for module-level lookups is an
+      importlib frame that resolves to the working directory. Start from the working directory
+      explicitly so the result doesn't depend on which call happens first.
+    """
+
+    def _find_file(self, path: str | Path) -> Path | str:
+        path = Path(path).resolve()
+
+        for directory in (path, *path.parents):
+            for config_file in self.SUPPORTED:
+                file_path = directory / config_file
+                if file_path.is_file():
+                    return file_path
+
+        return ""
+
+    def _caller_path(self) -> Path:
+        return Path.cwd()
+
+
+config = _AutoConfig()
+
+
+@dataclass(frozen=True)
+class Settings:
+    python_env: str
+    "PYTHON_ENV, lowercased"
+    log_level_name: str
+    "LOG_LEVEL, uppercased"
+    log_levels: str
+    "per-logger level rules, e.g. `sqlalchemy=WARNING,app.billing=DEBUG`, see `levels`"
+    log_level_signals: bool
+    "SIGUSR1 switches to DEBUG, SIGUSR2 restores the configured levels"
+    log_level_signal_ttl: float
+    "seconds after which SIGUSR1's DEBUG reverts, 0 keeps it until SIGUSR2"
+    no_color: bool
+    "support NO_COLOR standard https://no-color.org"
+    python_log_path: str | None
+    "write logs to this file instead of stdout, see `file_sink`"
+    log_file_buffer_size: int
+    log_file_flush_interval: float
+    log_file_max_bytes: int
+    "rotate PYTHON_LOG_PATH once it is larger than this, 0 disables"
+    log_file_rotate_interval: float
+    "rotate PYTHON_LOG_PATH every N seconds, 0 disables"
+    log_file_backup_count: int
+    log_file_compress: bool
+    "gzip rotated files"
+    pythonasynciodebug: bool
+    log_queue_writer: bool
+    "hand rendered JSON lines to a background writer thread instead of writing them inline"
+    log_queue_size: int
+    log_queue_overflow: str
+    "block, drop_newest or drop_oldest"
+    log_processor_timing: bool
+    "wrap every processor with timing instrumentation, see `structlog_config.instrumentation`"
+    log_processor_timing_interval: float
+    "log the processor timings every N seconds and at exit, 0 disables the report"
+    log_timestamp_epoch_ns: bool
+    "render JSON timestamps as integer nanoseconds since the epoch instead of ISO strings"
+    log_context_fragments: bool
+    "serialize the bound context once per change in JSON logs, see `context_fragments`"
+    log_dedup: bool
+    "drop repeated structlog events, emitting `repeated=N` periodically, see `dedup`"
+    log_dedup_warnings: bool
+    "drop repeated Python warnings the same way"
+    log_dedup_interval: float
+    "seconds during which repeated occurrences are dropped"
+    log_dedup_max_fingerprints: int
+    "fingerprints tracked, the least recently seen one is evicted and its count summarized"
+    log_exception_cache_size: int
+    "formatted tracebacks kept for repeated exceptions in JSON logs, see `exception_cache`"
+    log_exception_compact_after: int
+    "full tracebacks logged per exception fingerprint and window, then the last line. 0 disables"
+    log_exception_compact_window: float
+    "seconds after which an exception fingerprint gets full tracebacks again"
+    log_redact: bool
+    "redact sensitive keys and values, see `redaction`"
+    log_redact_keys: str
+    "key names and glob patterns to redact in addition to the built-in ones, e.g. `ssn,*_pin`"
+    log_redact_patterns: str
+    "built-in value patterns to redact: email, bearer, jwt, aws_access_key. None by default"
+    log_max_string_length: int
+    "characters kept of a string value in JSON logs, 0 disables, see `size_guard`"
+    log_max_collection_length: int
+    "items kept of a list, tuple, set or dict value in JSON logs, 0 disables"
+    log_max_depth: int
+    "levels of nested collections kept in JSON logs, 0 disables"
+    log_request_buffer: bool
+    "buffer events below LOG_LEVEL per request and emit them only for failed or slow requests"
+    log_request_buffer_level_name: str
+    log_request_buffer_slow_ms: float
+    "requests slower than this flush their buffer, 0 disables"
+    log_request_buffer_max_bytes: int
+    log_request_buffer_total_bytes: int
+    log_access_sample_rate: float
+    "sample rate of access log lines for routes without a rate in LOG_ACCESS_SAMPLE_RATES"
+    log_access_sample_rates: str
+    "route glob pattern to sample rate, e.g. `*.healthcheck=0.01,*.poll=0.1`"
+    log_access_rate_limits: str
+    "route glob pattern to maximum access log lines per second, e.g. `*.poll=5`"
+    log_access_slow_ms: float
+    "requests slower than this are always logged when sampling, 0 disables"
+    log_offload: bool
+    "process events logged on an asyncio event loop on a worker thread, see `offload`"
+    log_offload_measure: bool
+    "record the time the event loop spends in logging calls"
+    log_offload_queue_size: int
+    log_access_histograms: bool
+    "record per-route latency histograms in the access log middleware"
+    log_access_histogram_interval: float
+    "log the latency histogram summaries every N seconds and at exit, 0 disables the report"
+
+    @property
+    def log_level(self) -> int:
+        return logging.getLevelNamesMapping()[self.log_level_name]
+
+    @property
+    def log_request_buffer_level(self) -> int:
+        return logging.getLevelNamesMapping()[self.log_request_buffer_level_name]
+
+    @property
+    def json_logger(self) -> bool:
+        "JSON logs are the default in production and staging"
+        return self.python_env in ("production", "staging")
+
+
+def load_settings() -> Settings:
+    return Settings(
+        python_env=t.cast(
+            str, config("PYTHON_ENV", default="development", cast=str)
+        ).lower(),
+        log_level_name=config("LOG_LEVEL", default="INFO", cast=str).upper(),
+        log_levels=config("LOG_LEVELS", default="", cast=str),
+        log_level_signals=config("LOG_LEVEL_SIGNALS", default=False, cast=bool),
+        log_level_signal_ttl=config("LOG_LEVEL_SIGNAL_TTL", default=900.0, cast=float),
+        no_color="NO_COLOR" in os.environ,
+        python_log_path=config("PYTHON_LOG_PATH", default=None),
+        log_file_buffer_size=config(
+            "LOG_FILE_BUFFER_SIZE", default=256 * 1024, cast=int
+        ),
+        log_file_flush_interval=config(
+            "LOG_FILE_FLUSH_INTERVAL", default=1.0, cast=float
+        ),
+        log_file_max_bytes=config("LOG_FILE_MAX_BYTES", default=0, cast=int),
+        log_file_rotate_interval=config(
+            "LOG_FILE_ROTATE_INTERVAL", default=0.0, cast=float
+        ),
+        log_file_backup_count=config("LOG_FILE_BACKUP_COUNT", default=5, cast=int),
+        log_file_compress=config("LOG_FILE_COMPRESS", default=False, cast=bool),
+        pythonasynciodebug=config("PYTHONASYNCIODEBUG", default=False, cast=bool),
+        log_queue_writer=config("LOG_QUEUE_WRITER", default=False, cast=bool),
+        log_queue_size=config("LOG_QUEUE_SIZE", default=10_000, cast=int),
+        log_queue_overflow=config("LOG_QUEUE_OVERFLOW", default="block", cast=str),
+        log_processor_timing=config("LOG_PROCESSOR_TIMING", default=False, cast=bool),
+        log_processor_timing_interval=config(
+            "LOG_PROCESSOR_TIMING_INTERVAL", default=0.0, cast=float
+        ),
+        log_timestamp_epoch_ns=config(
+            "LOG_TIMESTAMP_EPOCH_NS", default=False, cast=bool
+        ),
+        log_context_fragments=config("LOG_CONTEXT_FRAGMENTS", default=False, cast=bool),
+        log_dedup=config("LOG_DEDUP", default=False, cast=bool),
+        log_dedup_warnings=config("LOG_DEDUP_WARNINGS", default=True, cast=bool),
+        log_dedup_interval=config("LOG_DEDUP_INTERVAL", default=60.0, cast=float),
+        log_dedup_max_fingerprints=config(
+            "LOG_DEDUP_MAX_FINGERPRINTS", default=1024, cast=int
+        ),
+        log_exception_cache_size=config(
+            "LOG_EXCEPTION_CACHE_SIZE", default=256, cast=int
+        ),
+        log_exception_compact_after=config(
+            "LOG_EXCEPTION_COMPACT_AFTER", default=0, cast=int
+        ),
+        log_exception_compact_window=config(
+            "LOG_EXCEPTION_COMPACT_WINDOW", default=60.0, cast=float
+        ),
+        log_redact=config("LOG_REDACT", default=True, cast=bool),
+        log_redact_keys=config("LOG_REDACT_KEYS", default="", cast=str),
+        log_redact_patterns=config("LOG_REDACT_PATTERNS", default="", cast=str),
+        log_max_string_length=config("LOG_MAX_STRING_LENGTH", default=10_000, cast=int),
+        log_max_collection_length=config(
+            "LOG_MAX_COLLECTION_LENGTH", default=1000, cast=int
+        ),
+        log_max_depth=config("LOG_MAX_DEPTH", default=10, cast=int),
+        log_request_buffer=config("LOG_REQUEST_BUFFER", default=False, cast=bool),
+        log_request_buffer_level_name=config(
+            "LOG_REQUEST_BUFFER_LEVEL", default="DEBUG", cast=str
+        ).upper(),
+        log_request_buffer_slow_ms=config(
+            "LOG_REQUEST_BUFFER_SLOW_MS", default=1000.0, cast=float
+        ),
+        log_request_buffer_max_bytes=config(
+            "LOG_REQUEST_BUFFER_MAX_BYTES", default=64 * 1024, cast=int
+        ),
+        log_request_buffer_total_bytes=config(
+            "LOG_REQUEST_BUFFER_TOTAL_BYTES", default=16 * 1024 * 1024, cast=int
+        ),
+        log_access_sample_rate=config(
+            "LOG_ACCESS_SAMPLE_RATE", default=1.0, cast=float
+        ),
+        log_access_sample_rates=config("LOG_ACCESS_SAMPLE_RATES", default="", cast=str),
+        log_access_rate_limits=config("LOG_ACCESS_RATE_LIMITS", default="", cast=str),
+        log_access_slow_ms=config("LOG_ACCESS_SLOW_MS", default=1000.0, cast=float),
+        log_offload=config("LOG_OFFLOAD", default=False, cast=bool),
+        log_offload_measure=config("LOG_OFFLOAD_MEASURE", default=False, cast=bool),
+        log_offload_queue_size=config(
+            "LOG_OFFLOAD_QUEUE_SIZE", default=10_000, cast=int
+        ),
+        log_access_histograms=config("LOG_ACCESS_HISTOGRAMS", default=False, cast=bool),
+        log_access_histogram_interval=config(
+            "LOG_ACCESS_HISTOGRAM_INTERVAL", default=60.0, cast=float
+        ),
+    )
+
+
+_settings: Settings | None = None
+
+
+def get_settings() -> Settings:
+    if _settings is None:
+        return refresh()
+
+    return _settings
+
+
+def refresh() -> Settings:
+    "Re-read the environment, e.g. after a test changed it"
+    global _settings
+
+    _settings = load_settings()
+    return _settings
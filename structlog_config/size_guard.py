@@ -0,0 +1,176 @@
+"""
+Caps on the size of logged values, for the JSON pipeline.
+
+One `log.info("x", payload=huge_dict)` makes orjson serialize megabytes on the calling thread and
+ships them to the log pipeline. `SizeGuard` walks event values before rendering and truncates:
+
+- strings longer than `max_string_length`: `"abc…[truncated 48213 chars]"`
+- lists, tuples, sets and dicts with more than `max_collection_length` items: the first items are
+  kept, followed by a `"…[truncated 12 items]"` item (a `"…"` key for dicts)
+- collections nested deeper than `max_depth`: replaced with `"…[truncated dict of 3 items]"`
+
+Only as much of a value as is kept is looked at, so the cost is bounded by the caps rather than by
+the size of the value. Values are copied when they are truncated, never modified in place.
+Truncations are counted per logger name, see `get_truncation_counts`.
+"""
+
+import threading
+from collections import Counter
+from itertools import islice
+from typing import Any
+
+from .context_fragments import CONTEXT_METHOD_NAME
+from .settings import get_settings
+
+MARKER = "…"
+
+CONTEXT_LOGGER = "<context>"
+"truncations of bound context values are counted under this name, they are capped only once"
+
+_SCALARS = frozenset({int, float, bool, type(None)})
+
+_truncations: Counter[str] = Counter()
+_lock = threading.Lock()
+
+
+def get_truncation_counts() -> dict[str, int]:
+    "Truncated values per logger name, since startup or `reset_truncation_counts`"
+    with _lock:
+        return dict(_truncations)
+
+
+def reset_truncation_counts() -> None:
+    with _lock:
+        _truncations.clear()
+
+
+def _after_fork_in_child() -> None:
+    global _lock
+
+    # the lock may have been held by another thread, and the parent reports its own counts
+    _lock = threading.Lock()
+    _truncations.clear()
+
+
+class SizeGuard:
+    """
+    Args:
+        max_string_length: characters kept of a string, 0 disables
+        max_collection_length: items kept of a list, tuple, set or dict, 0 disables
+        max_depth: levels of nested collections kept below the event dict, 0 disables
+    """
+
+    def __init__(
+        self,
+        *,
+        max_string_length: int = 10_000,
+        max_collection_length: int = 1000,
+        max_depth: int = 10,
+    ) -> None:
+        self.max_string_length = max_string_length or None
+        self.max_collection_length = max_collection_length or None
+        self.max_depth = max_depth or None
+
+    @classmethod
+    def from_settings(cls) -> "SizeGuard | None":
+        "The guard configured through the environment, or None if every cap is disabled"
+        settings = get_settings()
+
+        if not (
+            settings.log_max_string_length
+            or settings.log_max_collection_length
+            or settings.log_max_depth
+        ):
+            return None
+
+        return cls(
+            max_string_length=settings.log_max_string_length,
+            max_collection_length=settings.log_max_collection_length,
+            max_depth=settings.log_max_depth,
+        )
+
+    def _cap(self, value: Any, depth: int, truncated: list[int]) -> Any:
+        "`value` itself if it is within the caps, a truncated copy otherwise"
+        if type(value) is str:
+            limit = self.max_string_length
+            if limit is None or len(value) <= limit:
+                return value
+
+            truncated[0] += 1
+            return f"{value[:limit]}{MARKER}[truncated {len(value) - limit} chars]"
+
+        if isinstance(value, dict):
+            items = value.items()
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            items = None
+        else:
+            return value
+
+        if self.max_depth is not None and depth > self.max_depth:
+            truncated[0] += 1
+            return f"{MARKER}[truncated {type(value).__name__} of {len(value)} items]"
+
+        limit = self.max_collection_length
+        dropped = len(value) - limit if limit is not None and len(value) > limit else 0
+
+        if items is not None:
+            capped_items = {}
+            changed = False
+
+            for key, item in islice(items, limit):
+                capped = self._cap(item, depth + 1, truncated)
+                changed = changed or capped is not item
+                capped_items[key] = capped
+
+            if dropped:
+                truncated[0] += 1
+                capped_items[MARKER] = f"[truncated {dropped} items]"
+            elif not changed:
+                return value
+
+            return capped_items
+
+        capped_list = []
+        changed = False
+
+        for item in islice(value, limit):
+            capped = self._cap(item, depth + 1, truncated)
+            changed = changed or capped is not item
+            capped_list.append(capped)
+
+        if dropped:
+            truncated[0] += 1
+            capped_list.append(f"{MARKER}[truncated {dropped} items]")
+        elif not changed:
+            return value
+
+        return capped_list
+
+    def __call__(self, logger: Any, method_name: str, event_dict: dict) -> dict:
+        truncated = [0]
+        max_string_length = self.max_string_length
+        # before the loop, the name itself may be truncated
+        name = event_dict.get("logger")
+
+        for key, value in event_dict.items():
+            value_type = type(value)
+
+            if value_type in _SCALARS:
+                continue
+
+            if value_type is str and (
+                max_string_length is None or len(value) <= max_string_length
+            ):
+                continue
+
+            # replacing values of existing keys is fine while iterating
+            event_dict[key] = self._cap(value, 1, truncated)
+
+        if truncated[0]:
+            if method_name == CONTEXT_METHOD_NAME:
+                name = CONTEXT_LOGGER
+
+            with _lock:
+                _truncations[name or "root"] += truncated[0]
+
+        return event_dict
@@ -1,19 +1,19 @@
 import logging
 import sys
 
-import structlog
-from decouple import config
-
-from .constants import PYTHONASYNCIODEBUG
-from .environments import is_production, is_staging
+from . import levels
+from .file_sink import FileSink, FileSinkHandler
+from .pipeline import Pipeline, build_pipeline
+from .queue_writer import QueuedWriter, QueuedWriterHandler
+from .settings import get_settings
 
 
 def _get_log_level_name() -> str:
-    return config("LOG_LEVEL", default="INFO", cast=str).upper()
+    return get_settings().log_level_name
 
 
 def _get_log_level():
-    return logging.getLevelNamesMapping()[_get_log_level_name()]
+    return get_settings().log_level
 
 
 def reset_stdlib_logger(
@@ -28,10 +28,20 @@ def reset_stdlib_logger(
         std_logger.setLevel(level_override)
 
 
-def redirect_stdlib_loggers(json_logger: bool):
+def redirect_stdlib_loggers(
+    json_logger: bool,
+    instrument: bool = False,
+    pipeline: Pipeline | None = None,
+    file_sink: FileSink | None = None,
+    queue_writer: QueuedWriter | None = None,
+):
     """
     Redirect all standard logging module loggers to use the structlog configuration.
 
+    `pipeline` should be the one used for structlog, so both share processor instances. A new one is
+    built when it is omitted. Records are queued on `queue_writer`, or written to `file_sink`,
+    instead of stdout when they are given.
+
     Inspired by: https://gist.github.com/nymous/f138c7f06062b7c43c060bf03759c29e
     """
     from structlog.stdlib import ProcessorFormatter
@@ -39,33 +49,28 @@ def redirect_stdlib_loggers(json_logger: bool):
     level = _get_log_level()
 
     # Create a handler for the root logger
-    handler = logging.StreamHandler(sys.stdout)
+    handler: logging.Handler
+    if queue_writer:
+        # the queue writer writes into the file sink when both are enabled
+        handler = QueuedWriterHandler(queue_writer)
+    elif file_sink:
+        handler = FileSinkHandler(file_sink)
+    else:
+        handler = logging.StreamHandler(sys.stdout)
+
     handler.setLevel(level)
 
-    # TODO I don't understand why we can't use a processor stack as-is here. Need to investigate further.
+    if pipeline is None:
+        pipeline = build_pipeline(json_logger)
 
-    # Use ProcessorFormatter to format log records using structlog processors
-    from .__init__ import get_default_processors
-
-    processors = get_default_processors(json_logger=json_logger)
+    if instrument:
+        pipeline = pipeline.instrumented(chain="stdlib")
 
+    # Use ProcessorFormatter to format log records using structlog processors
     formatter = ProcessorFormatter(
-        processors=[
-            # required to strip extra keys that the structlog stdlib bindings add in
-            structlog.stdlib.ProcessorFormatter.remove_processors_meta,
-            processors[-1]
-            if not is_production() and not is_staging()
-            # don't use ORJSON here, as the stdlib formatter chain expects a str not a bytes
-            else structlog.processors.JSONRenderer(sort_keys=True),
-        ],
+        processors=pipeline.stdlib_chain,
         # processors unique to stdlib logging
-        foreign_pre_chain=[
-            # logger names are not supported when not using structlog.stdlib.LoggerFactory
-            # https://github.com/hynek/structlog/issues/254
-            structlog.stdlib.add_logger_name,
-            # omit the renderer so we can implement our own
-            *processors[:-1],
-        ],
+        foreign_pre_chain=pipeline.stdlib_pre_chain,
     )
     handler.setFormatter(formatter)
 
@@ -108,6 +113,11 @@ def redirect_stdlib_loggers(json_logger: bool):
             logger_config.get("levels", {}).get(logging.getLevelName(level)),
         )
 
+    # LOG_LEVELS, this also lowers the handler level when a rule is more verbose than LOG_LEVEL
+    levels.apply_stdlib_levels(
+        level, levels.parse_level_rules(get_settings().log_levels)
+    )
+
     # TODO do i need to setup exception overrides as well?
     # https://gist.github.com/nymous/f138c7f06062b7c43c060bf03759c29e#file-custom_logging-py-L114-L128
     # if sys.excepthook != sys.__excepthook__:
@@ -116,7 +126,8 @@ def redirect_stdlib_loggers(json_logger: bool):
 
 def silence_loud_loggers():
     # unless we are explicitly debugging asyncio, I don't want to hear from it
-    if not PYTHONASYNCIODEBUG:
+    # an explicit LOG_LEVELS rule wins
+    if not get_settings().pythonasynciodebug and "asyncio" not in levels._rule_loggers:
         logging.getLogger("asyncio").setLevel(logging.WARNING)
 
     # TODO httpcore, httpx, urlconnection, etc
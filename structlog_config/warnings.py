@@ -1,13 +1,32 @@
 """
 Warning setup functionality to redirect Python warnings to structlog.
+
+Repeated warnings (same message, category and location) are throttled, see `dedup`.
 """
 
 import warnings
-from typing import Any, TextIO
+from typing import Any, Hashable, TextIO
 
 import structlog
 
+from .dedup import REPEATED_KEY, Deduplicator
+from .settings import get_settings
+
 _original_warnings_showwarning: Any = None
+_deduplicator: Deduplicator | None = None
+
+WARNINGS_LOGGER = "py.warnings"
+
+
+def _log_summary(fingerprint: Hashable, count: int) -> None:
+    message, category, filename, lineno = fingerprint  # type: ignore[misc]
+    structlog.get_logger(logger_name=WARNINGS_LOGGER).warning(
+        message,
+        category=category,
+        filename=filename,
+        lineno=lineno,
+        **{REPEATED_KEY: count},
+    )
 
 
 def _showwarning(
@@ -33,9 +52,23 @@ def _showwarning(
                 message, category, filename, lineno, file, line
             )
     else:
-        log = structlog.get_logger(logger_name="py.warnings")
+        event = str(message)
+        extra = {}
+
+        if _deduplicator is not None:
+            repeated = _deduplicator.check((event, category.__name__, filename, lineno))
+            if repeated is None:
+                return
+            if repeated:
+                extra[REPEATED_KEY] = repeated
+
+        log = structlog.get_logger(logger_name=WARNINGS_LOGGER)
         log.warning(
-            str(message), category=category.__name__, filename=filename, lineno=lineno
+            event,
+            category=category.__name__,
+            filename=filename,
+            lineno=lineno,
+            **extra,
         )
 
 
@@ -43,7 +76,22 @@ def redirect_showwarnings():
     """
     Redirect Python warnings to use structlog for logging.
     """
-    global _original_warnings_showwarning
+    global _original_warnings_showwarning, _deduplicator
+
+    settings = get_settings()
+
+    if _deduplicator is not None:
+        _deduplicator.flush()
+
+    _deduplicator = (
+        Deduplicator(
+            interval=settings.log_dedup_interval,
+            max_fingerprints=settings.log_dedup_max_fingerprints,
+            on_summary=_log_summary,
+        )
+        if settings.log_dedup_warnings
+        else None
+    )
 
     if _original_warnings_showwarning is None:
         _original_warnings_showwarning = warnings.showwarning
@@ -0,0 +1,121 @@
+import pytest
+from structlog.testing import capture_logs
+
+from structlog_config.access_sampling import (
+    AccessLogSampler,
+    TokenBucket,
+    parse_route_values,
+)
+from structlog_config.settings import refresh
+from tests.utils import temp_env_var
+
+
+def test_parse_route_values():
+    assert parse_route_values("*.healthcheck=0.01, app.poll=0.5,") == {
+        "*.healthcheck": 0.01,
+        "app.poll": 0.5,
+    }
+
+    with pytest.raises(ValueError):
+        parse_route_values("0.5")
+
+
+def test_sample_rates_per_route():
+    draws = iter([0.5, 0.005])
+    sampler = AccessLogSampler(
+        rates={"*.healthcheck": 0.01}, random=lambda: next(draws)
+    )
+
+    assert sampler.sample("app.healthcheck", 200, 1) is None
+    assert sampler.sample("app.healthcheck", 200, 1) == 0.01
+    assert sampler.sample("app.users", 200, 1) == 1.0
+
+
+def test_errors_and_slow_requests_are_always_logged():
+    sampler = AccessLogSampler(default_rate=0.0, slow_ms=100)
+
+    assert sampler.sample("app.users", 200, 1) is None
+    assert sampler.sample("app.users", 503, 1) == 1.0
+    assert sampler.sample("app.users", 200, 150) == 1.0
+    assert sampler.sample("app.users", 200, 1, failed=True) == 1.0
+
+
+def test_rate_limits_per_route():
+    sampler = AccessLogSampler(limits={"app.poll": 2})
+
+    assert [sampler.sample("app.poll", 200, 1) for _ in range(4)] == [
+        1.0,
+        1.0,
+        None,
+        None,
+    ]
+
+    # unlimited routes are not affected
+    assert sampler.sample("app.users", 200, 1) == 1.0
+
+
+def test_token_bucket_reports_skipped_requests(monkeypatch):
+    now = 100.0
+    monkeypatch.setattr("structlog_config.access_sampling.monotonic", lambda: now)
+
+    bucket = TokenBucket(rate=1)
+    assert bucket.take() == 0
+    assert bucket.take() is None
+    assert bucket.take() is None
+
+    now += 1
+    assert bucket.take() == 2
+
+
+def test_from_settings():
+    assert AccessLogSampler.from_settings() is None
+
+    with temp_env_var(
+        {
+            "LOG_ACCESS_SAMPLE_RATES": "*.healthcheck=0.1",
+            "LOG_ACCESS_RATE_LIMITS": "*.poll=5",
+        }
+    ):
+        refresh()
+        sampler = AccessLogSampler.from_settings()
+
+    refresh()
+
+    assert sampler
+    assert sampler.rates == {"*.healthcheck": 0.1}
+    assert sampler.limits == {"*.poll": 5.0}
+
+
+def test_middleware_attaches_sample_rate():
+    pytest.importorskip("fastapi")
+    pytest.importorskip("httpx")
+
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from structlog_config import configure_logger
+    from structlog_config.fastapi_access_logger import add_middleware
+
+    configure_logger()
+
+    app = FastAPI()
+
+    @app.get("/healthcheck")
+    def healthcheck():
+        return {}
+
+    @app.get("/boom")
+    def boom():
+        raise ValueError("boom")
+
+    add_middleware(
+        app,
+        sampler=AccessLogSampler(rates={"*.healthcheck": 0.25}, random=lambda: 0.5),
+    )
+    client = TestClient(app, raise_server_exceptions=False)
+
+    with capture_logs() as logs:
+        client.get("/healthcheck")
+        client.get("/boom")
+
+    assert [(entry["status"], entry["sample_rate"]) for entry in logs] == [(500, 1.0)]
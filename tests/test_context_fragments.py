@@ -0,0 +1,152 @@
+import asyncio
+import json
+import logging
+from uuid import UUID
+
+import pytest
+import structlog
+
+from structlog_config import configure_logger, get_offloader
+from structlog_config.context_fragments import ContextFragments
+from tests.utils import read_lines, temp_env_var
+
+
+@pytest.fixture(autouse=True)
+def context_fragments():
+    with temp_env_var({"LOG_CONTEXT_FRAGMENTS": "true"}):
+        yield
+
+
+def test_context_fragments_are_opt_in(capsys):
+    with temp_env_var({"LOG_CONTEXT_FRAGMENTS": "false"}):
+        log = configure_logger(json_logger=True)
+
+    with log.context(user_id=7):
+        log.info("merged", count=1)
+
+    (line,) = read_lines(capsys)
+    assert line.startswith('{"count":1,"event":"merged",')
+    assert json.loads(line)["user_id"] == 7
+
+
+def test_context_is_spliced_in_front_of_the_event_keys(capsys):
+    log = configure_logger(json_logger=True)
+    request_id = UUID("12345678-1234-5678-1234-567812345678")
+
+    with log.context(user_id=7, request_id=request_id):
+        log.info("first", count=1)
+
+    (line,) = read_lines(capsys)
+    data = json.loads(line)
+
+    assert line.startswith(
+        '{"request_id":"12345678-1234-5678-1234-567812345678","user_id":7,"count":1,'
+    )
+    assert data["event"] == "first"
+    assert list(data)[2:] == sorted(list(data)[2:])
+
+
+def test_fragment_is_built_once_per_context(capsys, monkeypatch):
+    builds = []
+    build = ContextFragments.build
+
+    def counting_build(self, keys, bound, overrides, context):
+        builds.append(dict(context))
+        return build(self, keys, bound, overrides, context)
+
+    monkeypatch.setattr(ContextFragments, "build", counting_build)
+    log = configure_logger(json_logger=True)
+
+    with log.context(request_id="abc"):
+        for index in range(10):
+            log.info("repeated", index=index)
+
+        with log.context(step="inner"):
+            log.info("nested")
+
+        log.info("outer again")
+
+    log.info("no context")
+
+    # the outer fragment is reused once the inner context is gone
+    assert builds == [
+        {"request_id": "abc"},
+        {"request_id": "abc", "step": "inner"},
+        {},
+    ]
+
+    logs = [json.loads(line) for line in read_lines(capsys)]
+    assert logs[10]["step"] == "inner"
+    assert "step" not in logs[11]
+    assert "request_id" not in logs[12]
+
+
+def test_fragment_is_reused_by_offloaded_events(capsys, monkeypatch):
+    builds = []
+    build = ContextFragments.build
+
+    def counting_build(self, keys, bound, overrides, context):
+        builds.append(dict(context))
+        return build(self, keys, bound, overrides, context)
+
+    monkeypatch.setattr(ContextFragments, "build", counting_build)
+    log = configure_logger(json_logger=True, offload=True)
+
+    async def main():
+        with log.context(request_id="abc"):
+            for index in range(20):
+                log.info("offloaded", index=index)
+
+    asyncio.run(main())
+    get_offloader().flush(timeout=5)
+
+    assert builds == [{"request_id": "abc"}]
+    assert len(read_lines(capsys)) == 20
+
+
+def test_event_keys_win_over_context(capsys):
+    log = configure_logger(json_logger=True)
+
+    with log.context(user_id=7, tenant="acme"):
+        log.info("override", user_id=8)
+
+    (line,) = read_lines(capsys)
+    assert line.count('"user_id"') == 1
+    assert json.loads(line)["user_id"] == 8
+    assert json.loads(line)["tenant"] == "acme"
+
+
+def test_lazy_context_values_are_resolved_per_event(capsys):
+    log = configure_logger(json_logger=True)
+    counter = iter(range(10))
+
+    with log.context(call=log.lazy(lambda: next(counter))):
+        log.info("one")
+        log.info("two")
+
+    assert [json.loads(line)["call"] for line in read_lines(capsys)] == [0, 1]
+
+
+def test_mutable_context_values_are_rendered_as_they_are_per_event(capsys):
+    log = configure_logger(json_logger=True)
+    state = {"step": 1}
+
+    with log.context(state=state, request_id="abc"):
+        log.info("a")
+        state["step"] = 2
+        log.info("b")
+
+    logs = [json.loads(line) for line in read_lines(capsys)]
+    assert [entry["state"] for entry in logs] == [{"step": 1}, {"step": 2}]
+    assert {entry["request_id"] for entry in logs} == {"abc"}
+
+
+def test_stdlib_loggers_get_the_context(capsys):
+    configure_logger(json_logger=True)
+
+    with structlog.contextvars.bound_contextvars(request_id="abc"):
+        logging.getLogger("third_party").warning("stdlib message")
+
+    data = json.loads(capsys.readouterr().out)
+    assert data["request_id"] == "abc"
+    assert data["event"] == "stdlib message"
@@ -0,0 +1,204 @@
+import json
+import time
+
+import pytest
+import structlog
+
+from structlog_config import configure_logger
+from structlog_config import warnings as structlog_warnings
+from structlog_config.dedup import (
+    DeduplicateProcessor,
+    Deduplicator,
+    configure_summary_reporter,
+)
+from structlog_config.warnings import _showwarning
+from tests.utils import read_logs
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_repeated_occurrences_are_dropped_and_counted():
+    clock = Clock()
+    deduplicator = Deduplicator(interval=10, clock=clock)
+
+    assert deduplicator.check("a") == 0
+    assert [deduplicator.check("a") for _ in range(5)] == [None] * 5
+    assert deduplicator.check("b") == 0
+
+    clock.now = 10
+    assert deduplicator.check("a") == 5
+    assert deduplicator.check("a") is None
+
+
+def test_unreported_counts_are_summarized_on_eviction_and_flush():
+    summaries = []
+    deduplicator = Deduplicator(
+        max_fingerprints=2,
+        on_summary=lambda fingerprint, count: summaries.append((fingerprint, count)),
+    )
+
+    deduplicator.check("a")
+    deduplicator.check("a")
+    deduplicator.check("b")
+    deduplicator.check("b")
+    deduplicator.check("b")
+    # evicts "a", the least recently seen
+    deduplicator.check("c")
+
+    assert summaries == [("a", 1)]
+
+    deduplicator.flush()
+    assert summaries == [("a", 1), ("b", 2)]
+
+    deduplicator.flush()
+    assert len(summaries) == 2
+
+
+def test_processor_throttles_structlog_events(capsys):
+    processor = DeduplicateProcessor(interval=3600)
+    configure_logger(json_logger=True, dedup=processor)
+    log = structlog.get_logger(logger_name="app.jobs")
+
+    for index in range(100):
+        log.error("item failed", index=index)
+    log.error("other failure")
+    log.info("item failed")
+
+    processor.deduplicator.flush()
+
+    logs = read_logs(capsys)
+    assert [(entry["event"], entry.get("repeated")) for entry in logs] == [
+        ("item failed", None),
+        ("other failure", None),
+        ("item failed", None),
+        ("item failed", 99),
+    ]
+    assert logs[-1]["level"] == "error"
+    assert logs[-1]["logger"] == "app.jobs"
+
+
+def test_warnings_are_throttled(capsys):
+    configure_logger(json_logger=True)
+
+    # pytest replaces `warnings.showwarning` to record warnings, call ours directly
+    for _ in range(50):
+        _showwarning(DeprecationWarning("old api"), DeprecationWarning, "app.py", 10)
+    _showwarning(DeprecationWarning("old api"), DeprecationWarning, "app.py", 20)
+
+    # otherwise the summary is logged by the next `configure_logger`
+    assert structlog_warnings._deduplicator is not None
+    structlog_warnings._deduplicator.flush()
+
+    logs = read_logs(capsys)
+    assert [(entry["lineno"], entry.get("repeated")) for entry in logs] == [
+        (10, None),
+        (20, None),
+        (10, 49),
+    ]
+    assert logs[0]["event"] == "old api"
+    assert logs[0]["category"] == "DeprecationWarning"
+
+
+def test_unhashable_values_are_never_throttled(capsys):
+    processor = DeduplicateProcessor(("event", "items"), interval=3600)
+    configure_logger(json_logger=True, dedup=processor)
+    log = structlog.get_logger()
+
+    for _ in range(3):
+        log.info("batch", items=["a", "b"])
+
+    assert [entry["items"] for entry in read_logs(capsys)] == [["a", "b"]] * 3
+
+
+def test_summary_errors_are_not_mistaken_for_unhashable_values():
+    def broken_summary(fingerprint, count):
+        raise TypeError("broken summary")
+
+    processor = DeduplicateProcessor(max_fingerprints=1)
+    processor.deduplicator.on_summary = broken_summary
+
+    processor(None, "info", {"event": "a"})
+    with pytest.raises(structlog.DropEvent):
+        processor(None, "info", {"event": "a"})
+
+    # evicts "a", whose summary fails
+    with pytest.raises(TypeError, match="broken summary"):
+        processor(None, "info", {"event": "b"})
+
+
+def test_summaries_without_the_event_in_the_fingerprint(capsys):
+    processor = DeduplicateProcessor(("logger_name", "job"), interval=3600)
+    configure_logger(json_logger=True, dedup=processor)
+    log = structlog.get_logger(logger_name="app.jobs")
+
+    log.warning("job started", job="export")
+    log.warning("job retried", job="export")
+
+    processor.deduplicator.flush()
+
+    logs = read_logs(capsys)
+    assert [(entry["event"], entry.get("repeated")) for entry in logs] == [
+        ("job started", None),
+        ("repeated event", 1),
+    ]
+    assert logs[-1]["job"] == "export"
+
+
+def test_expired_counts_are_summarized_periodically():
+    clock = Clock()
+    summaries = []
+    deduplicator = Deduplicator(
+        interval=10,
+        clock=clock,
+        on_summary=lambda fingerprint, count: summaries.append((fingerprint, count)),
+    )
+
+    deduplicator.check("a")
+    deduplicator.check("a")
+    clock.now = 5
+    deduplicator.check("b")
+    deduplicator.check("b")
+
+    clock.now = 12
+    deduplicator.flush(expired=True)
+    assert summaries == [("a", 1)]
+
+    clock.now = 15
+    deduplicator.flush(expired=True)
+    deduplicator.flush(expired=True)
+    assert summaries == [("a", 1), ("b", 1)]
+
+
+def test_summary_reporter_thread(capsys):
+    clock = Clock()
+    processor = DeduplicateProcessor(interval=10)
+    processor.deduplicator.clock = clock
+    configure_logger(json_logger=True, dedup=processor)
+    configure_summary_reporter(0.01)
+    log = structlog.get_logger()
+
+    try:
+        log.info("tick")
+        log.info("tick")
+        clock.now = 10
+
+        output = ""
+        deadline = time.monotonic() + 2
+        while output.count("\n") < 2:
+            assert time.monotonic() < deadline, "timed out"
+            time.sleep(0.01)
+            output += capsys.readouterr().out
+    finally:
+        configure_summary_reporter(0)
+
+    logs = [json.loads(line) for line in output.splitlines()]
+    assert [(entry["event"], entry.get("repeated")) for entry in logs] == [
+        ("tick", None),
+        ("tick", 1),
+    ]
@@ -0,0 +1,151 @@
+import json
+import traceback
+
+import pytest
+import structlog
+
+from structlog_config import configure_logger
+from structlog_config.exception_cache import (
+    _CAUSE_MESSAGE,
+    _CONTEXT_MESSAGE,
+    FINGERPRINT_KEY,
+    CachedExceptionRenderer,
+)
+from tests.utils import temp_env_var
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def recurse(depth: int):
+    if depth:
+        return recurse(depth - 1)
+    return 1 / 0
+
+
+def raise_item_error(item: int):
+    raise ValueError(f"item {item} failed")
+
+
+def raised(function) -> BaseException:
+    try:
+        function()
+    except BaseException as exception:
+        return exception
+
+    raise AssertionError("nothing raised")
+
+
+def caused():
+    try:
+        {}["missing"]
+    except KeyError as error:
+        raise RuntimeError("lookup failed") from error
+
+
+def during_handling():
+    try:
+        {}["missing"]
+    except KeyError:
+        raise RuntimeError("")
+
+
+def suppressed():
+    try:
+        {}["missing"]
+    except KeyError:
+        raise RuntimeError("lookup failed") from None
+
+
+def with_notes():
+    error = ValueError("bad input")
+    error.add_note("first\nsecond")
+    raise error
+
+
+@pytest.mark.parametrize(
+    "exception",
+    [
+        raised(lambda: recurse(20)),
+        raised(caused),
+        raised(during_handling),
+        raised(suppressed),
+        raised(with_notes),
+        ValueError("never raised"),
+    ],
+)
+def test_output_is_identical_to_format_exc_info(exception):
+    renderer = CachedExceptionRenderer()
+    expected = structlog.processors.format_exc_info(
+        None, "error", {"exc_info": exception}
+    )
+
+    for _ in range(2):
+        event_dict = renderer(None, "error", {"exc_info": exception})
+        assert event_dict == expected
+
+
+def test_chain_messages_match_the_traceback_module():
+    assert _CAUSE_MESSAGE in "".join(traceback.format_exception(raised(caused)))
+    assert _CONTEXT_MESSAGE in "".join(
+        traceback.format_exception(raised(during_handling))
+    )
+
+
+def test_repeated_exceptions_reuse_the_frames():
+    renderer = CachedExceptionRenderer()
+
+    rendered = [
+        renderer(None, "error", {"exc_info": raised(lambda: raise_item_error(item))})
+        for item in range(3)
+    ]
+
+    assert len(renderer._entries) == 1
+    assert [event_dict["exception"].splitlines()[-1] for event_dict in rendered] == [
+        "ValueError: item 0 failed",
+        "ValueError: item 1 failed",
+        "ValueError: item 2 failed",
+    ]
+
+    renderer(None, "error", {"exc_info": raised(lambda: recurse(1))})
+    assert len(renderer._entries) == 2
+
+
+def test_exceptions_are_compacted_after_k_occurrences_in_a_window():
+    clock = Clock()
+    renderer = CachedExceptionRenderer(compact_after=2, compact_window=10, clock=clock)
+
+    def render() -> dict:
+        return renderer(
+            None, "error", {"exc_info": raised(lambda: raise_item_error(1))}
+        )
+
+    first, second, third = render(), render(), render()
+
+    assert "Traceback" in first["exception"] and "Traceback" in second["exception"]
+    assert third["exception"] == "ValueError: item 1 failed"
+    assert first[FINGERPRINT_KEY] == second[FINGERPRINT_KEY] == third[FINGERPRINT_KEY]
+
+    clock.now = 10
+    assert "Traceback" in render()["exception"]
+
+
+def test_configured_compaction(capsys):
+    with temp_env_var({"LOG_EXCEPTION_COMPACT_AFTER": "1"}):
+        log = configure_logger(json_logger=True)
+
+    for _ in range(2):
+        try:
+            recurse(2)
+        except ZeroDivisionError:
+            log.exception("failed")
+
+    full, compact = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert full["exception"].startswith("Traceback (most recent call last):")
+    assert compact["exception"] == "ZeroDivisionError: division by zero"
+    assert full[FINGERPRINT_KEY] == compact[FINGERPRINT_KEY]
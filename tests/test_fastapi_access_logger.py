@@ -0,0 +1,215 @@
+import asyncio
+
+import pytest
+from structlog.testing import capture_logs
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+
+from fastapi import FastAPI, WebSocket
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from structlog_config import configure_logger
+from structlog_config.fastapi_access_logger import (
+    AccessLogMiddleware,
+    RouteCache,
+    _route_caches,
+    add_middleware,
+    get_route_name,
+)
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    def get_item(item_id: int):
+        return {"item_id": item_id}
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(iter([b"a", b"b", b"c"]))
+
+    @app.get("/boom")
+    def boom():
+        raise ValueError("boom")
+
+    @app.websocket("/ws")
+    async def websocket_endpoint(websocket: WebSocket):
+        await websocket.accept()
+        await websocket.send_text("hello")
+        await websocket.close()
+
+    add_middleware(app)
+
+    return app
+
+
+def test_access_log_fields():
+    configure_logger()
+    client = TestClient(build_app())
+
+    with capture_logs() as logs:
+        response = client.get("/items/42?detail=true")
+
+    assert response.status_code == 200
+    assert len(logs) == 1
+
+    entry = logs[0]
+    assert entry["event"] == "200 GET /items/42?detail=true"
+    assert entry["status"] == 200
+    assert entry["method"] == "GET"
+    assert entry["path"] == "/items/42"
+    assert entry["query"] == "detail=true"
+    assert entry["client_ip"] == "testclient:50000"
+    assert entry["route"] == "tests.test_fastapi_access_logger.get_item"
+    assert isinstance(entry["time"], int)
+
+
+def test_access_log_streaming_response():
+    configure_logger()
+    client = TestClient(build_app())
+
+    with capture_logs() as logs:
+        response = client.get("/stream")
+
+    assert response.content == b"abc"
+    assert [entry["status"] for entry in logs] == [200]
+
+
+def test_access_log_unhandled_exception():
+    configure_logger()
+    client = TestClient(build_app(), raise_server_exceptions=False)
+
+    with capture_logs() as logs:
+        response = client.get("/boom")
+
+    assert response.status_code == 500
+    assert [entry["status"] for entry in logs] == [500]
+
+
+def test_access_log_skips_websockets():
+    configure_logger()
+    client = TestClient(build_app())
+
+    with capture_logs() as logs:
+        with client.websocket_connect("/ws") as websocket:
+            assert websocket.receive_text() == "hello"
+
+    assert logs == []
+
+
+def test_access_log_uses_the_route_picked_by_the_router():
+    configure_logger()
+    app = build_app()
+
+    sub_app = FastAPI()
+
+    @sub_app.get("/ping")
+    def ping():
+        return {}
+
+    app.mount("/sub", sub_app)
+    client = TestClient(app)
+
+    with capture_logs() as logs:
+        client.get("/items/1")
+        client.get("/sub/ping")
+
+    assert [entry["route"] for entry in logs] == [
+        "tests.test_fastapi_access_logger.get_item",
+        "tests.test_fastapi_access_logger.ping",
+    ]
+    # only requests the router did not handle fall back to the route cache
+    assert app not in _route_caches
+
+    with capture_logs() as logs:
+        client.get("/missing")
+
+    assert [entry["route"] for entry in logs] == ["/missing"]
+    assert app in _route_caches
+
+
+def test_access_log_wrapping_a_bare_asgi_app():
+    configure_logger()
+    sent = []
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 204, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/health",
+        "query_string": b"",
+        "headers": [],
+    }
+
+    with capture_logs() as logs:
+        asyncio.run(AccessLogMiddleware(app)(scope, receive, send))
+
+    assert [message["type"] for message in sent] == [
+        "http.response.start",
+        "http.response.body",
+    ]
+    assert [(entry["status"], entry["route"]) for entry in logs] == [(204, "/health")]
+
+
+def http_scope(app: FastAPI, path: str, method: str = "GET") -> dict:
+    return {"type": "http", "app": app, "method": method, "path": path, "root_path": ""}
+
+
+def test_route_cache_static_and_parameterized_paths():
+    app = build_app()
+    cache = RouteCache(maxsize=2)
+
+    static = cache.resolve(app, http_scope(app, "/stream"))
+    assert static is not None and static.name == "stream"
+    assert cache.resolve(app, http_scope(app, "/stream")) is static
+
+    for item_id in range(5):
+        route = cache.resolve(app, http_scope(app, f"/items/{item_id}"))
+        assert route is not None and route.name == "get_item"
+
+    assert list(cache._static) == [("GET", "", "/stream")]
+    # parameterized paths are bounded by the LRU
+    assert len(cache._dynamic) == 2
+
+    assert cache.resolve(app, http_scope(app, "/missing")) is None
+    assert cache.resolve(app, http_scope(app, "/stream", method="POST")) is None
+
+
+def test_route_cache_invalidated_when_routes_are_added():
+    app = build_app()
+
+    assert get_route_name(app, http_scope(app, "/late")) == "/late"
+
+    @app.get("/late")
+    def late():
+        return {}
+
+    assert get_route_name(app, http_scope(app, "/late")) == (
+        "tests.test_fastapi_access_logger.late"
+    )
+
+
+def test_route_name_prefers_resolved_route():
+    app = build_app()
+    stream_route = next(
+        r for r in app.router.routes if getattr(r, "name", None) == "stream"
+    )
+
+    scope = http_scope(app, "/items/1")
+    scope["route"] = stream_route
+
+    assert get_route_name(app, scope, prefix="api") == (
+        "api.tests.test_fastapi_access_logger.stream"
+    )
@@ -0,0 +1,149 @@
+import gzip
+import json
+import logging
+import os
+import time
+
+import pytest
+
+from structlog_config import configure_logger, get_file_sink
+from structlog_config.file_sink import FileSink, FileSinkLogger
+from tests.utils import temp_env_var
+
+
+def wait_for(condition, timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.fixture(autouse=True)
+def close_sink():
+    yield
+    configure_logger()
+    assert get_file_sink() is None
+
+
+@pytest.mark.parametrize("json_logger", [True, False])
+def test_python_log_path(tmp_path, capsys, json_logger):
+    log_path = tmp_path / "logs" / "app.log"
+
+    with temp_env_var({"PYTHON_LOG_PATH": str(log_path)}):
+        log = configure_logger(json_logger=json_logger)
+
+    log.info("to the file")
+    logging.getLogger("third_party").warning("stdlib to the file")
+
+    sink = get_file_sink()
+    assert sink
+    sink.flush()
+
+    assert capsys.readouterr().out == ""
+
+    lines = log_path.read_text().splitlines()
+    assert len(lines) == 2
+    assert "to the file" in lines[0]
+    assert "stdlib to the file" in lines[1]
+
+    if json_logger:
+        assert json.loads(lines[0])["event"] == "to the file"
+
+
+def test_queue_writer_writes_into_the_sink(tmp_path):
+    log_path = tmp_path / "app.log"
+
+    with temp_env_var({"PYTHON_LOG_PATH": str(log_path)}):
+        log = configure_logger(json_logger=True, queue_writer=True)
+
+    log.info("queued")
+    configure_logger()
+
+    assert json.loads(log_path.read_text())["event"] == "queued"
+
+
+def test_writes_after_close_reach_the_file(tmp_path):
+    log_path = tmp_path / "app.log"
+
+    with temp_env_var({"PYTHON_LOG_PATH": str(log_path)}):
+        configure_logger(json_logger=True)
+
+    # a logger cached by structlog before the sink was replaced
+    logger = FileSinkLogger(get_file_sink())  # type: ignore[arg-type]
+    logger.info(b"before reconfigure")
+    configure_logger()
+    logger.info(b"after reconfigure")
+
+    assert log_path.read_bytes() == b"before reconfigure\nafter reconfigure\n"
+
+
+def test_rotates_by_size_and_compresses(tmp_path):
+    log_path = tmp_path / "app.log"
+    sink = FileSink(
+        log_path,
+        flush_interval=0.01,
+        max_bytes=100,
+        backup_count=2,
+        compress=True,
+        compress_delay=0.05,
+    )
+
+    try:
+        for batch in range(3):
+            sink.write(b"x" * 150 + b"\n")
+            wait_for(lambda: log_path.stat().st_size == 0)
+            wait_for(
+                lambda: len(list(tmp_path.glob("app.log.*.gz"))) >= min(batch + 1, 2)
+            )
+    finally:
+        sink.close()
+
+    backups = sorted(tmp_path.glob("app.log.*"))
+    assert len(backups) == 2
+    assert all(backup.suffix == ".gz" for backup in backups)
+    assert gzip.decompress(backups[0].read_bytes()) == b"x" * 150 + b"\n"
+
+
+def test_rotation_errors_do_not_stop_the_sink(tmp_path, monkeypatch):
+    log_path = tmp_path / "app.log"
+    sink = FileSink(log_path, flush_interval=0.01, compress=True, compress_delay=0)
+
+    def disk_full(*args, **kwargs):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr("structlog_config.file_sink.shutil.copyfileobj", disk_full)
+
+    try:
+        sink._pending_compression.append((0, tmp_path / "app.log.20240101-000000"))
+        (tmp_path / "app.log.20240101-000000").write_bytes(b"rotated\n")
+
+        wait_for(lambda: not sink._pending_compression)
+        sink.write(b"still flushed\n")
+        wait_for(lambda: log_path.read_bytes() == b"still flushed\n")
+    finally:
+        sink.close()
+
+    # the uncompressed file is kept, the partial archive removed
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "app.log",
+        "app.log.20240101-000000",
+    ]
+
+
+def test_reopens_after_external_rotation(tmp_path):
+    log_path = tmp_path / "app.log"
+    sink = FileSink(log_path, flush_interval=0.01)
+
+    try:
+        sink.write(b"before\n")
+        sink.flush()
+        os.rename(log_path, tmp_path / "app.log.1")
+
+        wait_for(log_path.exists)
+        sink.write(b"after\n")
+        sink.flush()
+    finally:
+        sink.close()
+
+    assert (tmp_path / "app.log.1").read_bytes() == b"before\n"
+    assert log_path.read_bytes() == b"after\n"
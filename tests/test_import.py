@@ -1,8 +1,55 @@
 """Test structlog_config."""
 
+import subprocess
+import sys
+
 import structlog_config
 
 
 def test_import() -> None:
     """Test that the  can be imported."""
-    assert isinstance(structlog_config.__name__, str)
\ No newline at end of file
+    assert isinstance(structlog_config.__name__, str)
+
+
+IMPORT_TIME_BUDGET_US = 250_000
+"""
+Cumulative import time for structlog_config, including structlog itself. Locally this is ~50ms,
+the budget leaves plenty of headroom for slow CI machines.
+"""
+
+HEAVY_MODULES = (
+    "sqlalchemy",
+    "activemodel",
+    "typeid",
+    "pretty_traceback",
+    "starlette_context",
+    "fastapi",
+)
+
+
+def test_import_time_budget() -> None:
+    """Importing structlog_config must stay cheap for CLI tools and short-lived workers"""
+    code = (
+        "import sys, structlog_config; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    assert result.stdout.strip() == "", "optional packages were imported eagerly"
+
+    # format: "import time: self [us] | cumulative | imported package"
+    cumulative = {
+        name.strip(): int(total)
+        for _, total, name in (
+            line.removeprefix("import time:").split("|")
+            for line in result.stderr.splitlines()
+            if line.startswith("import time:") and "cumulative" not in line
+        )
+    }
+
+    assert cumulative["structlog_config"] < IMPORT_TIME_BUDGET_US
@@ -0,0 +1,73 @@
+import json
+import logging
+
+import pytest
+import structlog
+
+from structlog_config import configure_logger, get_processor_stats
+from structlog_config.instrumentation import (
+    STATS_EVENT,
+    ProcessorStats,
+    TimedProcessor,
+    log_processor_stats,
+    reset_processor_stats,
+)
+
+
+@pytest.fixture(autouse=True)
+def clean_stats():
+    reset_processor_stats()
+    yield
+    reset_processor_stats()
+
+
+def test_processors_are_not_wrapped_by_default():
+    configure_logger()
+
+    processors = structlog.get_config()["processors"]
+    assert not any(isinstance(processor, TimedProcessor) for processor in processors)
+
+
+def test_processor_timings_are_collected(capsys):
+    log = configure_logger(json_logger=True, instrument_processors=True)
+
+    log.info("first")
+    log.info("second")
+    logging.getLogger("third_party").warning("stdlib")
+
+    stats = {(entry["chain"], entry["name"]): entry for entry in get_processor_stats()}
+
+    normalizer = stats[("structlog", "ValueNormalizer")]
+    assert normalizer["calls"] == 2
+    assert normalizer["total_ns"] >= normalizer["max_ns"] > 0
+    assert normalizer["exceptions"] == 0
+
+    assert stats[("stdlib", "ValueNormalizer")]["calls"] == 1
+
+
+def test_processor_exceptions_are_counted():
+    def broken(logger, method_name, event_dict):
+        raise RuntimeError("broken")
+
+    stats = ProcessorStats("structlog", 0, "broken")
+    processor = TimedProcessor(broken, stats)
+
+    with pytest.raises(RuntimeError):
+        processor(None, "info", {})
+
+    assert stats.calls == 1
+    assert stats.exceptions == 1
+
+
+def test_processor_stats_event(capsys):
+    log = configure_logger(json_logger=True, instrument_processors=True)
+    log.info("measured")
+    capsys.readouterr()
+
+    log_processor_stats()
+
+    log_data = json.loads(capsys.readouterr().out)
+    assert log_data["event"] == STATS_EVENT
+    assert {entry["name"] for entry in log_data["processors"]} >= {
+        "FragmentJSONRenderer"
+    }
@@ -0,0 +1,107 @@
+import json
+
+import pytest
+
+from structlog_config import configure_logger, get_latency_histograms
+from structlog_config.latency_histograms import (
+    OTHER_ROUTE,
+    SUMMARY_EVENT,
+    LatencyHistogram,
+    LatencyHistograms,
+)
+
+
+def test_percentiles_are_within_bucket_precision():
+    histogram = LatencyHistogram()
+    for elapsed_ms in range(1, 1001):
+        histogram.record(elapsed_ms)
+
+    summary = histogram.summary()
+    assert summary["count"] == 1000
+    assert summary["max"] == 1000
+    assert summary["mean"] == 500.5
+
+    for quantile, key in [(0.5, "p50"), (0.9, "p90"), (0.99, "p99")]:
+        expected = quantile * 1000
+        assert expected <= summary[key] <= expected * 1.1
+
+
+def test_extreme_values_stay_in_bounds():
+    histogram = LatencyHistogram()
+    histogram.record(0)
+    histogram.record(10**9)
+
+    assert histogram.percentile(0.01) <= 0.002
+    assert histogram.percentile(1) == 10**9
+    assert len(histogram.counts) == len(LatencyHistogram().counts)
+
+
+def test_histograms_per_route_and_status_class():
+    histograms = LatencyHistograms(max_routes=2)
+    histograms.record("app.users", 200, 5)
+    histograms.record("app.users", 201, 7)
+    histograms.record("app.users", 503, 50)
+    histograms.record("app.items", 200, 1)
+    histograms.record("/unknown", 404, 1)
+
+    snapshot = {
+        (entry["route"], entry["status"]): entry for entry in histograms.snapshot()
+    }
+
+    assert snapshot[("app.users", "2xx")]["count"] == 2
+    assert snapshot[("app.users", "5xx")]["max"] == 50
+    assert snapshot[(OTHER_ROUTE, "4xx")]["count"] == 1
+
+    # reading does not reset, logging does
+    assert histograms.snapshot(reset=True)
+    assert histograms.snapshot() == []
+
+
+def test_summary_event(capsys):
+    configure_logger(json_logger=True, latency_histograms=True)
+    histograms = get_latency_histograms()
+    assert histograms
+
+    histograms.record("app.users", 200, 5)
+    histograms.log()
+    histograms.log()
+
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 1
+
+    log_data = json.loads(lines[0])
+    assert log_data["event"] == SUMMARY_EVENT
+    assert log_data["routes"][0]["route"] == "app.users"
+
+    configure_logger()
+    assert get_latency_histograms() is None
+
+
+def test_access_middleware_records_latency():
+    pytest.importorskip("fastapi")
+    pytest.importorskip("httpx")
+
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from structlog_config.fastapi_access_logger import add_middleware
+
+    configure_logger(latency_histograms=True)
+
+    app = FastAPI()
+
+    @app.get("/users")
+    def users():
+        return []
+
+    add_middleware(app)
+    client = TestClient(app)
+    client.get("/users")
+    client.get("/users")
+
+    [entry] = get_latency_histograms().snapshot()  # type: ignore[union-attr]
+    assert entry["route"].endswith(".users")
+    assert entry["status"] == "2xx"
+    assert entry["count"] == 2
+
+    configure_logger()
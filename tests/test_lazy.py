@@ -0,0 +1,51 @@
+import json
+from enum import Enum
+
+from structlog_config import configure_logger, lazy
+from tests.utils import temp_env_var
+
+
+class Color(Enum):
+    RED = "red"
+
+
+def test_lazy_values_are_resolved_when_emitted(capsys):
+    log = configure_logger(json_logger=True)
+
+    log.info("resolved", count=lazy(len, [1, 2, 3]), color=log.lazy(lambda: Color.RED))
+
+    log_data = json.loads(capsys.readouterr().out)
+    assert log_data["count"] == 3
+    # the resolved value is normalized like any other value
+    assert log_data["color"] == "red"
+
+
+def test_lazy_values_are_not_resolved_when_filtered(capsys):
+    calls = []
+
+    with temp_env_var({"LOG_LEVEL": "INFO"}):
+        log = configure_logger(json_logger=True)
+
+    log.debug("filtered", value=lazy(calls.append, "called"))
+
+    assert calls == []
+    assert capsys.readouterr().out == ""
+
+
+def test_lazy_failures_are_rendered_inline(capsys):
+    log = configure_logger(json_logger=True)
+
+    log.info("failed", value=lazy(lambda: 1 / 0))
+
+    log_data = json.loads(capsys.readouterr().out)
+    assert (
+        log_data["value"] == "<lazy value failed: ZeroDivisionError: division by zero>"
+    )
+
+
+def test_bare_callables_are_not_called(capsys):
+    log = configure_logger(json_logger=True)
+
+    log.info("callable", value=len)
+
+    assert json.loads(capsys.readouterr().out)["value"] != 0
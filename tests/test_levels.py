@@ -0,0 +1,141 @@
+import json
+import logging
+import os
+import signal
+import time
+
+import pytest
+import structlog
+
+from structlog_config import configure_logger, reset_log_levels, set_log_level
+from structlog_config.levels import (
+    LevelRouter,
+    install_signal_handlers,
+    parse_level_rules,
+)
+from tests.utils import temp_env_var
+
+
+def read_events(capsys) -> list[str]:
+    return [json.loads(line)["event"] for line in capsys.readouterr().out.splitlines()]
+
+
+def test_parse_level_rules():
+    assert parse_level_rules("sqlalchemy=warning, app.billing=DEBUG,") == {
+        "sqlalchemy": logging.WARNING,
+        "app.billing": logging.DEBUG,
+    }
+
+    with pytest.raises(ValueError):
+        parse_level_rules("sqlalchemy=LOUD")
+
+
+def test_longest_prefix_wins():
+    router = LevelRouter(
+        logging.INFO, {"app": logging.WARNING, "app.billing": logging.DEBUG}
+    )
+
+    assert router.level_for(None) == logging.INFO
+    assert router.level_for("other") == logging.INFO
+    assert router.level_for("app") == logging.WARNING
+    assert router.level_for("app.users") == logging.WARNING
+    assert router.level_for("app.billing.invoices") == logging.DEBUG
+    # prefixes match on dotted boundaries only
+    assert router.level_for("app.billings") == logging.WARNING
+    assert router.level_for("application") == logging.INFO
+
+
+def test_wrapper_classes_are_cached_per_name():
+    router = LevelRouter(logging.INFO, {"app.billing": logging.DEBUG})
+
+    assert router.wrapper_class_for("app.billing") is router.wrapper_class_for(
+        "app.billing"
+    )
+    assert issubclass(
+        router.wrapper_class_for("app.billing"),
+        structlog.make_filtering_bound_logger(logging.DEBUG),
+    )
+    assert issubclass(
+        router.wrapper_class_for(None),
+        structlog.make_filtering_bound_logger(logging.INFO),
+    )
+
+
+def test_structlog_loggers_use_rules(capsys):
+    with temp_env_var(
+        {"LOG_LEVEL": "INFO", "LOG_LEVELS": "app.billing=DEBUG,app.noisy=ERROR"}
+    ):
+        log = configure_logger(json_logger=True)
+
+    structlog.get_logger(logger_name="app.billing.invoices").debug("billing debug")
+    structlog.get_logger(logger_name="app.noisy").warning("noisy warning")
+    log.debug("root debug")
+    log.info("root info")
+
+    assert read_events(capsys) == ["billing debug", "root info"]
+
+
+def test_stdlib_loggers_use_rules(capsys):
+    with temp_env_var({"LOG_LEVEL": "INFO", "LOG_LEVELS": "thirdparty.db=DEBUG"}):
+        configure_logger(json_logger=True)
+
+    logging.getLogger("thirdparty.db.pool").debug("pool debug")
+    logging.getLogger("thirdparty.http").debug("http debug")
+
+    assert read_events(capsys) == ["pool debug"]
+
+    # rules which are removed are reset
+    configure_logger(json_logger=True)
+    assert logging.getLogger("thirdparty.db").level == logging.NOTSET
+
+
+def test_runtime_level_changes_apply_to_cached_loggers(capsys):
+    with temp_env_var({"LOG_LEVEL": "INFO"}):
+        configure_logger(json_logger=True)
+
+    # created before the change, the way module level loggers are
+    log = structlog.get_logger(logger_name="app.billing").bind(invoice=1)
+
+    log.debug("before")
+    set_log_level("DEBUG", name="app.billing")
+    log.debug("during")
+    logging.getLogger("app.billing.stdlib").debug("stdlib during")
+    structlog.get_logger(logger_name="app.users").debug("other logger")
+    reset_log_levels()
+    log.debug("after")
+
+    assert read_events(capsys) == ["during", "stdlib during"]
+
+
+def test_runtime_level_change_reverts_after_ttl(capsys):
+    with temp_env_var({"LOG_LEVEL": "INFO"}):
+        log = configure_logger(json_logger=True)
+
+        set_log_level(logging.DEBUG, ttl=0.05)
+        # a second change keeps the original level to revert to
+        set_log_level(logging.DEBUG, ttl=0.05)
+        log.debug("during")
+
+        time.sleep(0.2)
+        log.debug("after")
+
+    assert read_events(capsys) == ["during"]
+    assert logging.getLogger().level == logging.INFO
+
+
+def test_signal_handlers(capsys):
+    with temp_env_var({"LOG_LEVEL": "INFO"}):
+        log = configure_logger(json_logger=True)
+        previous = signal.getsignal(signal.SIGUSR1), signal.getsignal(signal.SIGUSR2)
+        install_signal_handlers()
+
+        try:
+            os.kill(os.getpid(), signal.SIGUSR1)
+            log.debug("debugging")
+            os.kill(os.getpid(), signal.SIGUSR2)
+            log.debug("quiet")
+        finally:
+            signal.signal(signal.SIGUSR1, previous[0])
+            signal.signal(signal.SIGUSR2, previous[1])
+
+    assert read_events(capsys) == ["debugging"]
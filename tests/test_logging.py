@@ -165,3 +165,37 @@ def test_nested_context(capsys):
     # Make sure "inner" doesn't appear in the last log message
     last_part = log_output.split("Back to outer")[1]
     assert "inner" not in last_part
+
+
+def test_stdlib_json_logging(capsys):
+    """Test that stdlib loggers are rendered as compact, sorted JSON strings"""
+    import logging
+
+    configure_logger(json_logger=True)
+    logging.getLogger("third_party").warning("stdlib message")
+
+    log_output = capsys.readouterr().out
+    log_data = json.loads(log_output)
+
+    assert log_data["event"] == "stdlib message"
+    assert log_data["logger"] == "third_party"
+    assert log_data["level"] == "warning"
+    assert list(log_data) == sorted(log_data)
+    # orjson output has no whitespace between separators
+    assert '", "' not in log_output
+
+
+def test_stdlib_and_structlog_share_pipeline():
+    """Test that the stdlib formatter reuses the structlog processor instances"""
+    import logging
+
+    from structlog_config import get_pipeline
+
+    configure_logger(json_logger=True)
+    pipeline = get_pipeline()
+    assert pipeline is not None
+
+    formatter = logging.getLogger().handlers[0].formatter
+    assert structlog.get_config()["processors"] == pipeline.chain
+    assert formatter.foreign_pre_chain[1:] == pipeline.processors  # type: ignore[union-attr]
+    assert pipeline.stdlib_renderer is not pipeline.renderer
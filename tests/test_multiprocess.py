@@ -0,0 +1,135 @@
+import json
+import os
+
+import pytest
+
+from structlog_config import (
+    configure_logger,
+    get_file_sink,
+    get_processor_stats,
+    get_queued_writer,
+    size_guard,
+)
+from structlog_config.access_sampling import AccessLogSampler
+from structlog_config.exception_cache import CachedExceptionRenderer
+from structlog_config.multiprocess import AtomicBytesLogger
+from structlog_config.queue_writer import PIPE_BUF, pipe_buf_chunks
+from tests.utils import temp_env_var
+
+fork_only = pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork")
+
+
+def test_pipe_buf_chunks():
+    small = b"x" * (PIPE_BUF // 3)
+    large = b"y" * (PIPE_BUF * 2)
+
+    assert pipe_buf_chunks([small, small, small, small]) == [[small] * 3, [small]]
+    assert pipe_buf_chunks([small, large, small]) == [[small], [large], [small]]
+
+
+def test_atomic_bytes_logger_writes_whole_lines():
+    read_fd, write_fd = os.pipe()
+
+    try:
+        logger = AtomicBytesLogger(write_fd)
+        logger.info(b'{"event": "one"}')
+        logger.error(b'{"event": "two"}')
+        os.close(write_fd)
+
+        with os.fdopen(read_fd, "rb") as reader:
+            assert reader.read() == b'{"event": "one"}\n{"event": "two"}\n'
+    finally:
+        for fd in (read_fd, write_fd):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+def run_in_child(function) -> int:
+    pid = os.fork()
+
+    if pid == 0:
+        code = 1
+        try:
+            function()
+            code = 0
+        finally:
+            os._exit(code)
+
+    _, status = os.waitpid(pid, 0)
+    return os.waitstatus_to_exitcode(status)
+
+
+@fork_only
+def test_file_sink_in_forked_child(tmp_path):
+    log_path = tmp_path / "app.log"
+
+    with temp_env_var({"PYTHON_LOG_PATH": str(log_path)}):
+        log = configure_logger(json_logger=True, queue_writer=True)
+
+    # buffered in the parent when forking, must not be written by the child as well
+    log.info("parent before fork")
+
+    def child():
+        log.info("child")
+        get_queued_writer().flush(timeout=1)  # type: ignore[union-attr]
+        get_file_sink().flush()  # type: ignore[union-attr]
+
+    assert run_in_child(child) == 0
+
+    log.info("parent after fork")
+    configure_logger()
+
+    events = [json.loads(line)["event"] for line in log_path.read_text().splitlines()]
+    assert sorted(events) == ["child", "parent after fork", "parent before fork"]
+
+
+@fork_only
+def test_processor_stats_are_reset_in_child(tmp_path, capsys):
+    result = tmp_path / "calls"
+    log = configure_logger(json_logger=True, instrument_processors=True)
+    log.info("parent")
+
+    def child():
+        calls = sum(entry["calls"] for entry in get_processor_stats())
+        result.write_text(str(calls))
+
+    assert run_in_child(child) == 0
+    assert result.read_text() == "0"
+    assert max(entry["calls"] for entry in get_processor_stats()) == 1
+
+    configure_logger()
+
+
+def acquire(lock) -> None:
+    if not lock.acquire(timeout=1):
+        raise RuntimeError("the lock was inherited in the held state")
+
+
+@fork_only
+def test_size_guard_lock_is_reset_in_child():
+    # held by another thread of the parent while forking
+    with size_guard._lock:
+        assert run_in_child(lambda: acquire(size_guard._lock)) == 0
+
+
+@fork_only
+def test_exception_cache_lock_is_reset_in_child():
+    renderer = CachedExceptionRenderer()
+
+    with renderer._lock:
+        assert run_in_child(lambda: acquire(renderer._lock)) == 0
+
+
+@fork_only
+def test_access_sampler_locks_are_reset_in_child():
+    sampler = AccessLogSampler(limits={"*": 100})
+    sampler.sample("app.poll", 200, 1.0)
+    bucket = sampler._policies["app.poll"].bucket
+    assert bucket is not None
+
+    with sampler._lock, bucket._lock:
+        assert (
+            run_in_child(lambda: (acquire(sampler._lock), acquire(bucket._lock))) == 0
+        )
@@ -0,0 +1,97 @@
+import datetime
+import json
+from enum import Enum, IntEnum
+from pathlib import Path
+from uuid import UUID
+
+from structlog_config import configure_logger, register_converter
+from structlog_config.normalizer import ValueNormalizer, _user_converters
+
+
+class Color(Enum):
+    RED = "red"
+
+
+class Priority(IntEnum):
+    HIGH = 1
+
+
+class Money:
+    def __init__(self, amount: int, currency: str):
+        self.amount = amount
+        self.currency = currency
+
+
+def test_normalizer_converts_builtin_types():
+    normalizer = ValueNormalizer()
+    uuid = UUID("12345678-1234-5678-1234-567812345678")
+
+    event_dict = normalizer(
+        None,
+        "info",
+        {
+            "event": "message",
+            "path": Path.cwd() / "a" / "b.txt",
+            "color": Color.RED,
+            "priority": Priority.HIGH,
+            "at": datetime.datetime(2024, 1, 2, 3, 4, 5, 6),
+            "day": datetime.date(2024, 1, 2),
+            "uuid": uuid,
+            "count": 3,
+        },
+    )
+
+    assert event_dict == {
+        "event": "message",
+        "path": "a/b.txt",
+        "color": "red",
+        "priority": 1,
+        "at": "2024-01-02T03:04:05.000006",
+        "day": "2024-01-02",
+        "uuid": str(uuid),
+        "count": 3,
+    }
+
+
+def test_normalizer_renames_keys_after_iterating():
+    normalizer = ValueNormalizer(
+        {Money: lambda key, value: (f"{key}_amount", value.amount)}
+    )
+
+    event_dict = normalizer(None, "info", {"event": "paid", "price": Money(5, "USD")})
+
+    assert event_dict == {"event": "paid", "price_amount": 5}
+
+
+def test_register_converter_applies_to_configured_logger(capsys):
+    log = configure_logger(json_logger=True)
+
+    try:
+        register_converter(Money, lambda money: f"{money.amount} {money.currency}")
+        log.info("payment", price=Money(5, "USD"))
+    finally:
+        _user_converters.pop(Money)
+
+    log_data = json.loads(capsys.readouterr().out)
+    assert log_data["price"] == "5 USD"
+
+
+def test_lazy_handlers_load_once_module_is_imported(monkeypatch):
+    import sys
+    import types
+
+    normalizer = ValueNormalizer(
+        handlers={},
+        lazy_handlers={("lazy_module", "Thing"): lambda key, value: (key, "thing")},
+    )
+
+    # nothing is imported while the module is absent
+    assert normalizer(None, "info", {"value": 1}) == {"value": 1}
+    assert normalizer.lazy_handlers
+
+    module = types.ModuleType("lazy_module")
+    module.Thing = type("Thing", (), {})  # type: ignore[attr-defined]
+    monkeypatch.setitem(sys.modules, "lazy_module", module)
+
+    assert normalizer(None, "info", {"value": module.Thing()}) == {"value": "thing"}
+    assert not normalizer.lazy_handlers
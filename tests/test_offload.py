@@ -0,0 +1,127 @@
+import asyncio
+import threading
+
+import structlog
+
+from structlog_config import configure_logger, get_offloader, lazy
+from structlog_config.offload import LogOffloader
+from tests.utils import read_logs, temp_env_var
+
+
+def test_events_logged_on_the_loop_are_processed_on_the_worker(capsys):
+    log = configure_logger(json_logger=True, offload=True)
+    threads = []
+
+    def record_thread(logger, method_name, event_dict):
+        threads.append(threading.current_thread())
+        return event_dict
+
+    offloader = get_offloader()
+    assert offloader is not None
+    offloader.downstream.insert(0, record_thread)
+
+    async def handler(index: int):
+        with structlog.contextvars.bound_contextvars(request_id=index):
+            log.info("handled", index=index)
+
+    async def main():
+        for index in range(50):
+            await handler(index)
+
+    asyncio.run(main())
+    assert offloader.flush(timeout=5)
+
+    logs = read_logs(capsys)
+    assert [entry["index"] for entry in logs] == list(range(50))
+    # contextvars are rendered as they were when the event was logged
+    assert all(entry["request_id"] == entry["index"] for entry in logs)
+    assert {thread.name for thread in threads} == {"structlog-offload"}
+    assert offloader.stats()["offloaded"] == 50
+
+
+def test_exceptions_are_captured_on_the_loop(capsys):
+    log = configure_logger(json_logger=True, offload=True)
+
+    async def main():
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            log.exception("failed")
+
+    asyncio.run(main())
+    get_offloader().flush(timeout=5)
+
+    (entry,) = read_logs(capsys)
+    assert "ValueError: boom" in entry["exception"]
+
+
+def test_values_are_rendered_as_they_were_at_log_time(capsys):
+    log = configure_logger(json_logger=True, offload=True)
+    threads = []
+
+    def loop_thread():
+        threads.append(threading.current_thread().name)
+        return "resolved"
+
+    async def main():
+        items = []
+        for index in range(3):
+            items.append(index)
+            log.info("snapshot", items=items, n=len(items), value=lazy(loop_thread))
+
+    asyncio.run(main())
+    get_offloader().flush(timeout=5)
+
+    logs = read_logs(capsys)
+    assert [entry["items"] for entry in logs] == [[0], [0, 1], [0, 1, 2]]
+    assert {entry["value"] for entry in logs} == {"resolved"}
+    assert threads == [threading.main_thread().name] * 3
+
+
+def test_events_outside_of_a_loop_are_processed_inline(capsys):
+    log = configure_logger(json_logger=True, offload=True)
+
+    log.info("sync")
+
+    assert [entry["event"] for entry in read_logs(capsys)] == ["sync"]
+    assert get_offloader().stats()["offloaded"] == 0
+
+
+def test_full_queue_processes_events_inline(capsys):
+    offloader = LogOffloader(max_size=0)
+    log = configure_logger(json_logger=True, offload=offloader)
+
+    async def main():
+        log.info("overflow")
+
+    asyncio.run(main())
+
+    assert [entry["event"] for entry in read_logs(capsys)] == ["overflow"]
+    assert offloader.stats()["inline_overflow"] == 1
+
+
+def test_measure_without_offloading(capsys):
+    with temp_env_var({"LOG_OFFLOAD_MEASURE": "true"}):
+        log = configure_logger(json_logger=True)
+
+    async def main():
+        for index in range(3):
+            log.info("measured", index=index)
+
+    asyncio.run(main())
+
+    stats = get_offloader().stats()
+    assert stats["offloaded"] == 0
+    assert stats["loop_calls"] == 3
+    assert stats["loop_blocking_max_ns"] > 0
+    assert len(read_logs(capsys)) == 3
+
+
+def test_reconfiguring_removes_the_offloader():
+    configure_logger(offload=True)
+    offloader = get_offloader()
+
+    configure_logger(offload=False)
+
+    assert get_offloader() is None
+    assert offloader._closed
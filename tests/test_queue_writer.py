@@ -0,0 +1,142 @@
+import io
+import json
+import logging
+import os
+import threading
+
+import pytest
+
+from structlog_config import configure_logger, get_queued_writer
+from structlog_config.queue_writer import QueuedBytesLogger, QueuedWriter
+
+
+class SlowBuffer(io.BytesIO):
+    "Blocks every write until the test releases it, simulating a stalled log collector"
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def writelines(self, lines):
+        self.release.wait(5)
+        super().writelines(lines)
+
+
+def test_queued_writer_flushes_lines_in_order():
+    output = io.BytesIO()
+    writer = QueuedWriter(output)
+    logger = QueuedBytesLogger(writer)
+
+    for i in range(100):
+        logger.info(f"line {i}".encode())
+
+    assert writer.flush(timeout=5)
+    assert output.getvalue().splitlines() == [f"line {i}".encode() for i in range(100)]
+    assert writer.stats() == {"queued": 0, "written": 100, "dropped": 0}
+
+    writer.close()
+
+
+def test_queued_writer_uses_writev_on_file_descriptors(tmp_path):
+    path = tmp_path / "log.jsonl"
+
+    with open(path, "wb") as file:
+        writer = QueuedWriter(file)
+        for i in range(10):
+            writer.put(b"%d\n" % i)
+        writer.close()
+
+    assert path.read_bytes().splitlines() == [b"%d" % i for i in range(10)]
+
+
+@pytest.mark.parametrize(
+    "overflow,expected",
+    [
+        ("drop_newest", [b"stalled", b"0", b"1"]),
+        ("drop_oldest", [b"stalled", b"3", b"4"]),
+    ],
+)
+def test_queued_writer_overflow_policies(overflow, expected):
+    output = SlowBuffer()
+    writer = QueuedWriter(output, max_size=2, overflow=overflow)
+
+    # the first line is picked up by the writer thread, which then stalls on it
+    writer.put(b"stalled\n")
+    while writer.stats()["queued"]:
+        pass
+
+    for i in range(5):
+        writer.put(b"%d\n" % i)
+
+    assert writer.dropped == 3
+
+    output.release.set()
+    writer.close()
+
+    assert output.getvalue().splitlines() == expected
+
+
+class CountingBuffer(io.BytesIO):
+    "A target without a file descriptor which buffers on its own, like `FileSink`"
+
+    def __init__(self):
+        super().__init__()
+        self.flushes = 0
+
+    def flush(self):
+        self.flushes += 1
+
+
+def test_queued_writer_leaves_flushing_to_buffered_targets():
+    output = CountingBuffer()
+    writer = QueuedWriter(output, batch_size=2)
+
+    for i in range(10):
+        writer.put(b"%d\n" % i)
+
+    assert writer.flush(timeout=5)
+    assert output.flushes == 0
+
+    writer.close()
+    assert output.flushes == 1
+    assert output.getvalue().splitlines() == [b"%d" % i for i in range(10)]
+
+
+def test_queued_writer_rejects_unknown_policy():
+    with pytest.raises(ValueError):
+        QueuedWriter(io.BytesIO(), overflow="explode")  # type: ignore[arg-type]
+
+
+def test_configure_logger_with_queue_writer():
+    read_fd, write_fd = os.pipe()
+
+    with os.fdopen(write_fd, "wb") as file:
+        writer = QueuedWriter(file)
+        log = configure_logger(json_logger=True, queue_writer=writer)
+        assert get_queued_writer() is writer
+
+        log.info("queued message", key="value")
+        writer.close()
+
+    with os.fdopen(read_fd, "rb") as file:
+        log_data = json.loads(file.read())
+
+    assert log_data["event"] == "queued message"
+    assert log_data["key"] == "value"
+
+
+def test_stdlib_records_are_queued_in_order():
+    output = io.BytesIO()
+    writer = QueuedWriter(output)
+    log = configure_logger(json_logger=True, queue_writer=writer)
+
+    log.info("structlog one")
+    logging.getLogger("uvicorn.access").warning("stdlib")
+    log.info("structlog two")
+
+    assert writer.flush(timeout=5)
+    events = [json.loads(line)["event"] for line in output.getvalue().splitlines()]
+    assert events == ["structlog one", "stdlib", "structlog two"]
+    assert writer.stats()["written"] == 3
+
+    configure_logger()
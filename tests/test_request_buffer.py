@@ -0,0 +1,133 @@
+import time
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+
+import structlog
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from structlog_config import configure_logger
+from structlog_config.fastapi_access_logger import add_middleware
+from structlog_config.request_buffer import (
+    OVERFLOW_EVENT,
+    RequestBufferProcessor,
+    _estimate_size,
+)
+from tests.utils import read_logs, temp_env_var
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+    log = structlog.get_logger("app")
+
+    @app.get("/ok")
+    def ok():
+        log.debug("ok details", step=1)
+        return {}
+
+    @app.get("/boom")
+    def boom():
+        with structlog.contextvars.bound_contextvars(user_id=7):
+            log.debug("boom details")
+        raise ValueError("boom")
+
+    @app.get("/slow")
+    def slow():
+        log.debug("slow details")
+        time.sleep(0.02)
+        return {}
+
+    @app.get("/chatty")
+    def chatty():
+        for index in range(100):
+            log.debug("chatty details", index=index)
+        raise ValueError("chatty")
+
+    add_middleware(app)
+
+    return app
+
+
+@pytest.fixture(autouse=True)
+def info_level():
+    with temp_env_var({"LOG_LEVEL": "INFO"}):
+        yield
+
+
+def client(request_buffer: RequestBufferProcessor | None = None) -> TestClient:
+    configure_logger(
+        json_logger=True, request_buffer=request_buffer or RequestBufferProcessor()
+    )
+    return TestClient(build_app(), raise_server_exceptions=False)
+
+
+def test_successful_requests_drop_buffered_events(capsys):
+    response = client().get("/ok")
+
+    assert response.status_code == 200
+    logs = read_logs(capsys)
+    assert [entry["event"] for entry in logs] == ["200 GET /ok"]
+
+
+def test_failed_requests_flush_buffered_events(capsys):
+    response = client().get("/boom")
+
+    assert response.status_code == 500
+    logs = {entry["event"]: entry for entry in read_logs(capsys)}
+
+    details = logs["boom details"]
+    assert details["level"] == "debug"
+    # rendered with the context bound when the event was logged
+    assert details["user_id"] == 7
+    assert details["timestamp"] <= logs["500 GET /boom"]["timestamp"]
+
+
+def test_slow_requests_flush_buffered_events(capsys):
+    client(RequestBufferProcessor(slow_ms=10)).get("/slow")
+
+    events = [entry["event"] for entry in read_logs(capsys)]
+    assert events[0] == "slow details"
+    assert events[-1] == "200 GET /slow"
+
+
+def test_buffer_is_capped(capsys):
+    request_buffer = RequestBufferProcessor(max_bytes=500)
+    client(request_buffer).get("/chatty")
+
+    logs = read_logs(capsys)
+    details = [entry["index"] for entry in logs if entry["event"] == "chatty details"]
+    overflow = next(entry for entry in logs if entry["event"] == OVERFLOW_EVENT)
+
+    # the most recent events are kept
+    assert details[-1] == 99
+    assert len(details) + overflow["dropped"] == 100
+    assert request_buffer.stats()["buffered_bytes"] == 0
+
+
+def test_nested_values_count_toward_the_cap():
+    rows = [{"id": index, "name": "x" * 20} for index in range(10_000)]
+    cyclic: list = []
+    cyclic.append(cyclic)
+
+    assert _estimate_size({"event": "rows", "rows": rows}, limit=1000) > 1000
+    assert _estimate_size({"event": "cyclic", "value": cyclic}, limit=1000) > 1000
+    assert _estimate_size({"event": "small", "count": 1}, limit=1000) < 100
+
+
+def test_low_level_events_outside_requests_are_dropped(capsys):
+    log = configure_logger(json_logger=True, request_buffer=True)
+    log.debug("dropped")
+    log.info("kept")
+
+    assert [entry["event"] for entry in read_logs(capsys)] == ["kept"]
+
+
+def test_buffer_is_not_merged_into_events(capsys):
+    client().get("/boom")
+
+    # contextvars named `structlog_*` are merged into every event by `merge_contextvars`
+    for entry in read_logs(capsys):
+        assert not any("buffer" in key for key in entry)
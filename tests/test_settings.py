@@ -0,0 +1,42 @@
+import json
+
+from structlog_config import configure_logger
+from structlog_config.environments import is_production
+from structlog_config.settings import get_settings, refresh
+from tests.utils import temp_env_var
+
+
+def test_settings_are_memoized_until_refresh():
+    with temp_env_var({"PYTHON_ENV": "production", "LOG_LEVEL": "warning"}):
+        settings = refresh()
+
+        assert settings.python_env == "production"
+        assert settings.log_level_name == "WARNING"
+        assert settings.json_logger
+        assert is_production()
+
+    # the snapshot does not change with the environment
+    assert get_settings() is settings
+    assert is_production()
+
+    assert refresh().python_env != "production"
+    assert not is_production()
+
+
+def test_configure_logger_refreshes_settings():
+    with temp_env_var({"LOG_LEVEL": "ERROR"}):
+        configure_logger()
+        assert get_settings().log_level_name == "ERROR"
+
+    configure_logger()
+    assert get_settings().log_level_name != "ERROR"
+
+
+def test_monkeypatched_environment_selects_json(capsys, monkeypatch):
+    monkeypatch.setattr("structlog_config.environments.is_production", lambda: True)
+
+    log = configure_logger()
+    log.info("production message")
+
+    log_data = json.loads(capsys.readouterr().out)
+    assert log_data["event"] == "production message"
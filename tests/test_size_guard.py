@@ -0,0 +1,92 @@
+import json
+
+import structlog
+
+from structlog_config import configure_logger
+from structlog_config.size_guard import (
+    CONTEXT_LOGGER,
+    SizeGuard,
+    get_truncation_counts,
+    reset_truncation_counts,
+)
+from tests.utils import temp_env_var
+
+
+def guard(**kwargs) -> SizeGuard:
+    return SizeGuard(
+        **{"max_string_length": 5, "max_collection_length": 3, "max_depth": 2, **kwargs}
+    )
+
+
+def test_long_strings_are_truncated():
+    event_dict = guard()(None, "info", {"event": "short", "body": "x" * 48218})
+
+    assert event_dict == {"event": "short", "body": "xxxxx…[truncated 48213 chars]"}
+
+
+def test_long_collections_are_truncated():
+    event_dict = guard()(
+        None,
+        "info",
+        {
+            "rows": list(range(100)),
+            "ids": tuple(range(4)),
+            "mapping": {f"key{index}": index for index in range(5)},
+        },
+    )
+
+    assert event_dict["rows"] == [0, 1, 2, "…[truncated 97 items]"]
+    assert event_dict["ids"] == [0, 1, 2, "…[truncated 1 items]"]
+    assert event_dict["mapping"] == {
+        "key0": 0,
+        "key1": 1,
+        "key2": 2,
+        "…": "[truncated 2 items]",
+    }
+
+
+def test_deep_nesting_is_truncated():
+    payload = {"a": {"b": {"c": 1}}, "list": [[1, 2]]}
+    event_dict = guard()(None, "info", {"payload": payload})
+
+    assert event_dict["payload"] == {
+        "a": {"b": "…[truncated dict of 1 items]"},
+        "list": ["…[truncated list of 2 items]"],
+    }
+    # values are copied, not truncated in place
+    assert payload == {"a": {"b": {"c": 1}}, "list": [[1, 2]]}
+
+
+def test_values_within_the_caps_are_untouched():
+    nested = {"a": [1, "two"], "b": None}
+    event_dict = guard()(None, "info", {"nested": nested, "count": 3})
+
+    assert event_dict["nested"] is nested
+
+
+def test_disabled_caps():
+    size_guard = guard(max_string_length=0, max_collection_length=0, max_depth=0)
+    event_dict = {"body": "x" * 100, "rows": [[[list(range(100))]]]}
+
+    assert size_guard(None, "info", dict(event_dict)) == event_dict
+
+
+def test_truncations_are_counted_per_logger(capsys):
+    reset_truncation_counts()
+
+    with temp_env_var({"LOG_MAX_STRING_LENGTH": "20", "LOG_CONTEXT_FRAGMENTS": "true"}):
+        configure_logger(json_logger=True)
+
+    log = structlog.get_logger(logger_name="app.uploads")
+    log.info("upload", body="x" * 100, name="y" * 100)
+
+    with structlog.contextvars.bound_contextvars(note="z" * 100):
+        log.info("first")
+        log.info("second")
+
+    logs = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert logs[0]["body"] == "x" * 20 + "…[truncated 80 chars]"
+    assert logs[1]["note"] == logs[2]["note"] == "z" * 20 + "…[truncated 80 chars]"
+
+    # with context fragments, the bound context is capped once, not per event
+    assert get_truncation_counts() == {"app.uploads": 2, CONTEXT_LOGGER: 1}
@@ -0,0 +1,68 @@
+import datetime
+import json
+
+import pytest
+import structlog
+
+from structlog_config import configure_logger
+from structlog_config.timestamps import CachedTimeStamper
+from tests.utils import temp_env_var
+
+
+def expected_iso(timestamp_ns: int) -> str:
+    "what `TimeStamper(fmt='iso', utc=True)` renders for this instant"
+    second, remainder = divmod(timestamp_ns, 1_000_000_000)
+    moment = datetime.datetime.fromtimestamp(second, tz=datetime.timezone.utc)
+    return (
+        moment.replace(microsecond=remainder // 1000).isoformat().replace("+00:00", "Z")
+    )
+
+
+@pytest.mark.parametrize(
+    "timestamp_ns",
+    [
+        0,
+        1_700_000_000_000_000_000,
+        1_700_000_000_000_000_999,
+        1_700_000_000_000_001_000,
+        1_700_000_000_123_456_789,
+        1_700_000_059_999_999_999,
+        1_709_164_800_500_000_000,
+    ],
+)
+def test_matches_datetime_isoformat(timestamp_ns):
+    assert CachedTimeStamper().format(timestamp_ns) == expected_iso(timestamp_ns)
+
+
+def test_prefix_is_refreshed_every_second():
+    stamper = CachedTimeStamper()
+
+    assert stamper.format(1_700_000_000_000_001_000) == "2023-11-14T22:13:20.000001Z"
+    assert stamper.format(1_700_000_001_000_000_000) == "2023-11-14T22:13:21Z"
+
+
+def test_matches_structlog_timestamper(monkeypatch):
+    now = datetime.datetime(
+        2024, 3, 1, 12, 30, 45, 120000, tzinfo=datetime.timezone.utc
+    )
+    timestamp_ns = int(now.timestamp()) * 1_000_000_000 + now.microsecond * 1000
+
+    monkeypatch.setattr("structlog_config.timestamps.time_ns", lambda: timestamp_ns)
+    cached = CachedTimeStamper()(None, "info", {})
+
+    reference = structlog.processors.TimeStamper(fmt="iso", utc=True)
+    monkeypatch.setattr(
+        "structlog.processors.datetime.datetime",
+        type("frozen", (datetime.datetime,), {"now": staticmethod(lambda tz: now)}),
+    )
+    assert cached == reference(None, "info", {})
+
+
+def test_epoch_ns_json_logs(capsys):
+    with temp_env_var({"LOG_TIMESTAMP_EPOCH_NS": "true"}):
+        log = configure_logger(json_logger=True)
+        log.info("epoch")
+
+    log_data = json.loads(capsys.readouterr().out)
+    assert isinstance(log_data["timestamp"], int)
+    assert log_data["timestamp"] > 1_700_000_000_000_000_000
@@ -1,3 +1,4 @@
+import json
 import os
 from contextlib import contextmanager
 from typing import Dict
@@ -33,3 +34,13 @@ def temp_env_var(env_vars: Dict[str, str]):
                 os.environ[name] = value
             else:
                 os.environ.pop(name, None)
+
+
+def read_lines(capsys) -> list[str]:
+    "Lines written to stdout since the last call"
+    return capsys.readouterr().out.splitlines()
+
+
+def read_logs(capsys) -> list[dict]:
+    "JSON log lines written to stdout since the last call"
+    return [json.loads(line) for line in read_lines(capsys)]